@@ -0,0 +1,99 @@
+"""
+Archive tier for answered prayer requests.
+
+Answered requests whose answer is older than ``ARCHIVE_AFTER_DAYS`` move, with
+their group shares and answer, from the hot tables into the Archived* tables.
+Nothing on a group page or the personal list shows answered requests, so only
+the answered list, search and the journal export read both tiers.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import changes, counters
+from .models import (
+    AnsweredPrayer,
+    ArchivedAnsweredPrayer,
+    ArchivedGroupPrayerManager,
+    ArchivedPrayerRequest,
+    GroupPrayerManager,
+    PrayerRequest,
+)
+
+
+def cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def eligible(before):
+    return PrayerRequest.objects.filter(answered=True, answeredprayer__datetime__lt=before)
+
+
+def archive(prayer_request_ids):
+    """
+    Move the given answered requests to the archive tier in one transaction.
+    Returns the number of requests moved.
+    """
+    # Moving rows between tiers changes no count, and sync clients read
+    # both tiers.
+    with transaction.atomic(), counters.suspended(), changes.suspended():
+        prayer_requests = list(
+            PrayerRequest.objects.filter(id__in=prayer_request_ids, answered=True, answeredprayer__isnull=False)
+            .select_related("answeredprayer")
+        )
+        ids = [prayer_request.id for prayer_request in prayer_requests]
+        shares = list(GroupPrayerManager.objects.filter(prayer_request_id__in=ids))
+        # Delete first: the search index is keyed by id and the archive
+        # triggers re-add the rows. The delete signals evict cached pages.
+        PrayerRequest.objects.filter(id__in=ids).delete()
+        ArchivedPrayerRequest.objects.bulk_create(
+            ArchivedPrayerRequest(
+                id=prayer_request.id,
+                datetime=prayer_request.datetime,
+                user_id=prayer_request.user_id,
+                content=prayer_request.content,
+                updated_at=prayer_request.updated_at,
+            )
+            for prayer_request in prayer_requests
+        )
+        ArchivedAnsweredPrayer.objects.bulk_create(
+            ArchivedAnsweredPrayer(
+                id=prayer_request.answeredprayer.id,
+                datetime=prayer_request.answeredprayer.datetime,
+                prayer_request_id=prayer_request.id,
+                content=prayer_request.answeredprayer.content,
+            )
+            for prayer_request in prayer_requests
+        )
+        ArchivedGroupPrayerManager.objects.bulk_create(
+            ArchivedGroupPrayerManager(id=share.id, prayer_request_id=share.prayer_request_id, group_id=share.group_id)
+            for share in shares
+        )
+    return len(prayer_requests)
+
+
+def archive_before(before, batch_size=500):
+    """Archive every eligible request in batches; yields the running total after each."""
+    archived = 0
+    while True:
+        ids = list(eligible(before).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return
+        moved = archive(ids)
+        if not moved:
+            return
+        archived += moved
+        yield archived
+
+
+def answered_prayers(user):
+    """The user's answered prayers in both tiers, for KeysetPaginator."""
+    return [
+        AnsweredPrayer.objects.filter(prayer_request__user=user).select_related("prayer_request"),
+        ArchivedAnsweredPrayer.objects.filter(prayer_request__user=user).select_related("prayer_request"),
+    ]
+
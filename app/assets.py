@@ -0,0 +1,163 @@
+"""
+Static asset bundles.
+
+Every page loads one minified stylesheet (and at most one script) holding its
+layout's files and its own, instead of one request per file, and its icons
+come from a local SVG sprite holding only the icons the templates use.
+``manage.py build_assets`` writes the bundles to app/static/app/build/, where
+collectstatic fingerprints and pre-compresses them like any other file (see
+STORAGES in list/settings.py).
+
+Templates load a bundle with ``{% bundle "<name>" %}`` and an icon with
+``{% icon "<name>" %}`` (app/templatetags/assets.py). The build output is
+committed; AssetBuildTests fails when it is stale.
+"""
+import posixpath
+import re
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+STATIC_DIR = APP_DIR / "static"
+ICON_DIR = APP_DIR / "icons"
+TEMPLATE_DIR = APP_DIR / "templates"
+BUILD_PATH = "app/build"
+SPRITE = f"{BUILD_PATH}/icons.svg"
+
+# Layout stylesheets, in the order base.html used to link them: the page's
+# own stylesheet goes before pagination.css.
+BASE_CSS = ["app/base.css"]
+NAVBAR_CSS = BASE_CSS + ["app/navbar.css"]
+PAGINATION_CSS = ["app/pagination.css"]
+
+# Pages without scripts of their own share the navbar one.
+NAVBAR_JS = ["app/javascript/navbar.js"]
+SCRIPTS = {
+    "navbar": NAVBAR_JS,
+    "prayer-request": NAVBAR_JS + ["app/javascript.js"],
+    "personal-prayer": NAVBAR_JS + ["app/javascript/delete-request.js"],
+    "add-member": NAVBAR_JS + ["app/javascript/add-member.js"],
+    "group-detail": NAVBAR_JS + ["app/javascript/group-events.js"],
+}
+
+
+def navbar_page(name, paginated=False):
+    return name, {
+        "css": NAVBAR_CSS + [f"app/{name}.css"] + (PAGINATION_CSS if paginated else []),
+        "js": name if name in SCRIPTS else "navbar",
+    }
+
+
+# Page bundles: the stylesheets concatenated into build/<page>.css and the
+# name of the script in build/, if any.
+BUNDLES = dict([
+    ("login", {"css": BASE_CSS + ["app/login.css"], "js": None}),
+    ("register", {"css": BASE_CSS + ["app/register.css"], "js": None}),
+    navbar_page("index"),
+    navbar_page("prayer-request"),
+    navbar_page("create-group"),
+    navbar_page("add-member"),
+    navbar_page("search", paginated=True),
+    navbar_page("group-detail", paginated=True),
+    navbar_page("group-list", paginated=True),
+    navbar_page("answered-prayer-list", paginated=True),
+    navbar_page("personal-prayer", paginated=True),
+])
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+ICON_TAG = re.compile(r"""{%\s*icon\s+["']([\w-]+)["']""")
+
+
+def rebase_urls(source, path):
+    """Point relative url()s in the stylesheet at ``path`` to the same files from the build directory."""
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r"^([a-z]+:|/|#)", url):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(path), url))
+        return f"url({quote}{posixpath.relpath(target, BUILD_PATH)}{quote})"
+    return CSS_URL.sub(rebase, source)
+
+
+def minify_css(source):
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    # Only around punctuation that can't change a selector's meaning.
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    source = re.sub(r":\s+", ":", source)
+    return source.replace(";}", "}").strip() + "\n"
+
+
+def minify_js(source):
+    # Whitespace and comment lines only: statements stay on their own
+    # lines, so automatic semicolon insertion sees the same code.
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//")) + "\n"
+
+
+def used_icons():
+    names = set()
+    for template in TEMPLATE_DIR.rglob("*.html"):
+        names.update(ICON_TAG.findall(template.read_text(encoding="utf-8")))
+    return sorted(names)
+
+
+def sprite(names):
+    symbols = []
+    for name in names:
+        path = ICON_DIR / f"{name}.svg"
+        if not path.exists():
+            raise ValueError(f"Unknown icon {name!r}: add {path.relative_to(APP_DIR.parent)}")
+        attributes, body = re.fullmatch(r"\s*<svg([^>]*)>(.*)</svg>\s*", path.read_text(encoding="utf-8"), re.S).groups()
+        view_box = re.search(r'viewBox="([^"]*)"', attributes).group(1)
+        style = re.sub(r'\s*(xmlns|viewBox)="[^"]*"', "", attributes).strip()
+        body = re.sub(r">\s+<", "><", body.strip())
+        symbols.append(f'<symbol id="{name}" viewBox="{view_box}"><g {style}>{body}</g></symbol>')
+    return '<svg xmlns="http://www.w3.org/2000/svg">' + "".join(symbols) + "</svg>\n"
+
+
+def read(paths):
+    return "\n".join((STATIC_DIR / path).read_text(encoding="utf-8") for path in paths)
+
+
+def read_css(paths):
+    return "\n".join(rebase_urls((STATIC_DIR / path).read_text(encoding="utf-8"), path) for path in paths)
+
+
+def outputs():
+    """``{static path: content}`` of everything the build writes."""
+    files = {}
+    for name, bundle in BUNDLES.items():
+        files[f"{BUILD_PATH}/{name}.css"] = minify_css(read_css(bundle["css"]))
+    for name, paths in SCRIPTS.items():
+        files[f"{BUILD_PATH}/{name}.js"] = minify_js(read(paths))
+    files[SPRITE] = sprite(used_icons())
+    return files
+
+
+def built_files():
+    build_dir = STATIC_DIR / BUILD_PATH
+    if not build_dir.exists():
+        return []
+    return sorted(path.relative_to(STATIC_DIR).as_posix() for path in build_dir.iterdir())
+
+
+def stale():
+    """Static paths whose built file is missing, outdated or left over."""
+    files = outputs()
+    changed = [
+        path for path, content in files.items()
+        if not (STATIC_DIR / path).exists() or (STATIC_DIR / path).read_text(encoding="utf-8") != content
+    ]
+    return changed + [path for path in built_files() if path not in files]
+
+
+def build():
+    """Write the bundles and sprite, removing leftovers. Returns ``{static path: size}``."""
+    files = outputs()
+    (STATIC_DIR / BUILD_PATH).mkdir(parents=True, exist_ok=True)
+    for path in built_files():
+        if path not in files:
+            (STATIC_DIR / path).unlink()
+    for path, content in files.items():
+        (STATIC_DIR / path).write_text(content, encoding="utf-8")
+    return {path: len(content.encode()) for path, content in files.items()}
@@ -0,0 +1,171 @@
+"""
+Cache of rendered list pages and prayer cards.
+
+Entries are keyed per user, group and page, and include a version token for
+every scope (``user:<id>``, ``group:<id>``) the page depends on. Writes bump
+the token of the affected scopes only (see app/signals.py), which evicts
+exactly the pages that could have changed.
+
+ConditionalPageMixin sits in front of the cache. It answers browser
+revalidation with a 304 from a version stamp that one indexed query computes.
+Pages behind it are also keyed by that stamp, so a write the cache never
+heard of, such as the job worker's feed rows (app/tasks.py), can't leave a
+stale page behind.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+CACHE_ALIAS = "fragments"
+
+
+def fragment_cache():
+    return caches[CACHE_ALIAS]
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def _version_key(scope):
+    return f"version:{scope}"
+
+
+def _bump(scopes):
+    fragment_cache().set_many({_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+
+def invalidate(*scopes):
+    """Evict every cached page that depends on ``scopes``."""
+    scopes = set(scopes)
+    if not scopes:
+        return
+    _bump(scopes)
+    # Bump again once the writing transaction is visible, so a page rendered
+    # from pre-commit data in the meantime is not served afterwards.
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = fragment_cache().get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        # add() so a concurrent first reader doesn't overwrite a fresh bump.
+        for key, token in missing.items():
+            fragment_cache().add(key, token, timeout=None)
+        found.update(fragment_cache().get_many(list(missing)))
+    return [found.get(key, "") for key in keys]
+
+
+def page_key(request, name, scopes, stamp=""):
+    # Rendered pages embed CSRF tokens for the browser's CSRF cookie, so the
+    # cookie is part of the key and pages are only cached once it exists.
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_cookie:
+        return None
+    parts = [name, str(request.user.pk), csrf_cookie, request.get_full_path(), stamp, *versions(scopes)]
+    return "page:" + hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def evict_card(name, *vary_on):
+    fragment_cache().delete(make_template_fragment_key(name, vary_on))
+
+
+class CachedPageMixin:
+    """
+    Serve GET requests from the fragment cache. Views list the scopes their
+    page depends on in ``get_cache_scopes``; a hit skips the ORM and the
+    template engine.
+    """
+
+    def get_cache_scopes(self):
+        return [user_scope(self.request.user.pk)]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["fragment_cache_timeout"] = settings.FRAGMENT_CACHE_TIMEOUT
+        return context
+
+    def get_cached_page(self):
+        """Return ``(key, response)``; the response is None on a miss."""
+        # ConditionalPageMixin has computed the page's ETag by now.
+        key = page_key(self.request, type(self).__name__, self.get_cache_scopes(), getattr(self, "page_etag", ""))
+        if key is not None:
+            content = fragment_cache().get(key)
+            if content is not None:
+                return key, HttpResponse(content)
+        return key, None
+
+    def cache_page_on_render(self, key, response):
+        if key is not None and response.status_code == 200:
+            def store(response):
+                fragment_cache().set(key, response.content, settings.FRAGMENT_CACHE_TIMEOUT)
+            response.add_post_render_callback(store)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        key, cached = self.get_cached_page()
+        if cached is not None:
+            return cached
+        response = super().get(request, *args, **kwargs)
+        return self.cache_page_on_render(key, response)
+
+
+class ConditionalPageMixin:
+    """
+    Answer If-None-Match with a 304 before the page cache, the list query or
+    the template run. Views return ``(parts, last_modified)`` from
+    ``get_page_stamp``; together they must change whenever the page could.
+
+    Only an ETag is sent. The newest datetime of the rows still on the page
+    doesn't move when a row is deleted, withdrawn or answered, so it can't
+    serve as Last-Modified.
+    """
+
+    def get_page_stamp(self):
+        raise NotImplementedError
+
+    def get_validators(self):
+        parts, last_modified = self.get_page_stamp()
+        # Like the page cache key, the ETag covers the user, the CSRF cookie the
+        # page's tokens belong to and the query string (the cursor).
+        parts = [
+            type(self).__name__,
+            str(self.request.user.pk),
+            self.request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+            self.request.get_full_path(),
+            *map(str, parts),
+            str(last_modified),
+        ]
+        etag = quote_etag(hashlib.md5("|".join(parts).encode()).hexdigest())
+        self.page_etag = etag
+        return etag
+
+    def get_not_modified(self, etag):
+        return get_conditional_response(self.request, etag=etag)
+
+    def add_validators(self, etag, response):
+        if response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            # Private pages: browsers may keep them but must revalidate.
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_validators()
+        response = self.get_not_modified(etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return self.add_validators(etag, response)
@@ -0,0 +1,226 @@
+"""
+Change log behind SyncView, the delta-sync API.
+
+Every write to a PrayerRequest, GroupPrayerManager or AnsweredPrayer row and
+every membership change appends Change rows: one for the request's owner and
+one for each group that can see the row. Deletes append tombstones. Change ids
+only grow, so a client keeps the last one it has seen as its cursor and
+``since()`` returns what changed after it for the user and their groups, in
+one query over the (user, id) and (group, id) indexes.
+
+Groups see what the group pages and search show them: open requests and
+their shares, never answers. Answers are only logged for the owner, and
+``since()`` sends other users' rows that are no longer visible, such as a
+request that was answered, as deleted.
+
+Single-row writes are logged by the receivers in app/signals.py; bulk inserts
+call the functions here (bulk_create sends no signals). Archiving moves rows
+between tiers without logging anything: archived rows keep their ids and
+``since()`` reads them from the archive tables.
+
+Ids are only safe as a cursor because they are handed out in commit order,
+which holds on SQLite where one write transaction runs at a time.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import Group
+from django.db.models import Q
+
+from . import membership
+from .models import (
+    AnsweredPrayer,
+    ArchivedAnsweredPrayer,
+    ArchivedGroupPrayerManager,
+    ArchivedPrayerRequest,
+    Change,
+    GroupPrayerManager,
+    PrayerRequest,
+)
+
+PRAYER_REQUEST = "prayer_request"
+SHARE = "group_prayer_manager"
+ANSWER = "answered_prayer"
+# object_id is the group's id.
+MEMBERSHIP = "membership"
+
+_suspended = ContextVar("changes_suspended", default=False)
+
+
+@contextmanager
+def suspended():
+    """Log nothing, for moves no client can see (archiving)."""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def entries(kind, object_id, user_id=None, group_ids=(), deleted=False):
+    """Unsaved Change rows for ``user_id`` and each of ``group_ids``."""
+    audience = [{"user_id": user_id}] if user_id is not None else []
+    audience += [{"group_id": group_id} for group_id in group_ids]
+    return [Change(kind=kind, object_id=object_id, deleted=deleted, **scope) for scope in audience]
+
+
+def log(changes):
+    changes = list(changes)
+    if changes and not is_suspended():
+        Change.objects.bulk_create(changes)
+
+
+def shared_group_ids(prayer_request_id):
+    return list(GroupPrayerManager.objects.filter(prayer_request_id=prayer_request_id).values_list("group_id", flat=True))
+
+
+def owner_id(instance):
+    """The user id of the request a share or answer belongs to, None once it is gone."""
+    if type(instance).prayer_request.is_cached(instance):
+        return instance.prayer_request.user_id
+    return PrayerRequest.objects.filter(pk=instance.prayer_request_id).values_list("user_id", flat=True).first()
+
+
+def prayer_requests_added(prayer_requests, answers=()):
+    """Log bulk-created requests and answers (with prayer_request loaded)."""
+    log([
+        *(change for prayer_request in prayer_requests for change in entries(PRAYER_REQUEST, prayer_request.pk, prayer_request.user_id)),
+        *(change for answer in answers for change in entries(ANSWER, answer.pk, answer.prayer_request.user_id)),
+    ])
+
+
+def prayer_request_changed(prayer_request):
+    """
+    Log an update to ``prayer_request`` for its owner and groups. Answering
+    it hides it and its shares from the groups, so they hear about both.
+    """
+    shares = list(GroupPrayerManager.objects.filter(prayer_request_id=prayer_request.pk).values_list("id", "group_id"))
+    log([
+        *entries(PRAYER_REQUEST, prayer_request.pk, prayer_request.user_id, [group_id for _, group_id in shares]),
+        *(
+            change
+            for share_id, group_id in (shares if prayer_request.answered else [])
+            for change in entries(SHARE, share_id, group_ids=[group_id])
+        ),
+    ])
+
+
+def share_changed(share, user_id, deleted=False):
+    """A share changes what its group sees: the share itself and the request it makes visible."""
+    return [
+        *entries(SHARE, share.pk, user_id, [share.group_id], deleted),
+        *entries(PRAYER_REQUEST, share.prayer_request_id, group_ids=[share.group_id], deleted=deleted),
+    ]
+
+
+def shares_added(managers):
+    """Log bulk-created GroupPrayerManager rows (with prayer_request loaded)."""
+    log(change for manager in managers for change in share_changed(manager, manager.prayer_request.user_id))
+
+
+def memberships_changed(pairs, sign):
+    """Log added (``sign`` 1) or removed (-1) ``(user_id, group_id)`` memberships."""
+    log(change for user_id, group_id in pairs for change in entries(MEMBERSHIP, group_id, user_id, deleted=sign < 0))
+
+
+def _prayer_request(row):
+    return {
+        "id": row.id,
+        "user": row.user_id,
+        "content": row.content,
+        "datetime": row.datetime,
+        "updated_at": row.updated_at,
+        "answered": row.answered,
+    }
+
+
+def _share(row):
+    return {"id": row.id, "prayer_request": row.prayer_request_id, "group": row.group_id}
+
+
+def _answer(row):
+    return {"id": row.id, "prayer_request": row.prayer_request_id, "content": row.content, "datetime": row.datetime}
+
+
+def _membership(group):
+    return {"id": group.id, "name": group.name}
+
+
+# Where the current version of each kind lives (hot tier first) and how it
+# is sent.
+SOURCES = {
+    PRAYER_REQUEST: ([PrayerRequest, ArchivedPrayerRequest], _prayer_request),
+    SHARE: ([GroupPrayerManager, ArchivedGroupPrayerManager], _share),
+    ANSWER: ([AnsweredPrayer, ArchivedAnsweredPrayer], _answer),
+    MEMBERSHIP: ([Group], _membership),
+}
+
+
+def visible(kind, row, user):
+    """Whether ``user`` sees ``row``: it is theirs, or one of their groups shows it."""
+    if kind == MEMBERSHIP:
+        return True
+    prayer_request = row if kind == PRAYER_REQUEST else row.prayer_request
+    if prayer_request.user_id == user.pk:
+        return True
+    # Like the group pages and search: open requests and their shares only.
+    return kind != ANSWER and not prayer_request.answered
+
+
+def load(kind, ids, user):
+    """``{id: data}`` of the rows of ``kind`` that still exist and ``user`` sees."""
+    models, serialize = SOURCES[kind]
+    rows = {}
+    for model in models:
+        missing = set(ids) - rows.keys()
+        if not missing:
+            break
+        queryset = model.objects.all()
+        if kind in (SHARE, ANSWER):
+            queryset = queryset.select_related("prayer_request")
+        rows.update(queryset.in_bulk(missing))
+    return {pk: serialize(row) for pk, row in rows.items() if visible(kind, row, user)}
+
+
+def since(user, cursor, limit, group_id=None):
+    """
+    The first ``limit`` changes after ``cursor`` visible to ``user``, or only
+    those of one of their groups. Each changed row is sent once, with its
+    current data, at the position of its latest change in the page; rows gone
+    or hidden since are sent as deleted.
+    """
+    if group_id is None:
+        scope = Q(user=user) | Q(group_id__in=membership.group_ids(user))
+    else:
+        scope = Q(group_id=group_id)
+    page = list(
+        Change.objects.filter(scope, id__gt=cursor)
+        .order_by("id")
+        .values_list("id", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    latest = {}
+    for _, kind, object_id, deleted in page:
+        latest.pop((kind, object_id), None)
+        latest[kind, object_id] = deleted
+    wanted = defaultdict(list)
+    for (kind, object_id), deleted in latest.items():
+        if not deleted:
+            wanted[kind].append(object_id)
+    current = {kind: load(kind, ids, user) for kind, ids in wanted.items()}
+
+    changes = []
+    for (kind, object_id), deleted in latest.items():
+        data = None if deleted else current[kind].get(object_id)
+        change = {"kind": kind, "id": object_id, "deleted": data is None}
+        if data is not None:
+            change["data"] = data
+        changes.append(change)
+    return {"changes": changes, "cursor": page[-1][0] if page else cursor, "has_more": has_more}
@@ -0,0 +1,191 @@
+"""
+Incrementally maintained counters behind the IndexView dashboard.
+
+Each Counter row holds one number for a scope (``user:<id>`` or
+``group:<id>``, as in app/caching.py):
+
+- ``open``: a user's unanswered requests, or the unanswered requests shared
+  with a group;
+- ``answered:<YYYY-MM>``: a user's answers given that month, both tiers;
+- ``members``: a group's member count.
+
+Writes adjust them inside the writing transaction: single-row writes through
+the receivers in app/signals.py, bulk inserts by calling the functions here
+(bulk_create sends no signals). ``repair`` recomputes all of them from the
+source tables and reports drift.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import membership
+from .caching import group_scope, user_scope
+from .models import AnsweredPrayer, ArchivedAnsweredPrayer, Counter, GroupPrayerManager, PrayerRequest
+
+OPEN = "open"
+MEMBERS = "members"
+
+_suspended = ContextVar("counters_suspended", default=False)
+
+
+def answered_name(when):
+    return f"answered:{timezone.localtime(when):%Y-%m}"
+
+
+@contextmanager
+def suspended():
+    """Skip counter updates, for moves that don't change any count (archiving)."""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def add(deltas):
+    """Apply ``{(scope, name): delta}`` with one UPDATE per counter."""
+    if is_suspended():
+        return
+    for (scope, name), delta in deltas.items():
+        if not delta:
+            continue
+        counter = Counter.objects.filter(scope=scope, name=name)
+        if counter.update(value=F("value") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                Counter.objects.create(scope=scope, name=name, value=delta)
+        except IntegrityError:
+            # Created concurrently since the UPDATE above.
+            counter.update(value=F("value") + delta)
+
+
+def prayer_requests_added(prayer_requests, answers=()):
+    """Count bulk-created requests and answers; answers need their final datetime."""
+    deltas = defaultdict(int)
+    for prayer_request in prayer_requests:
+        if not prayer_request.answered:
+            deltas[user_scope(prayer_request.user_id), OPEN] += 1
+    for answer in answers:
+        deltas[user_scope(answer.prayer_request.user_id), answered_name(answer.datetime)] += 1
+    add(deltas)
+
+
+def shares_added(managers):
+    """Count bulk-created GroupPrayerManager rows (with prayer_request loaded)."""
+    deltas = defaultdict(int)
+    for manager in managers:
+        if not manager.prayer_request.answered:
+            deltas[group_scope(manager.group_id), OPEN] += 1
+    add(deltas)
+
+
+def memberships_changed(pairs, sign):
+    """Count added (``sign`` 1) or removed (-1) ``(user_id, group_id)`` memberships."""
+    deltas = defaultdict(int)
+    for _, group_id in pairs:
+        deltas[group_scope(group_id), MEMBERS] += sign
+    add(deltas)
+
+
+def recount_members(group_ids):
+    """Store the member counts of ``group_ids`` counted from the membership table."""
+    if is_suspended():
+        return
+    members = dict(
+        User.groups.through.objects.filter(group_id__in=group_ids)
+        .values("group_id").annotate(n=Count("id")).order_by().values_list("group_id", "n")
+    )
+    Counter.objects.bulk_create(
+        [Counter(scope=group_scope(group_id), name=MEMBERS, value=members.get(group_id, 0)) for group_id in group_ids],
+        update_conflicts=True,
+        unique_fields=["scope", "name"],
+        update_fields=["value"],
+    )
+
+
+def remove_scope(scope):
+    Counter.objects.filter(scope=scope).delete()
+
+
+def dashboard(user):
+    """The index page numbers, in a fixed number of queries."""
+    group_ids = membership.group_ids(user)
+    this_month = answered_name(timezone.now())
+    values = {
+        (counter.scope, counter.name): counter.value
+        for counter in Counter.objects.filter(
+            scope__in=[user_scope(user.pk), *(group_scope(group_id) for group_id in group_ids)],
+            name__in=[OPEN, MEMBERS, this_month],
+        )
+    }
+    groups = Group.objects.filter(id__in=group_ids).order_by("name", "id") if group_ids else []
+    return {
+        "open": values.get((user_scope(user.pk), OPEN), 0),
+        "answered_this_month": values.get((user_scope(user.pk), this_month), 0),
+        "groups": [
+            {
+                "group": group,
+                "open": values.get((group_scope(group.id), OPEN), 0),
+                "members": values.get((group_scope(group.id), MEMBERS), 0),
+            }
+            for group in groups
+        ],
+    }
+
+
+def expected():
+    """Every counter recomputed from the source tables, zeros left out."""
+    counts = defaultdict(int)
+    for row in PrayerRequest.objects.filter(answered=False).values("user_id").annotate(n=Count("id")).order_by():
+        counts[user_scope(row["user_id"]), OPEN] = row["n"]
+    for model in (AnsweredPrayer, ArchivedAnsweredPrayer):
+        months = (
+            model.objects.values(user_id=F("prayer_request__user_id"), month=TruncMonth("datetime"))
+            .annotate(n=Count("id"))
+            .order_by()
+        )
+        for row in months:
+            counts[user_scope(row["user_id"]), answered_name(row["month"])] += row["n"]
+    shares = GroupPrayerManager.objects.filter(prayer_request__answered=False)
+    for row in shares.values("group_id").annotate(n=Count("id")).order_by():
+        counts[group_scope(row["group_id"]), OPEN] = row["n"]
+    for row in User.groups.through.objects.values("group_id").annotate(n=Count("id")).order_by():
+        counts[group_scope(row["group_id"]), MEMBERS] = row["n"]
+    return counts
+
+
+def repair(fix=True):
+    """
+    Compare the stored counters with ``expected()``. Returns the drift as
+    ``(scope, name, stored, expected)`` tuples and, with ``fix``, stores the
+    expected values.
+    """
+    with transaction.atomic():
+        counts = expected()
+        stored = {(counter.scope, counter.name): counter for counter in Counter.objects.all()}
+        drift = []
+        for key in sorted(stored.keys() | counts.keys()):
+            value = stored[key].value if key in stored else 0
+            if value != counts.get(key, 0):
+                drift.append((*key, value, counts.get(key, 0)))
+        if fix and drift:
+            stale = [stored[key].pk for key in stored if not counts.get(key)]
+            Counter.objects.filter(pk__in=stale).delete()
+            Counter.objects.bulk_create(
+                [Counter(scope=scope, name=name, value=value) for scope, name, _, value in drift if value],
+                update_conflicts=True,
+                unique_fields=["scope", "name"],
+                update_fields=["value"],
+            )
+    return drift
@@ -0,0 +1,165 @@
+"""
+Live group feed events for GroupEventsView (Server-Sent Events).
+
+Writes that change a group's feed publish an event once their transaction
+commits: ``shared`` when an open request is shared with the group and
+``answered`` when one of its requests is answered. The broker is in-process:
+each process keeps the last ``EVENT_REPLAY_SIZE`` events of every group in a
+ring buffer and hands new ones to the asyncio queues of the streams open in
+that process, so it needs no external service. A browser that reconnects
+sends the id of the last event it saw (``Last-Event-ID``) and gets what it
+missed from the buffer, or a ``reset`` event when the buffer no longer goes
+back that far or the id comes from another process.
+
+With several worker processes a stream only sees events published by its
+own process; deploy the event stream to a single ASGI worker, or replace
+``broker`` with one backed by a shared service that keeps the same interface.
+"""
+import asyncio
+import json
+import threading
+import uuid
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+SHARED = "shared"
+ANSWERED = "answered"
+RESET = "reset"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    name: str
+    data: dict
+
+    def encode(self):
+        return f"id: {self.id}\nevent: {self.name}\ndata: {json.dumps(self.data, cls=DjangoJSONEncoder)}\n\n"
+
+
+@dataclass(eq=False)
+class Subscription:
+    group_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(settings.EVENT_REPLAY_SIZE))
+
+
+class LocalBroker:
+    def __init__(self):
+        # Ids are "<process epoch>-<sequence>", so an id from another process
+        # or an earlier run is never mistaken for one of ours.
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.buffers = defaultdict(lambda: deque(maxlen=settings.EVENT_REPLAY_SIZE))
+        # Sequence of the last event each group's buffer dropped.
+        self.dropped = defaultdict(int)
+        self.subscriptions = defaultdict(set)
+        # Publishers run in request threads, subscribers on the event loop.
+        self.lock = threading.Lock()
+
+    def event_id(self, sequence):
+        return f"{self.epoch}-{sequence}"
+
+    def parse(self, event_id):
+        epoch, _, sequence = (event_id or "").partition("-")
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+            return None
+        return int(sequence)
+
+    def publish(self, group_id, name, data):
+        with self.lock:
+            self.sequence += 1
+            buffer = self.buffers[group_id]
+            if len(buffer) == buffer.maxlen:
+                self.dropped[group_id] = buffer[0][0]
+            event = Event(self.event_id(self.sequence), name, data)
+            buffer.append((self.sequence, event))
+            subscriptions = list(self.subscriptions.get(group_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(self._deliver, subscription, event)
+        return event
+
+    def _deliver(self, subscription, event):
+        queue = subscription.queue
+        if queue.full():
+            # A stream this far behind resyncs instead of holding events.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(Event(event.id, RESET, {}))
+        else:
+            queue.put_nowait(event)
+
+    def subscribe(self, group_id, last_event_id=None):
+        """
+        Start receiving the group's events on the running loop. Returns the
+        subscription and the events to send first: those after
+        ``last_event_id``, or a reset event if they can't all be replayed.
+        """
+        subscription = Subscription(group_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions[group_id].add(subscription)
+            if last_event_id is None:
+                return subscription, []
+            sequence = self.parse(last_event_id)
+            if sequence is None or sequence < self.dropped[group_id]:
+                return subscription, [Event(self.event_id(self.sequence), RESET, {})]
+            return subscription, [event for n, event in self.buffers.get(group_id, ()) if n > sequence]
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions[subscription.group_id].discard(subscription)
+            if not self.subscriptions[subscription.group_id]:
+                del self.subscriptions[subscription.group_id]
+
+
+broker = LocalBroker()
+
+
+def publish_on_commit(events):
+    """Publish ``(group_id, name, data)`` events once the current transaction commits."""
+    events = list(events)
+
+    def publish():
+        for group_id, name, data in events:
+            broker.publish(group_id, name, data)
+    if events:
+        transaction.on_commit(publish)
+
+
+def shared(items):
+    """Announce new GroupFeedItems."""
+    publish_on_commit(
+        (item.group_id, SHARED, {
+            "prayer_request": item.prayer_request_id,
+            "author": item.author,
+            "snippet": item.snippet,
+            "datetime": item.datetime,
+        })
+        for item in items
+    )
+
+
+def answered(prayer_request, group_ids):
+    publish_on_commit((group_id, ANSWERED, {"prayer_request": prayer_request.pk}) for group_id in group_ids)
+
+
+async def stream(group_id, last_event_id=None):
+    """Encoded events for a StreamingHttpResponse, with a comment line as heartbeat."""
+    subscription, backlog = broker.subscribe(group_id, last_event_id)
+    try:
+        yield f"retry: {settings.EVENT_RETRY_MILLISECONDS}\n\n"
+        for event in backlog:
+            yield event.encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+            else:
+                yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,92 @@
+"""
+Streaming export of a user's prayer journal.
+
+Rows are produced from chunked ``iterator()`` queries and encoded one line at a
+time, so memory use does not depend on the size of the account and the first
+bytes go out before the last rows are read. Hot and archived requests (see
+app/archive.py) are merged in datetime order.
+
+Under ASGI Django reads a sync iterator into a list before sending any of it,
+so the async view streams ``aiterate()`` over the lines instead.
+"""
+import csv
+import datetime
+import heapq
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import ArchivedGroupPrayerManager, ArchivedPrayerRequest, GroupPrayerManager, PrayerRequest
+
+FIELDS = ["id", "datetime", "content", "answered", "groups", "answer_datetime", "answer"]
+
+
+def _tier_rows(prayer_requests, shares, chunk_size):
+    prayer_requests = (
+        prayer_requests.select_related("answeredprayer")
+        .prefetch_related(Prefetch("groupprayermanager_set", queryset=shares.select_related("group")))
+        .order_by("datetime", "id")
+    )
+    for prayer_request in prayer_requests.iterator(chunk_size=chunk_size):
+        answer = getattr(prayer_request, "answeredprayer", None)
+        yield {
+            "id": prayer_request.id,
+            "datetime": prayer_request.datetime,
+            "content": prayer_request.content,
+            "answered": prayer_request.answered,
+            "groups": [share.group.name for share in prayer_request.groupprayermanager_set.all()],
+            "answer_datetime": answer.datetime if answer else None,
+            "answer": answer.content if answer else None,
+        }
+
+
+def journal_rows(user, chunk_size=2000):
+    return heapq.merge(
+        _tier_rows(PrayerRequest.objects.filter(user=user), GroupPrayerManager.objects.all(), chunk_size),
+        _tier_rows(ArchivedPrayerRequest.objects.filter(user=user), ArchivedGroupPrayerManager.objects.all(), chunk_size),
+        key=lambda row: (row["datetime"], row["id"]),
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        row = {**row, "groups": "; ".join(row["groups"])}
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+class _JSONEncoder(DjangoJSONEncoder):
+    # Keep microseconds (DjangoJSONEncoder rounds to milliseconds) so an
+    # export can be re-imported without changing timestamps.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=_JSONEncoder) + "\n"
+
+
+FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "jsonl": (jsonl_lines, "application/x-ndjson"),
+}
+
+
+async def aiterate(lines, batch_size=500):
+    """Stream sync ``lines`` from an async view, reading ``batch_size`` at a time in the ORM's thread."""
+    lines = iter(lines)
+    read = sync_to_async(lambda: list(islice(lines, batch_size)))
+    while batch := await read():
+        yield "".join(batch)
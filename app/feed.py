@@ -0,0 +1,122 @@
+"""
+Fan-out-on-write maintenance of the GroupFeedItem table.
+
+Group pages are read far more often than requests are written, so every write
+that changes what a group sees copies (or removes) the rows here and
+GroupDetailView reads a single group's slice without joins.
+"""
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils.text import Truncator
+
+from . import caching, changes, counters, events
+from .models import GroupFeedItem, GroupPrayerManager
+
+SNIPPET_LENGTH = GroupFeedItem._meta.get_field("snippet").max_length
+
+
+def build_feed_item(prayer_request, group_id, author=None):
+    return GroupFeedItem(
+        group_id=group_id,
+        prayer_request=prayer_request,
+        author=author or prayer_request.user.username,
+        snippet=Truncator(prayer_request.content).chars(SNIPPET_LENGTH),
+        datetime=prayer_request.datetime,
+    )
+
+
+def add_shares(shares):
+    """
+    Write the GroupPrayerManager rows for ``(prayer_request, groups)`` pairs
+    with one bulk insert, without the feed rows and counters that follow
+    from them (see ``share_many``). Returns the new rows.
+    """
+    managers, scopes = [], set()
+    for prayer_request, groups in shares:
+        scopes.add(caching.user_scope(prayer_request.user_id))
+        scopes.update(caching.group_scope(group.pk) for group in groups)
+        managers.extend(GroupPrayerManager(prayer_request=prayer_request, group_id=group.pk) for group in groups)
+    GroupPrayerManager.objects.bulk_create(managers)
+    # bulk_create sends no post_save signals, so log the shares and evict
+    # the authors' and groups' cached pages here.
+    changes.shares_added(managers)
+    caching.invalidate(*scopes)
+    return managers
+
+
+def fan_out_shares(managers):
+    """
+    Add the open requests of new shares (with prayer_request loaded) to their
+    groups' feeds. ``add_shares`` has evicted the groups' pages already, and
+    group pages are keyed by their feed's stamp, so this evicts nothing and
+    can run in the job worker.
+    """
+    items = [
+        build_feed_item(manager.prayer_request, manager.group_id)
+        for manager in managers
+        if not manager.prayer_request.answered
+    ]
+    GroupFeedItem.objects.bulk_create(items)
+    return items
+
+
+def share_many(shares):
+    """
+    Share requests with groups. ``shares`` is an iterable of
+    ``(prayer_request, groups)`` pairs; the GroupPrayerManager and feed rows
+    for all of them are written with one bulk insert each.
+    """
+    managers = add_shares(shares)
+    events.shared(fan_out_shares(managers))
+    counters.shares_added(managers)
+    return managers
+
+
+def share(prayer_request, groups):
+    return share_many([(prayer_request, groups)])
+
+
+def fan_out(prayer_request, groups):
+    """Add an unanswered request to the feeds of ``groups``."""
+    if prayer_request.answered:
+        return []
+    items = [build_feed_item(prayer_request, group.pk) for group in groups]
+    GroupFeedItem.objects.bulk_create(items)
+    events.shared(items)
+    caching.invalidate(*(caching.group_scope(group.pk) for group in groups))
+    return items
+
+
+def withdraw(prayer_request):
+    """Remove a request from every group feed, e.g. once it is answered. Returns the groups' ids."""
+    items = GroupFeedItem.objects.filter(prayer_request=prayer_request)
+    group_ids = list(items.values_list("group_id", flat=True))
+    items.delete()
+    return group_ids
+
+
+def rebuild(group_ids=None, batch_size=1000):
+    """Recreate feed rows from GroupPrayerManager. Returns the number of rows written."""
+    shares = GroupPrayerManager.objects.filter(prayer_request__answered=False)
+    feed = GroupFeedItem.objects.all()
+    if group_ids is not None:
+        shares = shares.filter(group_id__in=group_ids)
+        feed = feed.filter(group_id__in=group_ids)
+    shares = shares.select_related("prayer_request__user").order_by("pk")
+
+    written = 0
+    with transaction.atomic():
+        feed.delete()
+        batch = []
+        for share in shares.iterator(chunk_size=batch_size):
+            batch.append(build_feed_item(share.prayer_request, share.group_id))
+            if len(batch) >= batch_size:
+                GroupFeedItem.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        GroupFeedItem.objects.bulk_create(batch)
+        written += len(batch)
+    if group_ids is None:
+        group_ids = Group.objects.values_list("id", flat=True)
+    caching.invalidate(*(caching.group_scope(group_id) for group_id in group_ids))
+    return written
@@ -1,13 +1,16 @@
+import re
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User, Group
+from . import membership
 from .models import AnsweredPrayer, PrayerRequest
 
 class PrayerRequestForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user")
         forms.ModelForm.__init__(self, *args, **kwargs)
-        self.fields['groups'].queryset = Group.objects.filter(user=user)
+        self.fields['groups'].queryset = Group.objects.filter(id__in=membership.group_ids(user))
         self.fields['groups'].widget.attrs.update({'class': 'group-selection'})
         self.fields['content'].widget.attrs.update({'class': 'prayer-content'})
 
@@ -23,7 +26,21 @@ class RegistrationForm(UserCreationForm):
 
 
 class AddMemberForm(forms.Form):
-    username = forms.CharField()
+    max_usernames = 100
+
+    username = forms.CharField(
+        label="Usernames",
+        help_text="Separate several usernames with commas or spaces.",
+        widget=forms.TextInput(attrs={"autocomplete": "off"}),
+    )
+
+    def clean_username(self):
+        usernames = list(dict.fromkeys(name for name in re.split(r"[\s,]+", self.cleaned_data["username"]) if name))
+        if not usernames:
+            raise forms.ValidationError("Enter at least one username.")
+        if len(usernames) > self.max_usernames:
+            raise forms.ValidationError(f"At most {self.max_usernames} usernames at a time.")
+        return usernames
 
 
 class DeleteForm(forms.Form): 
@@ -0,0 +1,150 @@
+"""
+Database-backed queue for work that doesn't need to hold up the request that
+caused it. The jobs themselves are in app/tasks.py.
+
+Views ``enqueue`` jobs inside their writing transaction, so a job exists if
+and only if its write committed. ``manage.py run_worker``, the Procfile's
+worker process, runs them with nothing but the database:
+
+- the worker claims due jobs in batches by leasing them. A claimed job is
+  hidden from other claims for ``JOB_LEASE_SECONDS``, so the jobs of a worker
+  that died are claimed again once that runs out;
+- the jobs of one name in a batch go to a single handler call, inside one
+  transaction that also marks them done, so their writes land exactly once.
+  If the batch fails, its jobs run one at a time, and a job that fails is
+  retried with exponential backoff until it has been tried
+  ``JOB_MAX_ATTEMPTS`` times;
+- a job enqueued with an idempotency key that is already in the table is
+  dropped, for as long as finished jobs are kept (``JOB_RETENTION_DAYS``).
+"""
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+HANDLERS = {}
+
+
+def handler(name):
+    """Register ``function(payloads)`` to run the jobs called ``name``, a batch at a time."""
+    def register(function):
+        HANDLERS[name] = function
+        return function
+    return register
+
+
+def enqueue(name, payload, key=None):
+    """Queue a job in the current transaction; a duplicate ``key`` is ignored."""
+    enqueue_many(name, [(payload, key)])
+
+
+def enqueue_many(name, entries):
+    """Queue ``(payload, key)`` jobs with one insert, like ``enqueue``."""
+    if name not in HANDLERS:
+        raise ValueError(f"No handler for job {name!r}")
+    jobs = [Job(name=name, payload=payload, key=key) for payload, key in entries]
+    Job.objects.bulk_create(jobs, ignore_conflicts=any(job.key is not None for job in jobs))
+
+
+def claim(limit):
+    """Lease up to ``limit`` due jobs, oldest first."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Job.objects.filter(status=PENDING, run_at__lte=now)
+    ids = list(due.order_by("run_at", "id").values_list("id", flat=True)[:limit])
+    # The filter is repeated, so of two workers claiming the same job one wins.
+    due.filter(id__in=ids).update(
+        claimed_by=token,
+        attempts=F("attempts") + 1,
+        run_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    )
+    return list(Job.objects.filter(claimed_by=token).order_by("id"))
+
+
+def execute(name, batch):
+    with transaction.atomic():
+        HANDLERS[name]([job.payload for job in batch])
+        Job.objects.filter(id__in=[job.id for job in batch]).update(status=DONE, finished_at=timezone.now(), error="")
+
+
+def retry_or_fail(job):
+    error = traceback.format_exc()
+    logger.exception("Job %s (%s) failed on attempt %s", job.id, job.name, job.attempts)
+    now = timezone.now()
+    if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+        Job.objects.filter(id=job.id).update(status=FAILED, finished_at=now, error=error)
+    else:
+        delay = settings.JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        Job.objects.filter(id=job.id).update(run_at=now + timedelta(seconds=delay), error=error)
+
+
+def run(jobs):
+    """Run claimed jobs, one handler call per name. Returns how many succeeded."""
+    batches = defaultdict(list)
+    for job in jobs:
+        batches[job.name].append(job)
+    done = 0
+    for name, batch in batches.items():
+        try:
+            execute(name, batch)
+            done += len(batch)
+            continue
+        except Exception:
+            if len(batch) == 1:
+                retry_or_fail(batch[0])
+                continue
+        # Find the failing jobs without holding back the rest.
+        for job in batch:
+            try:
+                execute(name, [job])
+                done += 1
+            except Exception:
+                retry_or_fail(job)
+    return done
+
+
+def run_pending(batch_size=None):
+    """Run due jobs until none are left; retries that aren't due yet wait. Returns how many succeeded."""
+    batch_size = batch_size or settings.JOB_BATCH_SIZE
+    done = 0
+    while jobs := claim(batch_size):
+        done += run(jobs)
+    return done
+
+
+def backlog():
+    """
+    How far behind the worker is: the pending and failed job counts and the
+    age in seconds of the oldest job that is due, None when none is.
+    """
+    now = timezone.now()
+    counts = dict(
+        Job.objects.filter(status__in=[PENDING, FAILED])
+        .values("status").annotate(n=Count("id")).order_by().values_list("status", "n")
+    )
+    oldest = Job.objects.filter(status=PENDING, run_at__lte=now).aggregate(oldest=Min("run_at"))["oldest"]
+    return {
+        "pending": counts.get(PENDING, 0),
+        "failed": counts.get(FAILED, 0),
+        "oldest_due_seconds": round((now - oldest).total_seconds()) if oldest else None,
+    }
+
+
+def prune():
+    """Delete jobs finished more than ``JOB_RETENTION_DAYS`` ago, which frees their keys."""
+    before = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    return Job.objects.filter(finished_at__lt=before).delete()[0]
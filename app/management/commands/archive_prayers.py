@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import archive
+
+
+class Command(BaseCommand):
+    help = "Move answered prayer requests, with their shares and answers, to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help=f"Archive requests answered more than this many days ago (default {settings.ARCHIVE_AFTER_DAYS}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Requests moved per transaction.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 0:
+            raise CommandError("--days can't be negative.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        archived = 0
+        for archived in archive.archive_before(archive.cutoff(options["days"]), options["batch_size"]):
+            self.stdout.write(f"{archived} prayer requests archived")
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} prayer requests."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import assets
+
+
+class Command(BaseCommand):
+    help = "Build the minified CSS/JS bundles and the icon sprite into app/static/app/build/."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Fail if the committed build is out of date instead of writing it.")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            stale = assets.stale()
+            if stale:
+                raise CommandError(f"Stale asset build, run manage.py build_assets: {', '.join(stale)}")
+            self.stdout.write(self.style.SUCCESS("Asset build is up to date."))
+            return
+        sizes = assets.build()
+        for path, size in sorted(sizes.items()):
+            self.stdout.write(f"{path}: {size:,} bytes")
+        self.stdout.write(self.style.SUCCESS(f"Built {len(sizes)} files."))
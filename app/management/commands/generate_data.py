@@ -0,0 +1,130 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app import changes, counters, feed, membership
+from app.models import AnsweredPrayer, PrayerRequest
+
+WORDS = (
+    "pray for my family health job healing peace strength guidance wisdom comfort "
+    "mother father sister brother friend neighbour church pastor surgery recovery "
+    "exam travel safety provision patience courage grief hope joy marriage children "
+    "work interview rain harvest school faith trust rest sleep anxiety direction"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, groups, memberships, prayer requests, shares and answers with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--groups", type=int, default=10)
+        parser.add_argument("--groups-per-user", type=int, default=2, help="Memberships per user.")
+        parser.add_argument("--prayers-per-user", type=int, default=20)
+        parser.add_argument("--shares-per-prayer", type=int, default=1, help="Groups each request is shared with, among the author's groups.")
+        parser.add_argument("--answered-ratio", type=float, default=0.3)
+        parser.add_argument("--prefix", default="generated", help="Prefix of the generated usernames and group names.")
+        parser.add_argument("--password", help="Password for the generated users (default: unusable).")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not 0 <= options["answered_ratio"] <= 1:
+            raise CommandError("--answered-ratio must be between 0 and 1.")
+        if options["groups_per_user"] > options["groups"]:
+            raise CommandError("--groups-per-user can't exceed --groups.")
+        prefix = options["prefix"]
+        if User.objects.filter(username__startswith=f"{prefix}-user-").exists():
+            raise CommandError(f"Users named {prefix}-user-* already exist; pick another --prefix.")
+        self.random = random.Random(options["seed"])
+        self.options = options
+        self.rows = 0
+        self.started = time.monotonic()
+
+        with transaction.atomic():
+            password = make_password(options["password"])
+            users = User.objects.bulk_create(
+                (User(username=f"{prefix}-user-{i}", password=password) for i in range(options["users"])),
+                batch_size=options["batch_size"],
+            )
+            groups = Group.objects.bulk_create(
+                (Group(name=f"{prefix}-group-{i}") for i in range(options["groups"])),
+                batch_size=options["batch_size"],
+            )
+            user_groups = {user.pk: self.random.sample(groups, options["groups_per_user"]) for user in users}
+            User.groups.through.objects.bulk_create(
+                (
+                    User.groups.through(user_id=user_id, group_id=group.pk)
+                    for user_id, member_of in user_groups.items()
+                    for group in member_of
+                ),
+                batch_size=options["batch_size"],
+            )
+            # bulk_create sends no m2m_changed, so drop any cached ids and
+            # count and log the members by hand.
+            membership.invalidate(user_groups)
+            pairs = [(user_id, group.pk) for user_id, member_of in user_groups.items() for group in member_of]
+            counters.memberships_changed(pairs, 1)
+            changes.memberships_changed(pairs, 1)
+        self.rows += len(users) + len(groups) + sum(map(len, user_groups.values()))
+
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) * options["prayers_per_user"] >= options["batch_size"]:
+                self.generate_prayers(batch, user_groups)
+                batch = []
+        if batch:
+            self.generate_prayers(batch, user_groups)
+        self.stdout.write(self.style.SUCCESS(f"Generated {self.rows} rows in {time.monotonic() - self.started:.1f}s."))
+
+    def content(self):
+        return " ".join(self.random.choices(WORDS, k=self.random.randint(5, 40))).capitalize() + "."
+
+    def generate_prayers(self, users, user_groups):
+        options = self.options
+        now = timezone.now()
+        records = []
+        for user in users:
+            for _ in range(options["prayers_per_user"]):
+                created = now - timedelta(seconds=self.random.randint(0, 365 * 24 * 3600))
+                answered = self.random.random() < options["answered_ratio"]
+                shares = min(options["shares_per_prayer"], len(user_groups[user.pk]))
+                records.append((user, created, answered, self.random.sample(user_groups[user.pk], shares)))
+
+        with transaction.atomic():
+            prayer_requests = PrayerRequest.objects.bulk_create(
+                PrayerRequest(user=user, content=self.content(), answered=answered)
+                for user, _, answered, _ in records
+            )
+            # auto_now_add overwrites datetime on insert; spread them over a year.
+            for prayer_request, (_, created, _, _) in zip(prayer_requests, records):
+                prayer_request.datetime = created
+            PrayerRequest.objects.bulk_update(prayer_requests, ["datetime"], batch_size=options["batch_size"])
+
+            answers = AnsweredPrayer.objects.bulk_create(
+                AnsweredPrayer(prayer_request=prayer_request, content=self.content())
+                for prayer_request in prayer_requests
+                if prayer_request.answered
+            )
+            for answer in answers:
+                answer.datetime = answer.prayer_request.datetime + timedelta(
+                    seconds=self.random.randint(0, max(int((now - answer.prayer_request.datetime).total_seconds()), 0))
+                )
+            AnsweredPrayer.objects.bulk_update(answers, ["datetime"], batch_size=options["batch_size"])
+            counters.prayer_requests_added(prayer_requests, answers)
+
+            shares = feed.share_many(
+                (prayer_request, groups) for prayer_request, (_, _, _, groups) in zip(prayer_requests, records)
+            )
+            changes.prayer_requests_added(prayer_requests, answers)
+
+        self.rows += len(prayer_requests) + len(answers) + len(shares)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f"{self.rows} rows, {self.rows / elapsed if elapsed else 0:,.0f} rows/s")
@@ -0,0 +1,157 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app import changes, feed, tasks
+from app.models import AnsweredPrayer, PrayerRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Import prayer requests from a JSONL file (one request per line, the same "
+        "shape as export_journal --format jsonl plus a \"user\" key)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file to read, or - for stdin.")
+        parser.add_argument("--user", help="Username for records without a \"user\" key.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--create-missing",
+            action="store_true",
+            help="Create unknown users (with unusable passwords) and groups instead of failing.",
+        )
+
+    def handle(self, *args, **options):
+        self.default_user = options["user"]
+        self.create_missing = options["create_missing"]
+        self.users = {}
+        self.groups = {}
+        self.imported = 0
+        self.rows = 0
+        self.started = time.monotonic()
+
+        source = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        try:
+            records = self.parse(source)
+            while batch := list(islice(records, options["batch_size"])):
+                self.import_batch(batch)
+                self.report()
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(self.style.SUCCESS(f"Imported {self.imported} prayer requests ({self.rows} rows)."))
+
+    def parse(self, lines):
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                username = record.get("user", self.default_user)
+                content = record["content"]
+                if not isinstance(username, str) or not username or not isinstance(content, str):
+                    raise ValueError("user and content are required strings")
+                answer = record.get("answer")
+                if answer is not None and not isinstance(answer, str):
+                    raise ValueError("answer must be a string")
+                groups = record.get("groups") or []
+                if not isinstance(groups, list) or not all(isinstance(name, str) and name for name in groups):
+                    raise ValueError("groups must be a list of group names")
+                yield {
+                    "user": username,
+                    "content": content,
+                    "datetime": self.parse_datetime(record.get("datetime")),
+                    "answered": bool(record.get("answered")) or answer is not None,
+                    "groups": list(dict.fromkeys(groups)),
+                    "answer": answer,
+                    "answer_datetime": self.parse_datetime(record.get("answer_datetime")),
+                }
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise CommandError(f"line {line_number}: {e} ({self.imported} requests already imported)")
+
+    def parse_datetime(self, value):
+        if value is None:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"invalid datetime {value!r}")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def resolve(self, batch):
+        usernames = {record["user"] for record in batch} - self.users.keys()
+        group_names = {name for record in batch for name in record["groups"]} - self.groups.keys()
+        if usernames:
+            self.users.update((user.username, user) for user in User.objects.filter(username__in=usernames).only("id", "username"))
+            missing = usernames - self.users.keys()
+            if missing and not self.create_missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))} ({self.imported} requests already imported)")
+            for user in User.objects.bulk_create(User(username=name, password=make_password(None)) for name in missing):
+                self.users[user.username] = user
+        if group_names:
+            self.groups.update((group.name, group) for group in Group.objects.filter(name__in=group_names))
+            missing = group_names - self.groups.keys()
+            if missing and not self.create_missing:
+                raise CommandError(f"Unknown groups: {', '.join(sorted(missing))} ({self.imported} requests already imported)")
+            for group in Group.objects.bulk_create(Group(name=name) for name in missing):
+                self.groups[group.name] = group
+
+    def import_batch(self, batch):
+        with transaction.atomic():
+            self.resolve(batch)
+            prayer_requests = PrayerRequest.objects.bulk_create(
+                PrayerRequest(user=self.users[record["user"]], content=record["content"], answered=record["answered"])
+                for record in batch
+            )
+            # auto_now_add overwrites datetime on insert, so restore the
+            # source timestamps with one UPDATE per batch.
+            dated = []
+            for prayer_request, record in zip(prayer_requests, batch):
+                if record["datetime"]:
+                    prayer_request.datetime = record["datetime"]
+                    dated.append(prayer_request)
+            PrayerRequest.objects.bulk_update(dated, ["datetime"])
+
+            answered = [
+                (prayer_request, record)
+                for prayer_request, record in zip(prayer_requests, batch)
+                if record["answer"] is not None
+            ]
+            answers = AnsweredPrayer.objects.bulk_create(
+                AnsweredPrayer(prayer_request=prayer_request, content=record["answer"])
+                for prayer_request, record in answered
+            )
+            dated = []
+            for answer, (_, record) in zip(answers, answered):
+                if record["answer_datetime"]:
+                    answer.datetime = record["answer_datetime"]
+                    dated.append(answer)
+            AnsweredPrayer.objects.bulk_update(dated, ["datetime"])
+
+            # The feed fan-out and counters are left to the worker, as for
+            # requests added on the site (app/tasks.py).
+            shares = [
+                (prayer_request, [self.groups[name] for name in record["groups"]])
+                for prayer_request, record in zip(prayer_requests, batch)
+            ]
+            managers = feed.add_shares(shares)
+            changes.prayer_requests_added(prayer_requests, answers)
+            tasks.prayer_requests_added(shares, answers)
+
+        self.imported += len(prayer_requests)
+        self.rows += len(prayer_requests) + len(answers) + len(managers)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        self.stdout.write(f"{self.imported} prayer requests imported, {self.rows} rows, {rate:,.0f} rows/s")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app import feed
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized group feed table from GroupPrayerManager rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", type=int, action="append", dest="groups", help="Only rebuild this group id (repeatable).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = feed.rebuild(group_ids=options["groups"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} group feed rows."))
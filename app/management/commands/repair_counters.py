@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from scratch, report any drift and fix it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the drift.")
+
+    def handle(self, *args, **options):
+        drift = counters.repair(fix=not options["dry_run"])
+        for scope, name, stored, expected in drift:
+            self.stdout.write(f"{scope} {name}: stored {stored}, expected {expected}")
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("No drift."))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} counters drifted."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} counters."))
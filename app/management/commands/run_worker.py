@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import jobs
+
+# How often an idle worker deletes old finished jobs.
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Run queued follow-up jobs (see app/jobs.py) as they come in."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due, then exit.")
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.JOB_BATCH_SIZE,
+            help=f"Jobs claimed at a time (default {settings.JOB_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.JOB_POLL_SECONDS,
+            help=f"Seconds to wait when no job is due (default {settings.JOB_POLL_SECONDS}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        if options["poll_interval"] <= 0:
+            raise CommandError("--poll-interval must be positive.")
+        pruned_at = 0
+        while True:
+            claimed = jobs.claim(options["batch_size"])
+            if claimed:
+                done = jobs.run(claimed)
+                self.stdout.write(f"{done} of {len(claimed)} jobs done")
+                continue
+            if options["once"]:
+                return
+            if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                jobs.prune()
+                pruned_at = time.monotonic()
+            time.sleep(options["poll_interval"])
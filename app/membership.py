@@ -0,0 +1,79 @@
+"""
+Group membership lookups shared by the views and forms.
+
+A user's group ids are memoized on the user object for the rest of the
+request and cached across requests in the default cache. The cache entry is
+dropped whenever the user's memberships change (see app/signals.py). They
+decide who may see a group, so with a per-process (locmem) cache, where
+dropping the entry wouldn't reach the other processes, they are only
+memoized per request.
+
+Adding members looks usernames up by prefix, ignoring ASCII case, with a range
+over the LOWER(username) index (migration 0008), cached briefly per prefix.
+"""
+import re
+import string
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.functions import Lower
+
+# What UnicodeUsernameValidator accepts, so a prefix is also a safe cache key.
+USERNAME_PREFIX = re.compile(r"^[\w.@+-]{1,150}$")
+# SQLite's LOWER() only folds ASCII letters, so prefixes are lowercased the
+# same way to stay within what the index holds.
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _cache_key(user_id):
+    return f"group-ids:{user_id}"
+
+
+def _shared_cache():
+    return not isinstance(caches["default"], LocMemCache)
+
+
+def group_ids(user):
+    ids = getattr(user, "_group_ids", None)
+    if ids is None:
+        shared = _shared_cache()
+        ids = cache.get(_cache_key(user.pk)) if shared else None
+        if ids is None:
+            ids = frozenset(user.groups.values_list("id", flat=True))
+            if shared:
+                cache.set(_cache_key(user.pk), ids, settings.MEMBERSHIP_CACHE_TIMEOUT)
+        user._group_ids = ids
+    return ids
+
+
+def is_member(user, group_id):
+    try:
+        return int(group_id) in group_ids(user)
+    except (TypeError, ValueError):
+        return False
+
+
+def invalidate(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def username_suggestions(prefix, limit=10):
+    """Up to ``limit`` usernames starting with ``prefix``, ignoring ASCII case, in that order."""
+    prefix = prefix.strip().translate(ASCII_LOWER)
+    if not USERNAME_PREFIX.match(prefix):
+        return []
+    key = f"usernames:{limit}:{prefix}"
+    usernames = cache.get(key)
+    if usernames is None:
+        usernames = list(
+            User.objects.annotate(username_lower=Lower("username"))
+            # A range rather than LIKE, which SQLite won't run on an index
+            # while it is case-insensitive.
+            .filter(username_lower__gte=prefix, username_lower__lt=prefix + "\U0010ffff")
+            .order_by("username_lower")
+            .values_list("username", flat=True)[:limit]
+        )
+        cache.set(key, usernames, settings.USERNAME_SUGGESTION_CACHE_TIMEOUT)
+    return usernames
@@ -0,0 +1,66 @@
+import random
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+from . import profiling, routers
+
+STICKY_SESSION_KEY = "_primary_until"
+
+
+class ReplicaReadMiddleware(MiddlewareMixin):
+    """
+    Route the ORM reads of safe requests to views marked ``read_from_replica``
+    to the replica. For a short window after a successful write to a view
+    marked ``writes_app_data`` the same user keeps reading from the primary,
+    so they see their own changes. Other writes (logging in or out,
+    registering) leave the session alone.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        request.writes_app_data = getattr(view_class, "writes_app_data", False)
+        routers.set_replica_reads(
+            request.method in ("GET", "HEAD")
+            and getattr(view_class, "read_from_replica", False)
+            and request.session.get(STICKY_SESSION_KEY, 0) < time.time()
+        )
+
+    def process_response(self, request, response):
+        routers.set_replica_reads(False)
+        if (
+            getattr(request, "writes_app_data", False)
+            and request.method not in ("GET", "HEAD", "OPTIONS")
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            request.session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+        return response
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Profile a sample of requests (PROFILING_SAMPLE_RATE) to ``app:`` views;
+    see app/profiling.py. Unsampled requests only pay for one random() call.
+    """
+
+    def process_request(self, request):
+        request.profile = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            request.profile = profiling.start()
+
+    def process_template_response(self, request, response):
+        if getattr(request, "profile", None):
+            profiling.time_render(request.profile, response)
+        return response
+
+    def process_response(self, request, response):
+        profile = getattr(request, "profile", None)
+        if profile is None:
+            return response
+        profiling.stop()
+        match = request.resolver_match
+        if match and match.view_name.startswith("app:"):
+            response["Server-Timing"] = profiling.finish(profile, match.view_name, response)
+        return response
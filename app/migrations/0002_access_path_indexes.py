@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answeredprayer',
+            name='prayer_request',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='app.prayerrequest'),
+        ),
+        migrations.AlterField(
+            model_name='groupprayermanager',
+            name='group',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='auth.group'),
+        ),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(fields=['user', 'answered', '-datetime', '-id'], name='prayer_user_answered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(condition=models.Q(('answered', False)), fields=['user', '-datetime', '-id'], name='prayer_user_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupprayermanager',
+            constraint=models.UniqueConstraint(fields=('group', 'prayer_request'), name='unique_group_prayer_request'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def backfill_group_feed(apps, schema_editor):
+    GroupPrayerManager = apps.get_model("app", "GroupPrayerManager")
+    GroupFeedItem = apps.get_model("app", "GroupFeedItem")
+    shares = GroupPrayerManager.objects.filter(prayer_request__answered=False).select_related("prayer_request__user")
+    GroupFeedItem.objects.bulk_create(
+        (
+            GroupFeedItem(
+                group_id=share.group_id,
+                prayer_request_id=share.prayer_request_id,
+                author=share.prayer_request.user.username,
+                snippet=Truncator(share.prayer_request.content).chars(500),
+                datetime=share.prayer_request.datetime,
+            )
+            for share in shares.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_access_path_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupFeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.CharField(max_length=150)),
+                ('snippet', models.CharField(max_length=500)),
+                ('datetime', models.DateTimeField()),
+                ('group', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='auth.group')),
+                ('prayer_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.prayerrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', '-datetime', '-id'], name='feed_group_datetime_idx')],
+                'constraints': [models.UniqueConstraint(fields=('group', 'prayer_request'), name='unique_feed_group_prayer_request')],
+            },
+        ),
+        migrations.RunPython(backfill_group_feed, migrations.RunPython.noop),
+    ]
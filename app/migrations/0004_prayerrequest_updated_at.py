@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    PrayerRequest = apps.get_model("app", "PrayerRequest")
+    PrayerRequest.objects.update(updated_at=models.F("datetime"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_group_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prayerrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(fields=['user', 'updated_at'], name='prayer_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:20
+
+from django.db import migrations
+
+# FTS5 index over prayer requests and their answers, keyed by prayer request
+# id. The scope column holds a "u<user id>" token plus a "g<group id>" token
+# for every group an open request is shared with, so a search matches only
+# what the user may see without ranking everyone else's rows.
+#
+# Triggers keep the index in sync, including for bulk_create and raw SQL writes
+# that send no signals. Dropping a table drops its triggers, so a later
+# migration that makes Django rebuild one of these tables must recreate them.
+# Other backends skip all of this and app/search.py falls back to icontains.
+SCOPE_SQL = """(
+    SELECT 'u' || p.user_id || CASE WHEN p.answered THEN '' ELSE COALESCE(
+        (SELECT group_concat(' g' || s.group_id, '') FROM app_groupprayermanager s WHERE s.prayer_request_id = p.id), ''
+    ) END
+    FROM app_prayerrequest p WHERE p.id = {id}
+)"""
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE app_prayersearch USING fts5(
+        content, answer, scope, tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    INSERT INTO app_prayersearch (rowid, content, answer, scope)
+    SELECT r.id, r.content, COALESCE(a.content, ''), {SCOPE_SQL.format(id="r.id")}
+    FROM app_prayerrequest r LEFT JOIN app_answeredprayer a ON a.prayer_request_id = r.id
+    """,
+    f"""
+    CREATE TRIGGER app_prayersearch_request_insert AFTER INSERT ON app_prayerrequest BEGIN
+        INSERT INTO app_prayersearch (rowid, content, answer, scope)
+        VALUES (new.id, new.content, '', {SCOPE_SQL.format(id="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_prayersearch_request_update AFTER UPDATE OF content, answered, user_id ON app_prayerrequest BEGIN
+        UPDATE app_prayersearch SET content = new.content, scope = {SCOPE_SQL.format(id="new.id")}
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_request_delete AFTER DELETE ON app_prayerrequest BEGIN
+        DELETE FROM app_prayersearch WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_prayersearch_share_insert AFTER INSERT ON app_groupprayermanager BEGIN
+        UPDATE app_prayersearch SET scope = {SCOPE_SQL.format(id="new.prayer_request_id")}
+        WHERE rowid = new.prayer_request_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_prayersearch_share_delete AFTER DELETE ON app_groupprayermanager BEGIN
+        UPDATE app_prayersearch SET scope = {SCOPE_SQL.format(id="old.prayer_request_id")}
+        WHERE rowid = old.prayer_request_id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_answer_insert AFTER INSERT ON app_answeredprayer BEGIN
+        UPDATE app_prayersearch SET answer = new.content WHERE rowid = new.prayer_request_id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_answer_update AFTER UPDATE OF content ON app_answeredprayer BEGIN
+        UPDATE app_prayersearch SET answer = new.content WHERE rowid = new.prayer_request_id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_answer_delete AFTER DELETE ON app_answeredprayer BEGIN
+        UPDATE app_prayersearch SET answer = '' WHERE rowid = old.prayer_request_id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS app_prayersearch_answer_delete",
+    "DROP TRIGGER IF EXISTS app_prayersearch_answer_update",
+    "DROP TRIGGER IF EXISTS app_prayersearch_answer_insert",
+    "DROP TRIGGER IF EXISTS app_prayersearch_share_delete",
+    "DROP TRIGGER IF EXISTS app_prayersearch_share_insert",
+    "DROP TRIGGER IF EXISTS app_prayersearch_request_delete",
+    "DROP TRIGGER IF EXISTS app_prayersearch_request_update",
+    "DROP TRIGGER IF EXISTS app_prayersearch_request_insert",
+    "DROP TABLE IF EXISTS app_prayersearch",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            for sql in statements:
+                schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_prayerrequest_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Keep archived rows in the app_prayersearch index (migration 0005) under their
+# original ids. app.archive deletes the hot row, which drops its index entry,
+# before inserting the archived one. Archived requests are answered, so their
+# scope is only the owner's token.
+CREATE_SQL = [
+    """
+    CREATE TRIGGER app_prayersearch_archived_request_insert AFTER INSERT ON app_archivedprayerrequest BEGIN
+        INSERT INTO app_prayersearch (rowid, content, answer, scope)
+        VALUES (new.id, new.content, '', 'u' || new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_archived_request_update AFTER UPDATE OF content, user_id ON app_archivedprayerrequest BEGIN
+        UPDATE app_prayersearch SET content = new.content, scope = 'u' || new.user_id WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_archived_request_delete AFTER DELETE ON app_archivedprayerrequest BEGIN
+        DELETE FROM app_prayersearch WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_archived_answer_insert AFTER INSERT ON app_archivedansweredprayer BEGIN
+        UPDATE app_prayersearch SET answer = new.content WHERE rowid = new.prayer_request_id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_archived_answer_update AFTER UPDATE OF content ON app_archivedansweredprayer BEGIN
+        UPDATE app_prayersearch SET answer = new.content WHERE rowid = new.prayer_request_id;
+    END
+    """,
+    """
+    CREATE TRIGGER app_prayersearch_archived_answer_delete AFTER DELETE ON app_archivedansweredprayer BEGIN
+        UPDATE app_prayersearch SET answer = '' WHERE rowid = old.prayer_request_id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_answer_delete",
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_answer_update",
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_answer_insert",
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_request_delete",
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_request_update",
+    "DROP TRIGGER IF EXISTS app_prayersearch_archived_request_insert",
+    # The archived rows go with their tables.
+    "DELETE FROM app_prayersearch WHERE rowid IN (SELECT id FROM app_archivedprayerrequest)",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == "sqlite":
+            for sql in statements:
+                schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_prayer_search'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPrayerRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('datetime', models.DateTimeField()),
+                ('content', models.TextField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedGroupPrayerManager',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.group')),
+                ('prayer_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='groupprayermanager_set', to='app.archivedprayerrequest')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedAnsweredPrayer',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('datetime', models.DateTimeField()),
+                ('content', models.TextField()),
+                ('prayer_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='answeredprayer', to='app.archivedprayerrequest')),
+            ],
+        ),
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:32
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def backfill_counters(apps, schema_editor):
+    # The same numbers as app.counters.expected(), from the historical models.
+    PrayerRequest = apps.get_model("app", "PrayerRequest")
+    GroupPrayerManager = apps.get_model("app", "GroupPrayerManager")
+    Counter = apps.get_model("app", "Counter")
+    Membership = apps.get_model("auth", "User").groups.through
+    counts = defaultdict(int)
+    for row in PrayerRequest.objects.filter(answered=False).values("user_id").annotate(n=models.Count("id")).order_by():
+        counts[f"user:{row['user_id']}", "open"] = row["n"]
+    for name in ("AnsweredPrayer", "ArchivedAnsweredPrayer"):
+        months = (
+            apps.get_model("app", name).objects
+            .values(user_id=models.F("prayer_request__user_id"), month=TruncMonth("datetime"))
+            .annotate(n=models.Count("id"))
+            .order_by()
+        )
+        for row in months:
+            counts[f"user:{row['user_id']}", f"answered:{timezone.localtime(row['month']):%Y-%m}"] += row["n"]
+    shares = GroupPrayerManager.objects.filter(prayer_request__answered=False)
+    for row in shares.values("group_id").annotate(n=models.Count("id")).order_by():
+        counts[f"group:{row['group_id']}", "open"] = row["n"]
+    for row in Membership.objects.values("group_id").annotate(n=models.Count("id")).order_by():
+        counts[f"group:{row['group_id']}", "members"] = row["n"]
+    Counter.objects.bulk_create(
+        (Counter(scope=scope, name=name, value=value) for (scope, name), value in counts.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_archive_tier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=64)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'name'), name='unique_counter_scope_name')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
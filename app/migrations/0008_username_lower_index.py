@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:10
+
+from django.conf import settings
+from django.db import migrations
+
+# Expression index behind membership.username_suggestions(): a prefix range
+# over LOWER(username) is an index seek instead of a scan of auth_user. The
+# table belongs to django.contrib.auth, so the index can't be declared in
+# Meta.indexes and is created with raw SQL (valid on SQLite and PostgreSQL).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_username_lower_idx ON auth_user (LOWER(username))',
+            'DROP INDEX auth_user_username_lower_idx',
+        ),
+    ]
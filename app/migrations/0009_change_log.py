@@ -0,0 +1,66 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:12
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    # One entry per existing row and audience, as app.changes logs them, so
+    # a client syncing from cursor 0 gets everything. Both tiers.
+    Change = apps.get_model("app", "Change")
+    Membership = apps.get_model("auth", "User").groups.through
+
+    def entries(kind, object_id, user_id=None, group_ids=()):
+        if user_id is not None:
+            yield Change(kind=kind, object_id=object_id, user_id=user_id)
+        for group_id in group_ids:
+            yield Change(kind=kind, object_id=object_id, group_id=group_id)
+
+    def rows():
+        for prefix in ("", "Archived"):
+            PrayerRequest = apps.get_model("app", f"{prefix}PrayerRequest")
+            GroupPrayerManager = apps.get_model("app", f"{prefix}GroupPrayerManager")
+            AnsweredPrayer = apps.get_model("app", f"{prefix}AnsweredPrayer")
+            owners = dict(PrayerRequest.objects.values_list("id", "user_id"))
+            group_ids = defaultdict(list)
+            for share_id, prayer_request_id, group_id in GroupPrayerManager.objects.values_list("id", "prayer_request_id", "group_id"):
+                group_ids[prayer_request_id].append(group_id)
+                yield from entries("group_prayer_manager", share_id, owners[prayer_request_id], [group_id])
+            for prayer_request_id, user_id in owners.items():
+                yield from entries("prayer_request", prayer_request_id, user_id, group_ids[prayer_request_id])
+            for answer_id, prayer_request_id in AnsweredPrayer.objects.values_list("id", "prayer_request_id"):
+                yield from entries("answered_prayer", answer_id, owners[prayer_request_id], group_ids[prayer_request_id])
+        for user_id, group_id in Membership.objects.values_list("user_id", "group_id"):
+            yield from entries("membership", group_id, user_id)
+
+    Change.objects.bulk_create(rows(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_username_lower_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('group', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='auth.group')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='change_user_cursor_idx'), models.Index(fields=['group', 'id'], name='change_group_cursor_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import Group, User
     
 class PrayerRequest(models.Model):
@@ -6,6 +7,21 @@ class PrayerRequest(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     answered = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "answered", "-datetime", "-id"], name="prayer_user_answered_idx"),
+            # Partial index for the hot unanswered list; backends without
+            # partial index support skip it and fall back to the one above.
+            models.Index(
+                fields=["user", "-datetime", "-id"],
+                condition=models.Q(answered=False),
+                name="prayer_user_open_idx",
+            ),
+            # Covers the Max(updated_at)/Count version stamp of the list pages.
+            models.Index(fields=["user", "updated_at"], name="prayer_user_updated_idx"),
+        ]
 
     def __str__(self):
         return self.content
@@ -13,10 +29,125 @@ class PrayerRequest(models.Model):
 
 class GroupPrayerManager(models.Model):
     prayer_request = models.ForeignKey(PrayerRequest, on_delete=models.CASCADE)
-    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+    # Covered by the leading column of the unique constraint below.
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "prayer_request"], name="unique_group_prayer_request"),
+        ]
 
 
 class AnsweredPrayer(models.Model):
     datetime = models.DateTimeField(auto_now_add=True)
+    prayer_request = models.OneToOneField(PrayerRequest, on_delete=models.CASCADE)
+    content = models.TextField()
+
+
+# Denormalized copy of an unanswered request shared with a group. Maintained
+# on write by app.feed so group pages can be served without joins.
+class GroupFeedItem(models.Model):
+    # Covered by the leading column of the index and constraint below.
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, db_index=False)
     prayer_request = models.ForeignKey(PrayerRequest, on_delete=models.CASCADE)
+    author = models.CharField(max_length=150)
+    snippet = models.CharField(max_length=500)
+    datetime = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "-datetime", "-id"], name="feed_group_datetime_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["group", "prayer_request"], name="unique_feed_group_prayer_request"),
+        ]
+
+
+# Archive tier. Answered requests that have not changed for a while are moved
+# here by app.archive, with their shares and answer, so the tables above only
+# hold recent history. Rows keep their original ids, and the reverse accessors
+# mirror the hot models' so code reading either tier looks the same.
+class ArchivedPrayerRequest(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    datetime = models.DateTimeField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Only answered requests are archived.
+    answered = True
+
+    def __str__(self):
+        return self.content
+
+
+class ArchivedGroupPrayerManager(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    prayer_request = models.ForeignKey(ArchivedPrayerRequest, on_delete=models.CASCADE, related_name="groupprayermanager_set")
+    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+
+
+class ArchivedAnsweredPrayer(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    datetime = models.DateTimeField()
+    prayer_request = models.OneToOneField(ArchivedPrayerRequest, on_delete=models.CASCADE, related_name="answeredprayer")
+    content = models.TextField()
+
+
+# Incrementally maintained counts for the dashboard, one row per scope
+# ("user:<id>" or "group:<id>") and name. See app/counters.py.
+class Counter(models.Model):
+    scope = models.CharField(max_length=64)
+    name = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "name"], name="unique_counter_scope_name"),
+        ]
+
+
+# Append-only log of changes to the rows API clients sync, one row per
+# change and audience (the request's owner or a group it is shared with).
+# The id is the sync cursor. See app/changes.py.
+class Change(models.Model):
+    kind = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # No database constraints: tombstones are written while their user or
+    # group is being deleted. Covered by the indexes below.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name="+",
+    )
+    group = models.ForeignKey(
+        Group, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name="+",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="change_user_cursor_idx"),
+            models.Index(fields=["group", "id"], name="change_group_cursor_idx"),
+        ]
+
+
+# Follow-up work queued by the views and run by manage.py run_worker. See
+# app/jobs.py.
+class Job(models.Model):
+    name = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    # Enqueueing a key that is already queued or done adds nothing.
+    key = models.CharField(max_length=200, null=True, unique=True)
+    status = models.CharField(max_length=16, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    # When the job is due: its next try, or when its current lease runs out.
+    run_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True, db_index=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at", "id"], name="job_due_idx"),
+        ]
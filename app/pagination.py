@@ -0,0 +1,175 @@
+import base64
+import binascii
+import json
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage:
+    """One page of rows plus the cursor tokens for its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Seek-based paginator. Instead of COUNT(*) and OFFSET it filters on the
+    ordering columns of the last (or first) row seen, so every page costs the
+    same index range scan. The ordering must end in a unique column.
+
+    A list of querysets over models with the same ordering fields (e.g. the
+    hot and archive tiers) can be paginated as one: each is fetched with the
+    same seek and limit and the rows are merged.
+    """
+
+    def __init__(self, per_page, ordering=("-datetime", "-id")):
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, field) for field in self.fields]
+        # isoformat() keeps full microsecond precision, which the seek
+        # comparison needs; DjangoJSONEncoder would round to milliseconds.
+        data = json.dumps({"d": direction, "v": values}, default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, model, token):
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, values = data["d"], data["v"]
+            if direction not in ("next", "previous") or len(values) != len(self.fields):
+                raise ValueError
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, KeyError, TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor("Invalid cursor") from e
+        return direction, values
+
+    def _seek(self, values, reverse):
+        condition = Q()
+        for i, ordering in enumerate(self.ordering):
+            descending = ordering.startswith("-")
+            lookup = "lt" if descending != reverse else "gt"
+            term = Q(**{f"{self.fields[i]}__{lookup}": values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{field: value})
+            condition |= term
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            ordering[1:] if ordering.startswith("-") else f"-{ordering}"
+            for ordering in self.ordering
+        ]
+
+    def _build(self, queryset, cursor):
+        querysets = queryset if isinstance(queryset, (list, tuple)) else [queryset]
+        direction, values = "next", None
+        if cursor:
+            direction, values = self.decode_cursor(querysets[0].model, cursor)
+        backwards = direction == "previous"
+        if values is not None:
+            querysets = [queryset.filter(self._seek(values, reverse=backwards)) for queryset in querysets]
+        ordering = self._reversed_ordering() if backwards else self.ordering
+        return [queryset.order_by(*ordering)[: self.per_page + 1] for queryset in querysets], values, backwards
+
+    def _merge(self, results, backwards):
+        rows = [row for result in results for row in result]
+        if len(results) > 1:
+            ordering = self._reversed_ordering() if backwards else self.ordering
+            # Stable sorts, least significant column first.
+            for field in reversed(ordering):
+                rows.sort(key=attrgetter(field.lstrip("-")), reverse=field.startswith("-"))
+        return rows
+
+    def _page(self, rows, values, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1], "next")
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], "previous")
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def paginate(self, queryset, cursor=None):
+        querysets, values, backwards = self._build(queryset, cursor)
+        return self._page(self._merge([list(queryset) for queryset in querysets], backwards), values, backwards)
+
+    async def apaginate(self, queryset, cursor=None):
+        querysets, values, backwards = self._build(queryset, cursor)
+        results = [[obj async for obj in queryset] for queryset in querysets]
+        return self._page(self._merge(results, backwards), values, backwards)
+
+
+class KeysetPaginationMixin:
+    """
+    Drop-in replacement for ListView's offset pagination. ``page_obj`` becomes
+    a KeysetPage and the ``cursor`` query parameter selects the page.
+    """
+
+    keyset_ordering = ("-datetime", "-id")
+    cursor_kwarg = "cursor"
+    # (paginator, page) once fetched, possibly ahead of time by an async handler.
+    keyset_page = None
+
+    def paginate_keyset(self, queryset, page_size):
+        if self.keyset_page is None:
+            paginator = KeysetPaginator(page_size, self.keyset_ordering)
+            try:
+                page = paginator.paginate(queryset, self.request.GET.get(self.cursor_kwarg))
+            except InvalidCursor:
+                raise Http404("Invalid cursor")
+            self.keyset_page = paginator, page
+        return self.keyset_page
+
+    async def apaginate_keyset(self, queryset, page_size):
+        paginator = KeysetPaginator(page_size, self.keyset_ordering)
+        try:
+            page = await paginator.apaginate(queryset, self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        self.keyset_page = paginator, page
+        return self.keyset_page
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page = self.paginate_keyset(queryset, page_size)
+        return (paginator, page, page.object_list, page.has_other_pages())
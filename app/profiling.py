@@ -0,0 +1,167 @@
+"""
+Per-view request profiling.
+
+ProfilingMiddleware samples requests. For a sampled request it collects the
+SQL query count and time (through an execute wrapper installed on every
+connection, see app/signals.py), exact duplicate queries, template render time
+and response size. It reports them in a Server-Timing header and adds them to
+per-process histograms keyed by the ``app:`` URL name.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+_current = ContextVar("request_profile", default=None)
+
+# Histogram bucket upper bounds. Above the exact range they grow in steps of
+# 25%, so a reported percentile is within a quarter of the true value.
+TIME_BOUNDS = [0.0] + [0.01 * 1.25**i for i in range(80)]  # up to ~570s
+COUNT_BOUNDS = list(range(64)) + [64 * 1.25**i for i in range(1, 40)]
+SIZE_BOUNDS = [0.0] + [100 * 1.25**i for i in range(80)]  # up to ~5GB
+METRICS = {
+    "duration_ms": TIME_BOUNDS,
+    "sql_ms": TIME_BOUNDS,
+    "queries": COUNT_BOUNDS,
+    "duplicate_queries": COUNT_BOUNDS,
+    "template_ms": TIME_BOUNDS,
+    "response_bytes": SIZE_BOUNDS,
+}
+PERCENTILES = (50, 95, 99)
+# Bound the duplicate SQL tracked per view so odd queries can't grow memory.
+MAX_DUPLICATE_STATEMENTS = 20
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+
+    @property
+    def duplicates(self):
+        return Counter({sql: count - 1 for (sql, _), count in self.statements.items() if count > 1})
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        rank = self.total * percent / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return 0.0
+
+    def summary(self):
+        summary = {f"p{percent}": round(self.percentile(percent), 2) for percent in PERCENTILES}
+        summary["mean"] = round(self.sum / self.total, 2) if self.total else 0.0
+        return summary
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.histograms = {metric: Histogram(bounds) for metric, bounds in METRICS.items()}
+        self.duplicates = Counter()
+
+    def add(self, metrics, duplicates):
+        self.requests += 1
+        for metric, value in metrics.items():
+            if value is not None:
+                self.histograms[metric].add(value)
+        for sql, count in duplicates.items():
+            if sql in self.duplicates or len(self.duplicates) < MAX_DUPLICATE_STATEMENTS:
+                self.duplicates[sql] += count
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def start():
+    profile = RequestProfile()
+    _current.set(profile)
+    return profile
+
+
+def stop():
+    _current.set(None)
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_time += time.perf_counter() - start
+        profile.queries += 1
+        if not many:
+            profile.statements[(sql, repr(params))] += 1
+
+
+def time_render(profile, response):
+    render = response.render
+
+    def timed_render():
+        start = time.perf_counter()
+        try:
+            return render()
+        finally:
+            profile.template_time += time.perf_counter() - start
+
+    response.render = timed_render
+
+
+def finish(profile, view_name, response):
+    """Record the request under ``view_name`` and return its Server-Timing value."""
+    duplicates = profile.duplicates
+    metrics = {
+        "duration_ms": (time.perf_counter() - profile.start) * 1000,
+        "sql_ms": profile.sql_time * 1000,
+        "queries": profile.queries,
+        "duplicate_queries": sum(duplicates.values()),
+        "template_ms": profile.template_time * 1000,
+        "response_bytes": None if response.streaming else len(response.content),
+    }
+    with _lock:
+        _stats.setdefault(view_name, ViewStats()).add(metrics, duplicates)
+    return ", ".join([
+        f'sql;dur={metrics["sql_ms"]:.1f};desc="{profile.queries} queries, {metrics["duplicate_queries"]} duplicate"',
+        f'tpl;dur={metrics["template_ms"]:.1f}',
+        f'total;dur={metrics["duration_ms"]:.1f}',
+    ])
+
+
+def snapshot():
+    with _lock:
+        return {
+            view_name: {
+                "requests": stats.requests,
+                **{metric: histogram.summary() for metric, histogram in stats.histograms.items() if histogram.total},
+                "duplicate_sql": dict(stats.duplicates.most_common()),
+            }
+            for view_name, stats in sorted(_stats.items())
+        }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
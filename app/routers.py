@@ -0,0 +1,61 @@
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+REPLICA_DB_ALIAS = "replica"
+# Sessions are read and written on the same request, so they stay on the
+# primary even inside a replica read.
+PRIMARY_ONLY_APPS = {"sessions"}
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def set_replica_reads(enabled):
+    _replica_reads.set(enabled)
+
+
+def replica_alias():
+    # A test mirror is the primary itself, and reading it over a second
+    # connection would miss the test case's open transaction.
+    if REPLICA_DB_ALIAS not in settings.DATABASES:
+        return DEFAULT_DB_ALIAS
+    if connections[REPLICA_DB_ALIAS].settings_dict["NAME"] == connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]:
+        return DEFAULT_DB_ALIAS
+    return REPLICA_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to the replica while ReplicaReadMiddleware has enabled it for
+    the current request, and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def retry_when_locked(execute, sql, params, many, context):
+    # Only statements in autocommit mode are retried: inside a transaction the
+    # earlier statements may already have been rolled back with the lock error.
+    connection = context["connection"]
+    retries = settings.DATABASE_LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if attempt == retries or connection.in_atomic_block or "database is locked" not in str(e):
+                raise
+            time.sleep(settings.DATABASE_LOCK_RETRY_DELAY * 2**attempt)
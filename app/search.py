@@ -0,0 +1,113 @@
+"""
+Full-text search over prayer requests and their answers.
+
+On SQLite the app_prayersearch FTS5 table (migrations 0005 and 0006) answers
+the match, ranks by bm25 and cuts the snippets. Other backends fall back to
+icontains. Archived requests (see app/archive.py) are found by their owner.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from . import membership
+from .models import ArchivedPrayerRequest, GroupPrayerManager, PrayerRequest
+
+SNIPPET_WORDS = 24
+# snippet() wraps matches in these private use characters; the text is
+# escaped first and only then are they turned into <mark> tags.
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+# The scope column only filters (see migration 0005), so it gets no weight;
+# ties go to the newest request.
+SEARCH_SQL = """
+    SELECT rowid,
+           snippet(app_prayersearch, 0, %s, %s, '…', %s),
+           snippet(app_prayersearch, 1, %s, %s, '…', %s)
+    FROM app_prayersearch
+    WHERE app_prayersearch MATCH %s
+    ORDER BY bm25(app_prayersearch, 1.0, 1.0, 0.0), rowid DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def match_expression(query):
+    # Quote every word so user input can't form FTS5 syntax, and match
+    # prefixes so partial words still find something. Terms are ANDed.
+    return " ".join(f'"{term}"*' for term in re.findall(r"\w+", query))
+
+
+def scope_expression(user):
+    tokens = [f"u{user.pk}", *(f"g{group_id}" for group_id in sorted(membership.group_ids(user)))]
+    return " OR ".join(tokens)
+
+
+def visible_prayer_requests(user):
+    # The user's own requests, and open requests shared with their groups
+    # (what their group pages show).
+    shared = GroupPrayerManager.objects.filter(group__in=membership.group_ids(user)).values("prayer_request_id")
+    return PrayerRequest.objects.filter(Q(user=user) | Q(answered=False, id__in=shared))
+
+
+def highlight(text):
+    return mark_safe(escape(text).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+
+
+def search(user, query, limit, offset=0):
+    """
+    Return up to ``limit`` of the user's visible prayer requests matching
+    ``query``, best match first. Each has ``content_snippet`` and
+    ``answer_snippet`` set to HTML with the matches marked.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    db = router.db_for_read(PrayerRequest)
+    visible = visible_prayer_requests(user).using(db)
+    archived = ArchivedPrayerRequest.objects.using(db).filter(user=user)
+    if connections[db].vendor != "sqlite":
+        return _search_icontains([visible, archived], query, limit, offset)
+
+    marks = [MARK_START, MARK_END, SNIPPET_WORDS]
+    match = f"scope : ({scope_expression(user)}) AND {{content answer}} : ({expression})"
+    with connections[db].cursor() as cursor:
+        cursor.execute(SEARCH_SQL, [*marks, *marks, match, limit, offset])
+        rows = cursor.fetchall()
+    # Filtering on visibility again costs little and keeps a stale index
+    # from ever showing another user's request.
+    ids = [row[0] for row in rows]
+    prayer_requests = visible.select_related("user", "answeredprayer").in_bulk(ids)
+    missing = [id for id in ids if id not in prayer_requests]
+    if missing:
+        prayer_requests.update(archived.select_related("user", "answeredprayer").in_bulk(missing))
+    results = []
+    for id, content_snippet, answer_snippet in rows:
+        prayer_request = prayer_requests.get(id)
+        if prayer_request is None:
+            continue
+        prayer_request.content_snippet = highlight(content_snippet)
+        prayer_request.answer_snippet = highlight(answer_snippet)
+        results.append(prayer_request)
+    return results
+
+
+def _search_icontains(tiers, query, limit, offset):
+    query = query.strip()
+    results = []
+    for prayer_requests in tiers:
+        matches = (
+            prayer_requests.filter(Q(content__icontains=query) | Q(answeredprayer__content__icontains=query))
+            .select_related("user", "answeredprayer")
+            .order_by("-datetime", "-id")[: offset + limit]
+        )
+        results.extend(matches)
+    results.sort(key=lambda prayer_request: (prayer_request.datetime, prayer_request.id), reverse=True)
+    results = results[offset : offset + limit]
+    for prayer_request in results:
+        answer = getattr(prayer_request, "answeredprayer", None)
+        prayer_request.content_snippet = escape(Truncator(prayer_request.content).words(SNIPPET_WORDS))
+        prayer_request.answer_snippet = escape(Truncator(answer.content).words(SNIPPET_WORDS)) if answer else ""
+    return results
@@ -0,0 +1,213 @@
+from django.contrib.auth.models import Group, User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, changes, counters, membership, profiling, routers
+from .models import AnsweredPrayer, GroupPrayerManager, PrayerRequest
+
+
+@receiver(post_save, sender=PrayerRequest)
+def prayer_request_saved(sender, instance, created, **kwargs):
+    scopes = [caching.user_scope(instance.user_id)]
+    if not created:
+        group_ids = GroupPrayerManager.objects.filter(prayer_request=instance).values_list("group_id", flat=True)
+        scopes += [caching.group_scope(group_id) for group_id in group_ids]
+        for group_id in group_ids:
+            caching.evict_card("feed-card", group_id, instance.pk)
+    caching.invalidate(*scopes)
+    caching.evict_card("prayer-card", instance.pk)
+
+
+@receiver(post_delete, sender=PrayerRequest)
+def prayer_request_deleted(sender, instance, **kwargs):
+    # Group shares are removed by the cascade and handled below.
+    caching.invalidate(caching.user_scope(instance.user_id))
+    caching.evict_card("prayer-card", instance.pk)
+
+
+@receiver([post_save, post_delete], sender=GroupPrayerManager)
+def group_prayer_manager_changed(sender, instance, **kwargs):
+    caching.invalidate(caching.group_scope(instance.group_id))
+    caching.evict_card("feed-card", instance.group_id, instance.prayer_request_id)
+
+
+@receiver([post_save, post_delete], sender=AnsweredPrayer)
+def answered_prayer_changed(sender, instance, **kwargs):
+    if AnsweredPrayer.prayer_request.is_cached(instance):
+        user_id = instance.prayer_request.user_id
+    else:
+        user_id = PrayerRequest.objects.filter(pk=instance.prayer_request_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        caching.invalidate(caching.user_scope(user_id))
+    caching.evict_card("answered-card", instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.groups.add(...) and friends
+        if action in ("post_add", "post_remove", "post_clear"):
+            instance.__dict__.pop("_group_ids", None)
+            membership.invalidate([instance.pk])
+        return
+    # group.user_set.add(...) and friends; clear() doesn't pass the users.
+    if action == "pre_clear":
+        instance._cleared_user_ids = list(instance.user_set.values_list("id", flat=True))
+    elif action == "post_clear":
+        membership.invalidate(instance.__dict__.pop("_cleared_user_ids", []))
+    elif action in ("post_add", "post_remove"):
+        membership.invalidate(pk_set)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    membership.invalidate(instance.user_set.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    # Primary keys can be reused (e.g. after a rolled back transaction), so
+    # never let a new user inherit a cached group list.
+    if created:
+        membership.invalidate([instance.pk])
+
+
+# Counters (app/counters.py). These run inside the writing transaction; bulk
+# inserts update the counters themselves.
+
+@receiver(pre_save, sender=PrayerRequest)
+def prayer_request_saving(sender, instance, **kwargs):
+    if not instance._state.adding and not counters.is_suspended():
+        instance._was_answered = PrayerRequest.objects.filter(pk=instance.pk).values_list("answered", flat=True).first()
+
+
+@receiver(post_save, sender=PrayerRequest)
+def count_prayer_request(sender, instance, created, **kwargs):
+    was_answered = instance.__dict__.pop("_was_answered", None)
+    if created:
+        if not instance.answered:
+            counters.add({(caching.user_scope(instance.user_id), counters.OPEN): 1})
+    elif was_answered is not None and was_answered != instance.answered:
+        delta = -1 if instance.answered else 1
+        group_ids = GroupPrayerManager.objects.filter(prayer_request=instance).values_list("group_id", flat=True)
+        counters.add({
+            (caching.user_scope(instance.user_id), counters.OPEN): delta,
+            **{(caching.group_scope(group_id), counters.OPEN): delta for group_id in group_ids},
+        })
+
+
+@receiver(post_delete, sender=PrayerRequest)
+def uncount_prayer_request(sender, instance, **kwargs):
+    # Shares are removed first by the cascade and counted below.
+    if not instance.answered:
+        counters.add({(caching.user_scope(instance.user_id), counters.OPEN): -1})
+
+
+@receiver([post_save, post_delete], sender=GroupPrayerManager)
+def count_share(sender, instance, created=True, **kwargs):
+    if counters.is_suspended() or (kwargs["signal"] is post_save and not created):
+        return
+    if GroupPrayerManager.prayer_request.is_cached(instance):
+        answered = instance.prayer_request.answered
+    else:
+        answered = PrayerRequest.objects.filter(pk=instance.prayer_request_id).values_list("answered", flat=True).first()
+    if answered is False:
+        delta = 1 if kwargs["signal"] is post_save else -1
+        counters.add({(caching.group_scope(instance.group_id), counters.OPEN): delta})
+
+
+@receiver([post_save, post_delete], sender=AnsweredPrayer)
+def count_answer(sender, instance, created=True, **kwargs):
+    if counters.is_suspended() or (kwargs["signal"] is post_save and not created):
+        return
+    if AnsweredPrayer.prayer_request.is_cached(instance):
+        user_id = instance.prayer_request.user_id
+    else:
+        user_id = PrayerRequest.objects.filter(pk=instance.prayer_request_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        delta = 1 if kwargs["signal"] is post_save else -1
+        counters.add({(caching.user_scope(user_id), counters.answered_name(instance.datetime)): delta})
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def count_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("pre_remove", "pre_clear"):
+        # remove() passes the requested ids, not the removed ones.
+        memberships = User.groups.through.objects.filter(**{"group" if reverse else "user": instance})
+        if pk_set is not None:
+            memberships = memberships.filter(**{"user_id__in" if reverse else "group_id__in": pk_set})
+        instance._removed_memberships = list(memberships.values_list("user_id", "group_id"))
+    elif action == "post_add":
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        counters.memberships_changed(pairs, 1)
+        changes.memberships_changed(pairs, 1)
+    elif action in ("post_remove", "post_clear"):
+        pairs = instance.__dict__.pop("_removed_memberships", [])
+        counters.memberships_changed(pairs, -1)
+        changes.memberships_changed(pairs, -1)
+
+
+@receiver(pre_delete, sender=User)
+def uncount_user_memberships(sender, instance, **kwargs):
+    # Deleting a user drops their memberships without m2m_changed.
+    counters.memberships_changed(User.groups.through.objects.filter(user=instance).values_list("user_id", "group_id"), -1)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_counters(sender, instance, **kwargs):
+    counters.remove_scope(caching.user_scope(instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def remove_group_counters(sender, instance, **kwargs):
+    counters.remove_scope(caching.group_scope(instance.pk))
+
+
+# Change log (app/changes.py), also written inside the writing transaction.
+# Bulk inserts log themselves; archiving suspends the log.
+
+@receiver(post_save, sender=PrayerRequest)
+def log_prayer_request(sender, instance, created, **kwargs):
+    if changes.is_suspended():
+        return
+    if created:
+        changes.log(changes.entries(changes.PRAYER_REQUEST, instance.pk, instance.user_id))
+    else:
+        changes.prayer_request_changed(instance)
+
+
+@receiver(post_delete, sender=PrayerRequest)
+def log_prayer_request_deleted(sender, instance, **kwargs):
+    # The cascade deleted the shares first, and each told its group below.
+    changes.log(changes.entries(changes.PRAYER_REQUEST, instance.pk, instance.user_id, deleted=True))
+
+
+@receiver([post_save, post_delete], sender=GroupPrayerManager)
+def log_share(sender, instance, **kwargs):
+    if changes.is_suspended():
+        return
+    changes.log(changes.share_changed(instance, changes.owner_id(instance), deleted=kwargs["signal"] is post_delete))
+
+
+@receiver([post_save, post_delete], sender=AnsweredPrayer)
+def log_answer(sender, instance, **kwargs):
+    if changes.is_suspended():
+        return
+    # Groups never see answers (see app/changes.py).
+    changes.log(changes.entries(changes.ANSWER, instance.pk, changes.owner_id(instance), deleted=kwargs["signal"] is post_delete))
+
+
+@receiver(pre_delete, sender=Group)
+def log_group_memberships_deleted(sender, instance, **kwargs):
+    # Deleting a group drops its memberships without m2m_changed.
+    if not changes.is_suspended():
+        changes.memberships_changed(User.groups.through.objects.filter(group=instance).values_list("user_id", "group_id"), -1)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if profiling.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profiling.record_query)
+    if connection.vendor == "sqlite" and routers.retry_when_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.append(routers.retry_when_locked)
@@ -0,0 +1,46 @@
+function toggleMenu () {
+document.querySelector("#navbar-menu").classList.toggle('show');
+}
+const addMemberForm = document.querySelector(".add-member-form");
+const usernameInput = addMemberForm.querySelector("input[name=username]");
+const suggestions = addMemberForm.querySelector(".suggestions");
+let pending = null;
+function lastName() {
+return usernameInput.value.split(/[\s,]+/).pop();
+}
+function showSuggestions(usernames) {
+suggestions.replaceChildren(...usernames.map((username) => {
+const item = document.createElement("li");
+const button = document.createElement("button");
+button.type = "button";
+button.textContent = username;
+button.addEventListener("click", () => {
+const value = usernameInput.value;
+usernameInput.value = value.slice(0, value.length - lastName().length) + username + ", ";
+suggestions.hidden = true;
+usernameInput.focus();
+})
+item.append(button);
+return item;
+}));
+suggestions.hidden = usernames.length === 0;
+}
+usernameInput.addEventListener("input", () => {
+clearTimeout(pending);
+const prefix = lastName();
+if (!prefix) {
+showSuggestions([]);
+return;
+}
+pending = setTimeout(async () => {
+const response = await fetch(addMemberForm.dataset.suggestionsUrl + "?q=" + encodeURIComponent(prefix));
+if (response.ok && prefix === lastName()) {
+showSuggestions((await response.json()).usernames);
+}
+}, 150);
+})
+usernameInput.addEventListener("keydown", (event) => {
+if (event.key === "Escape") {
+suggestions.hidden = true;
+}
+})
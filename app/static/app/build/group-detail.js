@@ -0,0 +1,35 @@
+function toggleMenu () {
+document.querySelector("#navbar-menu").classList.toggle('show');
+}
+const feedList = document.querySelector(".flex-container[data-events-url]");
+function feedCard(prayerRequestId) {
+return feedList.querySelector('[data-prayer-request="' + prayerRequestId + '"]');
+}
+if (feedList && window.EventSource) {
+const source = new EventSource(feedList.dataset.eventsUrl);
+source.addEventListener("shared", (event) => {
+const data = JSON.parse(event.data);
+if (feedCard(data.prayer_request)) {
+return;
+}
+const card = document.createElement("li");
+card.className = "prayer-request";
+card.dataset.prayerRequest = data.prayer_request;
+const snippet = document.createElement("p");
+snippet.textContent = data.snippet;
+const author = document.createElement("p");
+author.className = "author";
+author.textContent = data.author;
+card.append(snippet, author);
+feedList.prepend(card);
+})
+source.addEventListener("answered", (event) => {
+const card = feedCard(JSON.parse(event.data).prayer_request);
+if (card) {
+card.remove();
+}
+})
+source.addEventListener("reset", () => {
+document.querySelector(".live-notice").hidden = false;
+})
+}
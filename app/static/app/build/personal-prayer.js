@@ -0,0 +1,66 @@
+function toggleMenu () {
+document.querySelector("#navbar-menu").classList.toggle('show');
+}
+const list = document.querySelector(".flex-container[data-api-url]");
+const deleteModal = document.querySelector("#delete-modal");
+const answerModal = document.querySelector("#answer-modal");
+let selected = null;
+function openModal(modal, prayerRequestId) {
+selected = prayerRequestId;
+modal.style.display = "block";
+const textarea = modal.querySelector("textarea");
+if (textarea) {
+textarea.value = "";
+textarea.focus();
+}
+}
+function closeModal(modal) {
+selected = null;
+modal.style.display = "none";
+}
+async function submit(modal, form) {
+const prayerRequestId = selected;
+const content = form.querySelector("textarea");
+const submitButton = form.querySelector("button[type=submit]");
+submitButton.disabled = true;
+try {
+const response = await fetch(list.dataset.apiUrl + prayerRequestId + "/" + form.dataset.action + "/", {
+method: "POST",
+headers: {
+"Content-Type": "application/json",
+"X-CSRFToken": form.querySelector("[name=csrfmiddlewaretoken]").value,
+},
+body: JSON.stringify(content ? {content: content.value} : {}),
+credentials: "same-origin",
+});
+if (!response.ok) {
+const data = await response.json().catch(() => ({}));
+alert((data.errors || ["Something went wrong, please try again."]).join("\n"));
+return;
+}
+closeModal(modal);
+document.querySelector("#pr-" + prayerRequestId).remove();
+if (!list.querySelector(".prayer-request")) {
+window.location.reload();
+}
+} finally {
+submitButton.disabled = false;
+}
+}
+if (list) {
+list.addEventListener("click", (event) => {
+const button = event.target.closest(".request-buttons");
+if (!button) {
+return;
+}
+openModal(button.classList.contains("delete-button") ? deleteModal : answerModal, button.value);
+})
+for (const modal of [deleteModal, answerModal]) {
+const form = modal.querySelector("form");
+modal.querySelector(".close-button").addEventListener("click", () => closeModal(modal));
+form.addEventListener("submit", (event) => {
+event.preventDefault();
+submit(modal, form);
+})
+}
+}
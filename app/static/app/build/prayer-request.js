@@ -0,0 +1,7 @@
+function toggleMenu () {
+document.querySelector("#navbar-menu").classList.toggle('show');
+}
+function disableButton() {
+document.querySelector("#btn").disabled = true;
+document.querySelector("#prayer-request").submit();
+}
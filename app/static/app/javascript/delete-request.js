@@ -1,37 +1,73 @@
-const deleteButtons = document.querySelectorAll(".delete-button");
-const noButtons = document.querySelectorAll(".no-button");
-const addAnsweredPrayerButtons = document.querySelectorAll(".answered-prayer-button");
-const cancelButtons = document.querySelectorAll(".cancel-button");
+// One delete modal and one answer modal serve every card on the page. They
+// submit to the JSON endpoints under /api/prayer-requests/<id>/ and remove
+// the card in place.
+const list = document.querySelector(".flex-container[data-api-url]");
+const deleteModal = document.querySelector("#delete-modal");
+const answerModal = document.querySelector("#answer-modal");
+let selected = null;
 
-deleteButtons.forEach((deleteButton) => {
-    const val = deleteButton.value;
-    const deleteModal= document.querySelector("#delete-" + val);
-    deleteButton.addEventListener("click", () => {
-        deleteModal.style.display = "block";
-    })
-})
+function openModal(modal, prayerRequestId) {
+    selected = prayerRequestId;
+    modal.style.display = "block";
+    const textarea = modal.querySelector("textarea");
+    if (textarea) {
+        textarea.value = "";
+        textarea.focus();
+    }
+}
 
+function closeModal(modal) {
+    selected = null;
+    modal.style.display = "none";
+}
 
-addAnsweredPrayerButtons.forEach((addAnsweredPrayerButton) => {
-    const val = addAnsweredPrayerButton.value;
-    const addAnsweredPrayerModal = document.querySelector("#add-answer-" + val);
-    addAnsweredPrayerButton.addEventListener("click", () => {
-        addAnsweredPrayerModal.style.display = "block";
-    })
-})
+async function submit(modal, form) {
+    const prayerRequestId = selected;
+    const content = form.querySelector("textarea");
+    const submitButton = form.querySelector("button[type=submit]");
+    submitButton.disabled = true;
+    try {
+        const response = await fetch(list.dataset.apiUrl + prayerRequestId + "/" + form.dataset.action + "/", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+                "X-CSRFToken": form.querySelector("[name=csrfmiddlewaretoken]").value,
+            },
+            body: JSON.stringify(content ? {content: content.value} : {}),
+            credentials: "same-origin",
+        });
+        if (!response.ok) {
+            const data = await response.json().catch(() => ({}));
+            alert((data.errors || ["Something went wrong, please try again."]).join("\n"));
+            return;
+        }
+        closeModal(modal);
+        document.querySelector("#pr-" + prayerRequestId).remove();
+        // Fetch the next requests once the page runs out.
+        if (!list.querySelector(".prayer-request")) {
+            window.location.reload();
+        }
+    } finally {
+        submitButton.disabled = false;
+    }
+}
 
-noButtons.forEach((noButton) => {
-    const val = noButton.value;
-    const deleteModal = document.querySelector("#delete-" + val);
-    noButton.addEventListener("click", () => {
-        deleteModal.style.display = "none";
+// The modals are only rendered when there are cards.
+if (list) {
+    list.addEventListener("click", (event) => {
+        const button = event.target.closest(".request-buttons");
+        if (!button) {
+            return;
+        }
+        openModal(button.classList.contains("delete-button") ? deleteModal : answerModal, button.value);
     })
-})
 
-cancelButtons.forEach((cancelButton) => {
-    const val = cancelButton.value;
-    const addAnsweredPrayerModal = document.querySelector("#add-answer-" + val);
-    cancelButton.addEventListener("click", () => {
-        addAnsweredPrayerModal.style.display = "none";
-    })
-})
\ No newline at end of file
+    for (const modal of [deleteModal, answerModal]) {
+        const form = modal.querySelector("form");
+        modal.querySelector(".close-button").addEventListener("click", () => closeModal(modal));
+        form.addEventListener("submit", (event) => {
+            event.preventDefault();
+            submit(modal, form);
+        })
+    }
+}
@@ -0,0 +1,3 @@
+function toggleMenu () {
+    document.querySelector("#navbar-menu").classList.toggle('show');
+}
@@ -0,0 +1,129 @@
+"""
+Follow-up work of adding requests, answers and members, run by the job
+worker (app/jobs.py) once the request or command has returned. The add
+request view, the bulk API and import_prayers all go through
+``prayer_requests_added``, so while the worker is behind or down their group
+feeds and counters lag alike; ``jobs.backlog()``, on the profiling page, says
+by how much.
+
+The writers themselves only write the rows they were asked for, with their change log
+and the eviction of the user's and groups' cached pages. They also publish
+the live group events, because the event broker lives in the web process
+(see app/events.py). The functions below enqueue the rest, group feed
+fan-out and counters, which only write database rows: the group pages are
+keyed by their feed's stamp (see app/caching.py), so the worker needs no
+access to the web processes' cache.
+
+So a ``shared`` event goes out before its GroupFeedItem exists. It carries
+what the card shows and open pages add the card from it; a group page loaded
+in between shows the request only once the job has run.
+
+The writers run with the counter receivers suspended, and each job carries the
+counter deltas of its write. The counters therefore add up whatever happens
+to the rows before the job runs, while the feed is written from the rows'
+state at that time.
+"""
+from collections import defaultdict
+
+from django.utils.dateparse import parse_datetime
+
+from . import caching, changes, counters, events, feed, jobs
+from .models import GroupFeedItem, GroupPrayerManager
+
+PRAYER_REQUEST_ADDED = "prayer_request_added"
+PRAYER_REQUEST_ANSWERED = "prayer_request_answered"
+MEMBERS_ADDED = "members_added"
+
+
+def prayer_requests_added(shares, answers=()):
+    """
+    Follow up new requests. ``shares`` holds ``(prayer_request, groups)``
+    pairs, ``answers`` the answers created along with them (imports).
+    """
+    shares = list(shares)
+    answered_at = {answer.prayer_request_id: answer.datetime.isoformat() for answer in answers}
+    events.shared(
+        feed.build_feed_item(prayer_request, group.pk)
+        for prayer_request, groups in shares
+        if not prayer_request.answered
+        for group in groups
+    )
+    jobs.enqueue_many(
+        PRAYER_REQUEST_ADDED,
+        [
+            (
+                {
+                    "prayer_request": prayer_request.pk,
+                    "user": prayer_request.user_id,
+                    "groups": [group.pk for group in groups],
+                    "answered": prayer_request.answered,
+                    "answered_at": answered_at.get(prayer_request.pk),
+                },
+                f"{PRAYER_REQUEST_ADDED}:{prayer_request.pk}",
+            )
+            for prayer_request, groups in shares
+        ],
+    )
+
+
+def prayer_request_added(prayer_request, groups):
+    """Follow up a new request shared with ``groups``."""
+    prayer_requests_added([(prayer_request, groups)])
+
+
+@jobs.handler(PRAYER_REQUEST_ADDED)
+def fan_out_prayer_requests(payloads):
+    deltas = defaultdict(int)
+    for payload in payloads:
+        if not payload["answered"]:
+            deltas[caching.user_scope(payload["user"]), counters.OPEN] += 1
+            for group_id in payload["groups"]:
+                deltas[caching.group_scope(group_id), counters.OPEN] += 1
+        if payload.get("answered_at"):
+            deltas[caching.user_scope(payload["user"]), counters.answered_name(parse_datetime(payload["answered_at"]))] += 1
+    counters.add(deltas)
+    # Shares that are gone, or whose request was answered, get no feed row.
+    wanted = {(payload["prayer_request"], group_id) for payload in payloads for group_id in payload["groups"]}
+    shares = GroupPrayerManager.objects.filter(
+        prayer_request_id__in={prayer_request_id for prayer_request_id, _ in wanted}
+    ).select_related("prayer_request__user")
+    feed.fan_out_shares([share for share in shares if (share.prayer_request_id, share.group_id) in wanted])
+
+
+def prayer_request_answered(prayer_request, answer):
+    """Follow up ``answer`` to ``prayer_request``."""
+    group_ids = changes.shared_group_ids(prayer_request.pk)
+    events.answered(prayer_request, group_ids)
+    jobs.enqueue(
+        PRAYER_REQUEST_ANSWERED,
+        {
+            "prayer_request": prayer_request.pk,
+            "user": prayer_request.user_id,
+            "groups": group_ids,
+            "answered_at": answer.datetime.isoformat(),
+        },
+        key=f"{PRAYER_REQUEST_ANSWERED}:{prayer_request.pk}",
+    )
+
+
+@jobs.handler(PRAYER_REQUEST_ANSWERED)
+def withdraw_prayer_requests(payloads):
+    deltas = defaultdict(int)
+    for payload in payloads:
+        deltas[caching.user_scope(payload["user"]), counters.OPEN] -= 1
+        deltas[caching.user_scope(payload["user"]), counters.answered_name(parse_datetime(payload["answered_at"]))] += 1
+        for group_id in payload["groups"]:
+            deltas[caching.group_scope(group_id), counters.OPEN] -= 1
+    counters.add(deltas)
+    GroupFeedItem.objects.filter(prayer_request_id__in=[payload["prayer_request"] for payload in payloads]).delete()
+
+
+def members_added(group, users):
+    jobs.enqueue(MEMBERS_ADDED, {"group": group.pk, "users": [user.pk for user in users]})
+
+
+@jobs.handler(MEMBERS_ADDED)
+def count_members(payloads):
+    # Recounted rather than added up: adding someone who is already a
+    # member changes nothing.
+    counters.recount_members({payload["group"] for payload in payloads})
@@ -0,0 +1,26 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from app import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """The <link> and <script> tags of a bundle from app/assets.py."""
+    if name not in assets.BUNDLES:
+        raise template.TemplateSyntaxError(f"Unknown asset bundle {name!r}")
+    script = assets.BUNDLES[name]["js"]
+    tags = [format_html('<link rel="stylesheet" href="{}">', static(f"{assets.BUILD_PATH}/{name}.css"))]
+    if script:
+        tags.append(format_html('<script src="{}" defer></script>', static(f"{assets.BUILD_PATH}/{script}.js")))
+    return format_html_join("\n", "{}", ((tag,) for tag in tags))
+
+
+@register.simple_tag
+def icon(name):
+    return format_html(
+        '<svg class="icon" aria-hidden="true"><use href="{}#{}"></use></svg>', static(assets.SPRITE), name
+    )
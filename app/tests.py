@@ -1,9 +1,69 @@
-from datetime import datetime
+import asyncio
+import csv
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from operator import attrgetter
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User, Group
-from django.test import TestCase
-from django.urls import reverse
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from list import settings as settings_module, urls as project_urls
+
+from . import archive, assets, counters, events, export, feed, jobs, membership, middleware, profiling, routers, search, tasks, urls, views
+from .models import (
+    AnsweredPrayer,
+    ArchivedAnsweredPrayer,
+    ArchivedGroupPrayerManager,
+    ArchivedPrayerRequest,
+    Change,
+    Counter,
+    Job,
+    PrayerRequest,
+    GroupFeedItem,
+    GroupPrayerManager,
+)
+
+# Tests run without collectstatic, so there is no manifest for the
+# fingerprinting storage to look names up in.
+DEPLOYED_STORAGES = settings.STORAGES
+plain_static_files = override_settings(
+    STORAGES={**settings.STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}}
+)
+
+
+# The caches are shared files by default; give each run its own, empty ones.
+cache_dir = tempfile.TemporaryDirectory()
+private_caches = override_settings(
+    CACHES={alias: {**config, "LOCATION": str(Path(cache_dir.name) / alias)} for alias, config in settings.CACHES.items()}
+)
+
+
+def setUpModule():
+    plain_static_files.enable()
+    private_caches.enable()
+
+
+def tearDownModule():
+    private_caches.disable()
+    plain_static_files.disable()
+    cache_dir.cleanup()
 
-from .models import AnsweredPrayer, PrayerRequest
 
 class PrayerRequestModelTests(TestCase):
     def setUp(self):
@@ -82,6 +142,31 @@ class PersonalPrayerViewTests(TestCase):
         response = self.client.get(reverse("app:personal-prayer"))
         self.assertQuerySetEqual(list(response.context["prayer_request_list"]), [prayer_request2])
 
+    def test_cursor_pagination(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        prayer_requests = [PrayerRequest.objects.create(user=user, content=f"prayer request {i}") for i in range(13)]
+        prayer_requests.reverse()
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertQuerySetEqual(response.context["prayer_request_list"], prayer_requests[:6])
+        next_cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("app:personal-prayer"), {"cursor": next_cursor})
+        self.assertQuerySetEqual(response.context["prayer_request_list"], prayer_requests[6:12])
+        response = self.client.get(reverse("app:personal-prayer"), {"cursor": response.context["page_obj"].next_cursor})
+        self.assertQuerySetEqual(response.context["prayer_request_list"], prayer_requests[12:])
+        self.assertFalse(response.context["page_obj"].has_next())
+
+    def test_no_count_query(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        for i in range(13):
+            PrayerRequest.objects.create(user=user, content=f"prayer request {i}")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("app:personal-prayer"))
+        # The only COUNT is the indexed version stamp, not the paginator's.
+        self.assertFalse([query for query in queries if "COUNT(" in query["sql"] and "MAX(" not in query["sql"]])
+        self.assertFalse([query for query in queries if "OFFSET" in query["sql"]])
+
 class IndexViewTests(TestCase):
     def setUp(self):
         User.objects.create_user(username="testuser", password="y0lo5432")
@@ -169,6 +254,59 @@ class AddMemberViewTests(TestCase):
         self.assertRedirects(response, reverse("app:add-member", kwargs={"group_id":1}))
         self.assertContains(response, "Username does not exist")
 
+    def test_post_add_many_members(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        group = Group.objects.get(name="testgroup")
+        User.objects.get(username="testuser").groups.add(group)
+        User.objects.create_user(username="testuser3")
+        response = self.client.post(
+            reverse("app:add-member", kwargs={"group_id": group.id}),
+            {"username": "testuser2, testuser3\nnobody testuser2 nobody2"},
+            follow=True,
+        )
+        self.assertEqual(set(group.user_set.values_list("username", flat=True)), {"testuser", "testuser2", "testuser3"})
+        self.assertContains(response, "Added testuser2, testuser3 to testgroup")
+        self.assertContains(response, "Username does not exist: nobody, nobody2")
+        jobs.run_pending()
+        self.assertEqual(counters.repair(fix=False), [])
+
+    def test_add_members_query_count_does_not_grow(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        group = Group.objects.get(name="testgroup")
+        User.objects.get(username="testuser").groups.add(group)
+        User.objects.bulk_create(User(username=f"member{i}") for i in range(20))
+        url = reverse("app:add-member", kwargs={"group_id": group.id})
+        self.client.post(url, {"username": "member0"})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {"username": "member1 member2"})
+        with self.assertNumQueries(len(queries)):
+            self.client.post(url, {"username": " ".join(f"member{i}" for i in range(3, 20))})
+        self.assertEqual(group.user_set.count(), 21)
+
+    def test_username_suggestions(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        group = Group.objects.get(name="testgroup")
+        url = reverse("app:username-suggestions", kwargs={"group_id": group.id})
+        self.assertEqual(self.client.get(url, {"q": "test"}).status_code, 403)
+        User.objects.get(username="testuser").groups.add(group)
+        User.objects.create_user(username="TestUser10")
+        User.objects.create_user(username="other")
+        response = self.client.get(url, {"q": "TESTUSER"})
+        self.assertEqual(response.json(), {"usernames": ["testuser", "TestUser10", "testuser2"]})
+        self.assertEqual(self.client.get(url, {"q": "no such"}).json(), {"usernames": []})
+
+    def test_username_suggestions_non_ascii(self):
+        # Like SQLite's LOWER(), only ASCII letters are folded.
+        User.objects.create_user(username="Élodie")
+        self.assertEqual(membership.username_suggestions("É"), ["Élodie"])
+        self.assertEqual(membership.username_suggestions("ÉLO"), ["Élodie"])
+
+    def test_username_suggestions_are_limited_and_cached(self):
+        User.objects.bulk_create(User(username=f"member{i:02}") for i in range(20))
+        self.assertEqual(membership.username_suggestions("MEM", limit=5), [f"member{i:02}" for i in range(5)])
+        with self.assertNumQueries(0):
+            membership.username_suggestions("mem", limit=5)
+
 
 class GroupListViewTests(TestCase):
     def setUp(self):
@@ -226,6 +364,10 @@ class GroupDetailViewTests(TestCase):
         Group.objects.create(name="testgroup")
         Group.objects.create(name="testgroup2")
         Group.objects.create(name="testgroup3")
+
+    def share(self, prayer_request, group):
+        GroupPrayerManager.objects.create(prayer_request=prayer_request, group=group)
+        feed.fan_out(prayer_request, [group])
     
     def test_user_not_logged_in(self):
         response = self.client.get(reverse("app:group-detail", kwargs={"pk":1}))
@@ -244,6 +386,66 @@ class GroupDetailViewTests(TestCase):
         response = self.client.get(reverse("app:group-detail", kwargs={"pk":1}))
         self.assertEqual(response.status_code, 200)
 
+    def test_group_feed_only_unanswered_requests_of_group(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        group = Group.objects.get(name="testgroup")
+        group2 = Group.objects.get(name="testgroup2")
+        user.groups.add(group)
+        prayer_request1 = PrayerRequest.objects.create(user=user, content="prayer request1")
+        prayer_request2 = PrayerRequest.objects.create(user=user, content="prayer request2", answered=True)
+        prayer_request3 = PrayerRequest.objects.create(user=user, content="prayer request3")
+        self.share(prayer_request1, group)
+        self.share(prayer_request2, group)
+        self.share(prayer_request3, group2)
+        response = self.client.get(reverse("app:group-detail", kwargs={"pk":group.id}))
+        self.assertQuerySetEqual(response.context["prayer_list"], [prayer_request1], transform=attrgetter("prayer_request"))
+
+    def test_group_feed_cursor_pagination(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        group = Group.objects.get(name="testgroup")
+        user.groups.add(group)
+        prayer_requests = []
+        for i in range(8):
+            prayer_request = PrayerRequest.objects.create(user=user, content=f"prayer request {i}")
+            self.share(prayer_request, group)
+            prayer_requests.append(prayer_request)
+        prayer_requests.reverse()
+        url = reverse("app:group-detail", kwargs={"pk":group.id})
+        response = self.client.get(url)
+        page = response.context["page_obj"]
+        self.assertQuerySetEqual(response.context["prayer_list"], prayer_requests[:6], transform=attrgetter("prayer_request"))
+        self.assertFalse(page.has_previous())
+        response = self.client.get(url, {"cursor": page.next_cursor})
+        page = response.context["page_obj"]
+        self.assertQuerySetEqual(response.context["prayer_list"], prayer_requests[6:], transform=attrgetter("prayer_request"))
+        self.assertFalse(page.has_next())
+        response = self.client.get(url, {"cursor": page.previous_cursor})
+        self.assertQuerySetEqual(response.context["prayer_list"], prayer_requests[:6], transform=attrgetter("prayer_request"))
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_group_feed_invalid_cursor(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        group = Group.objects.get(name="testgroup")
+        user.groups.add(group)
+        response = self.client.get(reverse("app:group-detail", kwargs={"pk":group.id}), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_feed_query_count_does_not_grow(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        user = User.objects.get(username="testuser")
+        group = Group.objects.get(name="testgroup")
+        user.groups.add(group)
+        for i in range(20):
+            prayer_request = PrayerRequest.objects.create(user=user, content=f"prayer request {i}")
+            self.share(prayer_request, group)
+        # user, membership check, version stamp, group and a single feed query;
+        # the session comes from the cache
+        with self.assertNumQueries(5):
+            self.client.get(reverse("app:group-detail", kwargs={"pk":group.id}))
+
 
 class PrayerRequestDeleteViewTests(TestCase):
     def setUp(self):
@@ -289,6 +491,256 @@ class AddAnsweredPrayerViewTests(TestCase):
         self.assertTrue(PrayerRequest.objects.filter(answered=True).exists())
 
 
+    def test_already_answered_prayer(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": 1}), {"content": "answered"})
+        response = self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": 1}), {"content": "answered again"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(AnsweredPrayer.objects.count(), 1)
+
+
+class PrayerRequestApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.user2 = User.objects.create_user(username="testuser2", password="y0lo6543")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+        self.prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request")
+        feed.share(self.prayer_request, [self.group])
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def post(self, action, data=None, prayer_request_id=None):
+        url = reverse(f"app:api-{action}-prayer-request", kwargs={"prayer_request_id": prayer_request_id or self.prayer_request.id})
+        return self.client.post(url, json.dumps(data or {}), content_type="application/json")
+
+    def test_page_renders_one_modal_of_each(self):
+        for i in range(5):
+            PrayerRequest.objects.create(user=self.user, content=f"prayer request {i}")
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertContains(response, 'class="modal"', count=2)
+        self.assertContains(response, "<textarea", count=1)
+
+    def test_delete(self):
+        response = self.post("delete")
+        self.assertEqual(response.json(), {"id": self.prayer_request.id})
+        self.assertFalse(PrayerRequest.objects.exists())
+        self.assertFalse(GroupFeedItem.objects.exists())
+        self.assertEqual(counters.repair(fix=False), [])
+
+    def test_answer(self):
+        response = self.post("answer", {"content": "answered"})
+        self.assertEqual(response.status_code, 200)
+        answer = AnsweredPrayer.objects.get()
+        self.assertEqual(response.json()["answer"]["id"], answer.id)
+        self.assertEqual(answer.content, "answered")
+        self.assertTrue(PrayerRequest.objects.get().answered)
+        jobs.run_pending()
+        self.assertFalse(GroupFeedItem.objects.exists())
+        self.assertEqual(counters.repair(fix=False), [])
+        self.assertEqual(self.post("answer", {"content": "answered again"}).status_code, 404)
+
+    def test_answer_needs_content(self):
+        response = self.post("answer", {"content": ""})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["errors"])
+        response = self.client.post(
+            reverse("app:api-answer-prayer-request", kwargs={"prayer_request_id": self.prayer_request.id}),
+            "not json",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PrayerRequest.objects.get().answered)
+
+    def test_other_users_request(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user2, content="prayer request 2")
+        self.assertEqual(self.post("delete", prayer_request_id=prayer_request.id).status_code, 404)
+        self.assertEqual(self.post("answer", {"content": "answered"}, prayer_request.id).status_code, 404)
+        self.assertEqual(PrayerRequest.objects.filter(answered=False).count(), 2)
+
+    def test_user_not_logged_in(self):
+        self.client.logout()
+        self.assertEqual(self.post("delete").status_code, 403)
+        self.assertTrue(PrayerRequest.objects.exists())
+
+
+class SyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group)
+        self.user2.groups.add(self.group, self.group2)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def sync(self, cursor=0, **params):
+        return self.client.get(reverse("app:sync"), {"cursor": cursor, **params})
+
+    def replay(self, state=None, cursor=0, **params):
+        """Apply every page after ``cursor`` to ``state`` like a client would."""
+        state = {} if state is None else state
+        while True:
+            page = self.sync(cursor, **params).json()
+            for change in page["changes"]:
+                key = change["kind"], change["id"]
+                if change["deleted"]:
+                    state.pop(key, None)
+                else:
+                    state[key] = change["data"]
+            cursor = page["cursor"]
+            if not page["has_more"]:
+                return state, cursor
+
+    def visible(self, user):
+        """What the user can see, from the source tables."""
+        group_ids = set(user.groups.values_list("id", flat=True))
+        rows = {("membership", group_id) for group_id in group_ids}
+        # Groups see open requests and their shares, like the group pages;
+        # archived requests are all answered.
+        tiers = [
+            (PrayerRequest, GroupPrayerManager, AnsweredPrayer, Q(group_id__in=group_ids, prayer_request__answered=False)),
+            (ArchivedPrayerRequest, ArchivedGroupPrayerManager, ArchivedAnsweredPrayer, Q(pk__in=[])),
+        ]
+        for prayer_requests, shares, answers, open_shares in tiers:
+            shared = shares.objects.filter(open_shares).values("prayer_request_id")
+            prayer_requests = prayer_requests.objects.filter(Q(user=user) | Q(id__in=shared))
+            shares = shares.objects.filter(open_shares | Q(prayer_request__user=user))
+            rows |= {("prayer_request", pk) for pk in prayer_requests.values_list("id", flat=True)}
+            rows |= {("group_prayer_manager", pk) for pk in shares.values_list("id", flat=True)}
+            rows |= {("answered_prayer", pk) for pk in answers.objects.filter(prayer_request__user=user).values_list("id", flat=True)}
+        return rows
+
+    def test_user_not_logged_in(self):
+        self.client.logout()
+        self.assertEqual(self.sync().status_code, 403)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.sync("x").status_code, 400)
+        self.assertEqual(self.sync(-1).status_code, 400)
+        self.assertEqual(self.sync(group=self.group2.id).status_code, 400)
+
+    def test_replay_matches_visible_rows(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request1", "groups": [self.group.id]})
+        self.client.force_login(self.user2)
+        self.client.post(
+            reverse("app:bulk-prayer-requests"),
+            json.dumps({"prayer_requests": [
+                {"content": "prayer request2", "groups": [self.group.id, self.group2.id]},
+                {"content": "prayer request3", "groups": [self.group2.id]},
+            ]}),
+            content_type="application/json",
+        )
+        call_command("generate_data", users=2, groups=1, groups_per_user=1, prayers_per_user=3, answered_ratio=0.5, stdout=StringIO())
+        state2, cursor2 = self.replay()
+        self.assertEqual(state2.keys(), self.visible(self.user2))
+        self.client.force_login(self.user)
+        state, cursor = self.replay()
+        self.assertEqual(state.keys(), self.visible(self.user))
+
+        # Updates and deletes after the cursor, from the views and the archive.
+        prayer_request1 = PrayerRequest.objects.get(content="prayer request1")
+        prayer_request2 = PrayerRequest.objects.get(content="prayer request2")
+        self.client.post(
+            reverse("app:api-answer-prayer-request", kwargs={"prayer_request_id": prayer_request1.id}),
+            json.dumps({"content": "answered"}),
+            content_type="application/json",
+        )
+        archive.archive([prayer_request1.id])
+        prayer_request2.delete()
+        state, cursor = self.replay(state, cursor)
+        self.assertEqual(state.keys(), self.visible(self.user))
+        self.assertTrue(state["prayer_request", prayer_request1.id]["answered"])
+        self.assertEqual(state["answered_prayer", ArchivedAnsweredPrayer.objects.get().id]["content"], "answered")
+        self.assertNotIn(("prayer_request", prayer_request2.id), state)
+        self.client.force_login(self.user2)
+        state2, _ = self.replay(state2, cursor2)
+        self.assertEqual(state2.keys(), self.visible(self.user2))
+
+    def test_answered_requests_leave_group_members(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user2, content="prayer request")
+        feed.share(prayer_request, [self.group])
+        state, cursor = self.replay()
+        self.assertIn(("prayer_request", prayer_request.id), state)
+
+        self.client.force_login(self.user2)
+        self.client.post(
+            reverse("app:api-answer-prayer-request", kwargs={"prayer_request_id": prayer_request.id}),
+            json.dumps({"content": "answered"}),
+            content_type="application/json",
+        )
+        self.client.force_login(self.user)
+        page = self.sync(cursor).json()
+        self.assertNotIn("answered", json.dumps(page))
+        self.assertTrue(all(change["deleted"] for change in page["changes"]))
+        state, _ = self.replay(state, cursor)
+        self.assertEqual(state.keys(), self.visible(self.user))
+        self.assertNotIn(("prayer_request", prayer_request.id), state)
+        # A fresh replay of the group doesn't show it either.
+        state, _ = self.replay(group=self.group.id)
+        self.assertNotIn(("prayer_request", prayer_request.id), state)
+        self.assertFalse([key for key in state if key[0] == "answered_prayer"])
+
+    def test_up_to_date_sync_is_one_query(self):
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        _, cursor = self.replay()
+        with CaptureQueriesContext(connection) as queries:
+            page = self.sync(cursor).json()
+        self.assertEqual(page, {"changes": [], "cursor": cursor, "has_more": False})
+        app_queries = [query["sql"] for query in queries if '"app_' in query["sql"]]
+        self.assertEqual(len(app_queries), 1)
+        self.assertIn('FROM "app_change"', app_queries[0])
+
+    def test_pages_are_bounded(self):
+        for i in range(5):
+            PrayerRequest.objects.create(user=self.user, content=f"prayer request {i}")
+        with patch.object(views.SyncView, "page_size", 2):
+            page = self.sync().json()
+            self.assertEqual(len(page["changes"]), 2)
+            self.assertTrue(page["has_more"])
+            state, _ = self.replay()
+        self.assertEqual(state.keys(), self.visible(self.user))
+
+    def test_changed_rows_are_sent_once(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request")
+        prayer_request.content = "edited"
+        prayer_request.save()
+        changes = self.sync().json()["changes"]
+        self.assertEqual([change["id"] for change in changes if change["kind"] == "prayer_request"], [prayer_request.id])
+        self.assertEqual(changes[-1]["data"]["content"], "edited")
+
+    def test_memberships(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user2, content="prayer request")
+        feed.share(prayer_request, [self.group2])
+        state, cursor = self.replay()
+        self.assertNotIn(("membership", self.group2.id), state)
+
+        self.client.force_login(self.user2)
+        self.client.post(reverse("app:add-member", kwargs={"group_id": self.group2.id}), {"username": "testuser"})
+        self.client.force_login(self.user)
+        state, cursor = self.replay(state, cursor)
+        self.assertEqual(state["membership", self.group2.id]["name"], "testgroup2")
+        # What the group saw before the user joined comes from its own replay.
+        state, _ = self.replay(state, group=self.group2.id)
+        self.assertIn(("prayer_request", prayer_request.id), state)
+        self.assertEqual(state.keys(), self.visible(self.user))
+
+        self.user.groups.remove(self.group2)
+        self.group.delete()
+        state, cursor = self.replay(state, cursor)
+        self.assertNotIn(("membership", self.group2.id), state)
+        self.assertNotIn(("membership", self.group.id), state)
+
+    def test_archive_logs_nothing(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request", answered=True)
+        AnsweredPrayer.objects.create(prayer_request=prayer_request, content="answered")
+        feed.share(prayer_request, [self.group])
+        changes_before = Change.objects.count()
+        archive.archive([prayer_request.id])
+        self.assertEqual(Change.objects.count(), changes_before)
+        state, _ = self.replay()
+        self.assertEqual(state.keys(), self.visible(self.user))
+
+
 class AnsweredPrayerListViewTests(TestCase):
     def setUp(self):
         User.objects.create_user(username="testuser", password="y0lo5432")
@@ -323,4 +775,1394 @@ class AnsweredPrayerListViewTests(TestCase):
         answered_prayer = AnsweredPrayer.objects.get(content="Answered prayer")
         self.client.login(username="testuser", password="y0lo5432")
         response = self.client.get(reverse("app:answered-prayer-list"))
-        self.assertQuerySetEqual(list(response.context["object_list"]), [answered_prayer])
\ No newline at end of file
+        self.assertQuerySetEqual(list(response.context["object_list"]), [answered_prayer])
+
+    def test_query_count_does_not_grow_with_answered_prayers(self):
+        user = User.objects.get(username="testuser")
+        for i in range(10):
+            prayer_request = PrayerRequest.objects.create(user=user, content=f"prayer request {i}", answered=True)
+            AnsweredPrayer.objects.create(prayer_request=prayer_request, content=f"Answered prayer {i}")
+        self.client.login(username="testuser", password="y0lo5432")
+        # user, version stamp and a joined page query per tier
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("app:answered-prayer-list"))
+        self.assertEqual(len(response.context["object_list"]), 6)
+        self.assertContains(response, "Answered prayer 9")
+
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+        for i in range(10):
+            prayer_request = PrayerRequest.objects.create(user=self.user, content=f"prayer request {i}", answered=i % 2 == 0)
+            GroupPrayerManager.objects.create(prayer_request=prayer_request, group=self.group)
+            feed.fan_out(prayer_request, [self.group])
+            if prayer_request.answered:
+                AnsweredPrayer.objects.create(prayer_request=prayer_request, content=f"answer {i}")
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def assertMainQueryUsesIndex(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        main_queries = [query["sql"] for query in queries if f'FROM "{table}"' in query["sql"]]
+        self.assertTrue(main_queries)
+        with connection.cursor() as cursor:
+            for sql in main_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+                table_scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+                self.assertFalse(table_scans, f"{sql}\n{plan}")
+
+    def test_personal_prayer_query_plan(self):
+        self.assertMainQueryUsesIndex(reverse("app:personal-prayer"), "app_prayerrequest")
+
+    def test_answered_prayer_list_query_plan(self):
+        self.assertMainQueryUsesIndex(reverse("app:answered-prayer-list"), "app_answeredprayer")
+
+    def test_group_list_query_plan(self):
+        self.assertMainQueryUsesIndex(reverse("app:group-prayers"), "auth_group")
+
+    def test_group_detail_query_plan(self):
+        self.assertMainQueryUsesIndex(reverse("app:group-detail", kwargs={"pk": self.group.id}), "app_groupfeeditem")
+
+    def test_sync_query_plan(self):
+        self.assertMainQueryUsesIndex(reverse("app:sync"), "app_change")
+
+
+
+class GroupFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group, self.group2)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def test_add_prayer_request_fans_out(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.group.id, self.group2.id]})
+        prayer_request = PrayerRequest.objects.get(content="prayer request")
+        self.assertFalse(GroupFeedItem.objects.exists())
+        jobs.run_pending()
+        items = GroupFeedItem.objects.filter(prayer_request=prayer_request).order_by("group_id")
+        self.assertQuerySetEqual(items, [self.group, self.group2], transform=attrgetter("group"))
+        self.assertEqual(items[0].author, "testuser")
+        self.assertEqual(items[0].snippet, "prayer request")
+        self.assertEqual(items[0].datetime, prayer_request.datetime)
+
+    def test_answer_withdraws_from_feed(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.group.id]})
+        jobs.run_pending()
+        prayer_request = PrayerRequest.objects.get(content="prayer request")
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": prayer_request.id}), {"content": "answered"})
+        jobs.run_pending()
+        self.assertFalse(GroupFeedItem.objects.exists())
+
+    def test_delete_removes_from_feed(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.group.id]})
+        jobs.run_pending()
+        prayer_request = PrayerRequest.objects.get(content="prayer request")
+        self.client.post(reverse("app:delete-prayer-request", kwargs={"pk": prayer_request.id}))
+        self.assertFalse(GroupFeedItem.objects.exists())
+
+    def test_long_content_is_truncated(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="a" * 1000)
+        item, = feed.fan_out(prayer_request, [self.group])
+        self.assertEqual(len(item.snippet), feed.SNIPPET_LENGTH)
+
+    def test_rebuild_command(self):
+        prayer_request1 = PrayerRequest.objects.create(user=self.user, content="prayer request1")
+        prayer_request2 = PrayerRequest.objects.create(user=self.user, content="prayer request2", answered=True)
+        GroupPrayerManager.objects.create(prayer_request=prayer_request1, group=self.group)
+        GroupPrayerManager.objects.create(prayer_request=prayer_request1, group=self.group2)
+        GroupPrayerManager.objects.create(prayer_request=prayer_request2, group=self.group)
+        call_command("rebuild_group_feed", stdout=StringIO())
+        self.assertEqual(GroupFeedItem.objects.filter(prayer_request=prayer_request1).count(), 2)
+        self.assertFalse(GroupFeedItem.objects.filter(prayer_request=prayer_request2).exists())
+
+
+class AddPrayerRequestViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.groups = [Group.objects.create(name=f"testgroup{i}") for i in range(5)]
+        self.user.groups.add(*self.groups)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def test_share_with_many_groups_is_batched(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [group.id for group in self.groups]})
+        inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "app_groupprayermanager"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(GroupPrayerManager.objects.count(), 5)
+
+    def test_failed_share_rolls_back(self):
+        with patch("app.feed.add_shares", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.groups[0].id]})
+        self.assertFalse(PrayerRequest.objects.exists())
+
+
+class BulkPrayerRequestViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.other_group = Group.objects.create(name="othergroup")
+        self.user.groups.add(self.group, self.group2)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def post(self, data):
+        return self.client.post(reverse("app:bulk-prayer-requests"), json.dumps(data), content_type="application/json")
+
+    def test_user_not_logged_in(self):
+        self.client.logout()
+        response = self.post({"prayer_requests": [{"content": "prayer request"}]})
+        self.assertEqual(response.status_code, 403)
+
+    def test_create_many(self):
+        response = self.post({"prayer_requests": [
+            {"content": "prayer request1", "groups": [self.group.id, self.group2.id], "client_id": "a"},
+            {"content": "prayer request2", "client_id": "b"},
+            {"content": "prayer request3", "groups": [self.group2.id]},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        created = response.json()["prayer_requests"]
+        self.assertEqual([entry["client_id"] for entry in created], ["a", "b", None])
+        self.assertEqual(PrayerRequest.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(GroupPrayerManager.objects.count(), 3)
+        # The feed is filled by the worker, as for a single request.
+        self.assertFalse(GroupFeedItem.objects.exists())
+        self.assertEqual(jobs.run_pending(), 3)
+        self.assertEqual(GroupFeedItem.objects.filter(group=self.group2).count(), 2)
+        prayer_request = PrayerRequest.objects.get(id=created[0]["id"])
+        self.assertEqual(prayer_request.content, "prayer request1")
+
+    def test_group_not_a_member_of(self):
+        response = self.post({"prayer_requests": [
+            {"content": "prayer request1", "groups": [self.group.id]},
+            {"content": "prayer request2", "groups": [self.other_group.id]},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["errors"]), 1)
+        self.assertFalse(PrayerRequest.objects.exists())
+
+    def test_invalid_group_ids(self):
+        for group_ids in ([[self.group.id]], [{}], [True], [str(self.group.id)], [float(self.group.id)]):
+            response = self.post({"prayer_requests": [{"content": "prayer request", "groups": group_ids}]})
+            self.assertEqual(response.status_code, 400, group_ids)
+            self.assertEqual(len(response.json()["errors"]), 1)
+        self.assertFalse(PrayerRequest.objects.exists())
+
+    def test_invalid_body(self):
+        self.assertEqual(self.post({"prayer_requests": []}).status_code, 400)
+        self.assertEqual(self.post({"prayer_requests": [{"content": " "}]}).status_code, 400)
+        response = self.client.post(reverse("app:bulk-prayer-requests"), "not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_grow(self):
+        entries = [{"content": f"prayer request {i}", "groups": [self.group.id, self.group2.id]} for i in range(20)]
+        self.post({"prayer_requests": entries[:1]})
+        with CaptureQueriesContext(connection) as queries:
+            self.post({"prayer_requests": entries[:2]})
+        with self.assertNumQueries(len(queries)):
+            self.post({"prayer_requests": entries})
+
+
+class ExportJournalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        group = Group.objects.create(name="testgroup")
+        prayer_request1 = PrayerRequest.objects.create(user=self.user, content="prayer request1", answered=True)
+        PrayerRequest.objects.create(user=self.user, content="prayer request2")
+        PrayerRequest.objects.create(user=user2, content="prayer request3")
+        GroupPrayerManager.objects.create(prayer_request=prayer_request1, group=group)
+        AnsweredPrayer.objects.create(prayer_request=prayer_request1, content="answered")
+
+    def test_user_not_logged_in(self):
+        response = self.client.get(reverse("app:export-journal"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_export(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        response = self.client.get(reverse("app:export-journal"))
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row["content"] for row in rows], ["prayer request1", "prayer request2"])
+        self.assertEqual(rows[0]["groups"], "testgroup")
+        self.assertEqual(rows[0]["answer"], "answered")
+        self.assertEqual(rows[1]["answer"], "")
+
+    def test_jsonl_export(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        response = self.client.get(reverse("app:export-journal"), {"format": "jsonl"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0]["groups"], ["testgroup"])
+        self.assertIsNone(rows[1]["answer"])
+
+    def test_unknown_format(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        response = self.client.get(reverse("app:export-journal"), {"format": "xml"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_count_does_not_grow(self):
+        # hot requests, their shares, and the (empty) archive tier
+        with self.assertNumQueries(3):
+            rows = list(export.journal_rows(self.user, chunk_size=100))
+        self.assertEqual(len(rows), 2)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command("export_journal", "testuser", format="jsonl", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class ImportPrayersCommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+
+    def import_lines(self, records, **options):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as source:
+            source.write("\n".join(json.dumps(record) for record in records))
+        self.addCleanup(os.remove, source.name)
+        out = StringIO()
+        call_command("import_prayers", source.name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import(self):
+        output = self.import_lines([
+            {"user": "testuser", "content": "prayer request1", "datetime": "2024-01-02T03:04:05+00:00", "groups": ["testgroup"]},
+            {"user": "testuser", "content": "prayer request2", "answer": "answered", "answer_datetime": "2024-02-01T00:00:00+00:00"},
+            {"user": "testuser", "content": "prayer request3"},
+        ], batch_size=2)
+        self.assertIn("Imported 3 prayer requests", output)
+        prayer_request1 = PrayerRequest.objects.get(content="prayer request1")
+        self.assertEqual(prayer_request1.datetime.year, 2024)
+        self.assertFalse(prayer_request1.answered)
+        self.assertEqual(jobs.run_pending(), 3)
+        feed_item = GroupFeedItem.objects.get(group=self.group)
+        self.assertEqual(feed_item.prayer_request, prayer_request1)
+        self.assertEqual(feed_item.datetime, prayer_request1.datetime)
+        prayer_request2 = PrayerRequest.objects.get(content="prayer request2")
+        self.assertTrue(prayer_request2.answered)
+        self.assertEqual(prayer_request2.answeredprayer.datetime.month, 2)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            self.import_lines([{"user": "nobody", "content": "prayer request"}])
+        self.assertFalse(PrayerRequest.objects.exists())
+
+    def test_invalid_fields(self):
+        for record in [
+            {"user": "testuser", "content": "prayer request", "groups": "testgroup"},
+            {"user": "testuser", "content": "prayer request", "groups": [1]},
+            {"user": "testuser", "content": "prayer request", "groups": [""]},
+            {"user": 1, "content": "prayer request"},
+            {"user": "testuser", "content": "prayer request", "answer": 1},
+        ]:
+            with self.subTest(record=record), self.assertRaisesMessage(CommandError, "line 2"):
+                self.import_lines([{"user": "testuser", "content": "valid"}, record], create_missing=True)
+        self.assertFalse(PrayerRequest.objects.exists())
+
+    def test_create_missing(self):
+        self.import_lines([{"user": "newuser", "content": "prayer request", "groups": ["newgroup"]}], create_missing=True)
+        user = User.objects.get(username="newuser")
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(GroupPrayerManager.objects.filter(prayer_request__user=user, group__name="newgroup").exists())
+
+    def test_round_trip_export(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request", answered=True)
+        GroupPrayerManager.objects.create(prayer_request=prayer_request, group=self.group)
+        AnsweredPrayer.objects.create(prayer_request=prayer_request, content="answered")
+        records = [json.loads(line) for line in export.jsonl_lines(export.journal_rows(self.user))]
+        User.objects.create_user(username="testuser2", password="y0lo4321")
+        self.import_lines(records, user="testuser2")
+        imported = PrayerRequest.objects.get(user__username="testuser2")
+        self.assertEqual(imported.datetime, prayer_request.datetime)
+        self.assertEqual(imported.answeredprayer.content, "answered")
+        self.assertTrue(GroupPrayerManager.objects.filter(prayer_request=imported, group=self.group).exists())
+
+
+class GenerateDataCommandTests(TestCase):
+    def generate(self, **options):
+        out = StringIO()
+        call_command("generate_data", stdout=out, **options)
+        return out.getvalue()
+
+    def test_generate(self):
+        output = self.generate(
+            users=4, groups=3, groups_per_user=2, prayers_per_user=5, shares_per_prayer=1,
+            answered_ratio=0.5, password="y0lo5432", batch_size=7,
+        )
+        self.assertIn("Generated", output)
+        users = User.objects.filter(username__startswith="generated-user-")
+        self.assertEqual(users.count(), 4)
+        self.assertEqual(Group.objects.filter(name__startswith="generated-group-").count(), 3)
+        self.assertEqual(User.groups.through.objects.count(), 8)
+        self.assertEqual(PrayerRequest.objects.count(), 20)
+        self.assertEqual(GroupPrayerManager.objects.count(), 20)
+        answered = PrayerRequest.objects.filter(answered=True)
+        self.assertEqual(AnsweredPrayer.objects.count(), answered.count())
+        self.assertFalse(answered.filter(answeredprayer__isnull=True).exists())
+        # Shares land in the feed of a group the author belongs to, unless answered.
+        self.assertEqual(GroupFeedItem.objects.count(), PrayerRequest.objects.filter(answered=False).count())
+        for item in GroupFeedItem.objects.select_related("prayer_request"):
+            self.assertTrue(User.groups.through.objects.filter(user_id=item.prayer_request.user_id, group_id=item.group_id).exists())
+        self.assertTrue(self.client.login(username="generated-user-0", password="y0lo5432"))
+
+    def test_existing_prefix(self):
+        self.generate(users=1, groups=1, groups_per_user=1, prayers_per_user=1)
+        with self.assertRaises(CommandError):
+            self.generate(users=1, groups=1, groups_per_user=1, prayers_per_user=1)
+        self.generate(users=1, groups=1, groups_per_user=1, prayers_per_user=1, prefix="other")
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            self.generate(answered_ratio=1.5)
+        with self.assertRaises(CommandError):
+            self.generate(groups=1, groups_per_user=2)
+        self.assertFalse(User.objects.exists())
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def warm(self, url):
+        # The first response sets the CSRF cookie; the second is cached.
+        self.client.get(url)
+        return self.client.get(url)
+
+    def test_cached_personal_page_skips_list_query(self):
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        url = reverse("app:personal-prayer")
+        response = self.warm(url)
+        # user and the version stamp
+        with self.assertNumQueries(2):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+
+    def test_new_prayer_request_evicts_personal_page(self):
+        url = reverse("app:personal-prayer")
+        self.warm(url)
+        PrayerRequest.objects.create(user=self.user, content="new prayer request")
+        self.assertContains(self.client.get(url), "new prayer request")
+
+    def test_answer_evicts_group_and_answered_pages(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.group.id]})
+        jobs.run_pending()
+        prayer_request = PrayerRequest.objects.get(content="prayer request")
+        group_url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        answered_url = reverse("app:answered-prayer-list")
+        self.assertContains(self.warm(group_url), "prayer request")
+        self.assertNotContains(self.warm(answered_url), "answered prayer")
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": prayer_request.id}), {"content": "answered prayer"})
+        jobs.run_pending()
+        self.assertNotContains(self.client.get(group_url), "prayer request")
+        self.assertContains(self.client.get(answered_url), "answered prayer")
+
+    def test_feed_written_elsewhere_is_not_served_stale(self):
+        # As if by the job worker, whose cache evictions a per-process
+        # cache never sees.
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        self.warm(url)
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request")
+        GroupFeedItem.objects.bulk_create([feed.build_feed_item(prayer_request, self.group.id)])
+        self.assertContains(self.client.get(url), "prayer request")
+
+    def test_pages_are_not_shared_between_users(self):
+        user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        user2.groups.add(self.group)
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        url = reverse("app:personal-prayer")
+        self.warm(url)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = self.client.cookies[settings.CSRF_COOKIE_NAME].value
+        self.client.login(username="testuser2", password="y0lo4321")
+        self.assertNotContains(self.client.get(url), "prayer request")
+
+
+
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def test_warm_group_detail_skips_membership_query(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query for query in queries if "auth_user_groups" in query["sql"]])
+
+    def test_per_process_cache_skips_membership_cache(self):
+        # Another process wouldn't see the entry dropped, and would keep
+        # letting a removed member in.
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        locmem = {alias: {**config, "BACKEND": settings_module.CACHE_BACKENDS["locmem"]} for alias, config in settings.CACHES.items()}
+        with override_settings(CACHES=locmem):
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            self.assertEqual(len([query for query in queries if "auth_user_groups" in query["sql"]]), 1)
+            self.assertIsNone(caches["default"].get(f"group-ids:{self.user.pk}"))
+
+    def test_group_list_queries_membership_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("app:group-prayers"))
+        self.assertEqual(len([query for query in queries if "auth_user_groups" in query["sql"]]), 1)
+        self.assertQuerySetEqual(response.context["group_list"], [self.group])
+
+    def test_added_membership_invalidates(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.group2.id})
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.group2.user_set.add(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_removed_membership_invalidates(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_cleared_group_invalidates(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.group.user_set.clear()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_add_member_view_invalidates_new_member(self):
+        user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        self.assertEqual(membership.group_ids(user2), frozenset())
+        self.client.post(reverse("app:add-member", kwargs={"group_id": self.group.id}), {"username": "testuser2"})
+        user2 = User.objects.get(username="testuser2")
+        self.assertEqual(membership.group_ids(user2), {self.group.id})
+
+
+class AsyncURLConf:
+    urlpatterns = [path("", include((urls.build_urlpatterns(async_views=True), "app")))] + project_urls.urlpatterns[1:]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group)
+
+    def test_list_pages_resolve_to_async_views(self):
+        view = resolve(reverse("app:personal-prayer")).func.view_class
+        self.assertIs(view, views.AsyncPersonalPrayerView)
+        self.assertTrue(view.view_is_async)
+        self.assertIs(resolve(reverse("app:group-detail", kwargs={"pk": 1})).func.view_class, views.AsyncGroupDetailView)
+        self.assertIs(resolve(reverse("app:export-journal")).func.view_class, views.AsyncExportJournalView)
+
+    async def test_user_not_logged_in(self):
+        response = await self.async_client.get(reverse("app:personal-prayer"))
+        self.assertRedirects(response, "/login/?next=/personal-prayer/", fetch_redirect_response=False)
+
+    async def test_personal_prayer_pages(self):
+        for i in range(8):
+            await PrayerRequest.objects.acreate(user=self.user, content=f"prayer request {i}")
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:personal-prayer"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.content for p in response.context["prayer_request_list"]], [f"prayer request {i}" for i in range(7, 1, -1)])
+        page = response.context["page_obj"]
+        response = await self.async_client.get(reverse("app:personal-prayer"), {"cursor": page.next_cursor})
+        self.assertEqual([p.content for p in response.context["prayer_request_list"]], ["prayer request 1", "prayer request 0"])
+
+    async def test_export_streams_asynchronously(self):
+        await PrayerRequest.objects.acreate(user=self.user, content="prayer request")
+        response = await self.async_client.get(reverse("app:export-journal"))
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:export-journal"), {"format": "jsonl"})
+        # A sync iterator would be read into a list before anything is sent.
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)["content"] for line in lines], ["prayer request"])
+
+    async def test_aiterate_reads_in_batches(self):
+        read = []
+
+        def lines():
+            for line in ["a\n", "b\n", "c\n"]:
+                read.append(line)
+                yield line
+        chunks = export.aiterate(lines(), batch_size=2)
+        self.assertEqual(await anext(chunks), "a\nb\n")
+        self.assertEqual(read, ["a\n", "b\n"])
+        self.assertEqual([chunk async for chunk in chunks], ["c\n"])
+
+    async def test_invalid_cursor(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:answered-prayer-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_not_modified(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        response = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    async def test_profiled(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:group-prayers"))
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries')
+
+    async def test_group_list(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("app:group-prayers"))
+        self.assertEqual(list(response.context["group_list"]), [self.group])
+
+    async def test_group_detail(self):
+        prayer_request = await PrayerRequest.objects.acreate(user=self.user, content="prayer request")
+        await sync_to_async(feed.share)(prayer_request, [self.group])
+        await self.async_client.aforce_login(self.user)
+        self.assertContains(await self.async_client.get(reverse("app:group-detail", kwargs={"pk": self.group.id})), "prayer request")
+        response = await self.async_client.get(reverse("app:group-detail", kwargs={"pk": self.group2.id}))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_cached_page_is_served(self):
+        await PrayerRequest.objects.acreate(user=self.user, content="prayer request")
+        await self.async_client.aforce_login(self.user)
+        url = reverse("app:personal-prayer")
+        # The first response sets the CSRF cookie; the second is cached.
+        await self.async_client.get(url)
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        # served from the page cache, so no template was rendered
+        self.assertIsNone(response.context)
+        await PrayerRequest.objects.acreate(user=self.user, content="new prayer request")
+        self.assertContains(await self.async_client.get(url), "new prayer request")
+
+
+class GroupEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group)
+
+    async def test_replay_after_last_event_id(self):
+        broker = events.LocalBroker()
+        first = broker.publish(1, events.SHARED, {"prayer_request": 1})
+        broker.publish(2, events.SHARED, {"prayer_request": 2})
+        third = broker.publish(1, events.ANSWERED, {"prayer_request": 1})
+        _, backlog = broker.subscribe(1, first.id)
+        self.assertEqual(backlog, [third])
+        _, backlog = broker.subscribe(1)
+        self.assertEqual(backlog, [])
+        # An id from another process or run can't be resumed from.
+        _, backlog = broker.subscribe(1, "0123abcd-1")
+        self.assertEqual([event.name for event in backlog], [events.RESET])
+
+    @override_settings(EVENT_REPLAY_SIZE=2)
+    async def test_reset_once_buffer_moved_on(self):
+        broker = events.LocalBroker()
+        published = [broker.publish(1, events.SHARED, {"prayer_request": i}) for i in range(3)]
+        _, backlog = broker.subscribe(1, published[0].id)
+        self.assertEqual(backlog, published[1:])
+        _, backlog = broker.subscribe(1, broker.event_id(0))
+        self.assertEqual([event.name for event in backlog], [events.RESET])
+        self.assertEqual(backlog[0].id, published[-1].id)
+
+    async def test_events_reach_subscribers_from_other_threads(self):
+        broker = events.LocalBroker()
+        subscription, _ = broker.subscribe(1)
+        event = await sync_to_async(broker.publish)(1, events.SHARED, {"prayer_request": 1})
+        self.assertEqual(await asyncio.wait_for(subscription.queue.get(), 1), event)
+        broker.unsubscribe(subscription)
+        broker.publish(1, events.SHARED, {"prayer_request": 2})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.queue.empty())
+
+    def test_share_and_answer_publish_on_commit(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        with patch.object(events, "broker") as broker, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("app:prayer-request"), {"content": "prayer request", "groups": [self.group.id]})
+            prayer_request = PrayerRequest.objects.get()
+            broker.publish.assert_not_called()
+        broker.publish.assert_called_once_with(self.group.id, events.SHARED, {
+            "prayer_request": prayer_request.id,
+            "author": "testuser",
+            "snippet": "prayer request",
+            "datetime": prayer_request.datetime,
+        })
+        with patch.object(events, "broker") as broker, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": prayer_request.id}), {"content": "answered"})
+        broker.publish.assert_called_once_with(self.group.id, events.ANSWERED, {"prayer_request": prayer_request.id})
+
+    def test_wsgi_does_not_stream(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        response = self.client.get(reverse("app:group-events", kwargs={"group_id": self.group.id}))
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get(reverse("app:group-events", kwargs={"group_id": self.group2.id}))
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_stream(self):
+        url = reverse("app:group-events", kwargs={"group_id": self.group.id})
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+        await self.async_client.aforce_login(self.user)
+        missed = events.broker.publish(self.group.id, events.SHARED, {"prayer_request": 1})
+        response = await self.async_client.get(url, headers={"last-event-id": events.broker.event_id(0)})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b"retry:"))
+        self.assertEqual(await anext(stream), missed.encode().encode())
+        live = events.broker.publish(self.group.id, events.ANSWERED, {"prayer_request": 1})
+        self.assertEqual(await anext(stream), live.encode().encode())
+        with override_settings(EVENT_HEARTBEAT_SECONDS=0.01):
+            self.assertEqual(await anext(stream), b": heartbeat\n\n")
+        await stream.aclose()
+
+    async def test_closing_stream_unsubscribes(self):
+        with patch.object(events, "broker", events.LocalBroker()) as broker:
+            stream = events.stream(self.group.id)
+            await anext(stream)
+            self.assertIn(self.group.id, broker.subscriptions)
+            await stream.aclose()
+            self.assertNotIn(self.group.id, broker.subscriptions)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.groups = [Group.objects.create(name=f"testgroup{i}") for i in range(5)]
+        self.user.groups.add(*self.groups)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def add_prayer_request(self, content, groups):
+        self.client.post(reverse("app:prayer-request"), {"content": content, "groups": [group.id for group in groups]})
+        return PrayerRequest.objects.get(content=content)
+
+    def test_views_leave_follow_up_to_worker(self):
+        prayer_request = self.add_prayer_request("prayer request", self.groups[:2])
+        self.assertEqual(GroupPrayerManager.objects.count(), 2)
+        self.assertFalse(GroupFeedItem.objects.exists())
+        job = Job.objects.get()
+        self.assertEqual((job.name, job.status), (tasks.PRAYER_REQUEST_ADDED, jobs.PENDING))
+
+        out = StringIO()
+        call_command("run_worker", once=True, stdout=out)
+        self.assertIn("1 of 1 jobs done", out.getvalue())
+        self.assertEqual(GroupFeedItem.objects.filter(prayer_request=prayer_request).count(), 2)
+        self.assertEqual(Job.objects.get().status, jobs.DONE)
+        self.assertEqual(counters.repair(fix=False), [])
+
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": prayer_request.id}), {"content": "answered"})
+        self.assertTrue(GroupFeedItem.objects.exists())
+        jobs.run_pending()
+        self.assertFalse(GroupFeedItem.objects.exists())
+        self.assertEqual(counters.repair(fix=False), [])
+
+    def test_worker_leaves_cache_alone(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.groups[0].id})
+        self.client.get(url)
+        self.client.get(url)
+        self.add_prayer_request("prayer request", self.groups[:1])
+        self.assertNotContains(self.client.get(url), "prayer request")
+        # The worker may not share the web processes' cache at all.
+        with patch("app.caching.fragment_cache", side_effect=AssertionError("worker touched the cache")):
+            self.assertEqual(jobs.run_pending(), 1)
+        self.assertContains(self.client.get(url), "prayer request")
+
+    def test_backlog(self):
+        self.assertEqual(jobs.backlog(), {"pending": 0, "failed": 0, "oldest_due_seconds": None})
+        self.add_prayer_request("prayer request", self.groups[:1])
+        Job.objects.update(run_at=timezone.now() - timedelta(minutes=5))
+        self.user.is_staff = True
+        self.user.save()
+        backlog = self.client.get(reverse("app:profiling-stats")).json()["jobs"]
+        self.assertEqual(backlog["pending"], 1)
+        self.assertGreaterEqual(backlog["oldest_due_seconds"], 300)
+        jobs.run_pending()
+        self.assertEqual(jobs.backlog()["pending"], 0)
+
+    def test_post_query_count_does_not_grow_with_groups(self):
+        self.add_prayer_request("prayer request0", self.groups[:1])
+        with CaptureQueriesContext(connection) as queries:
+            self.add_prayer_request("prayer request1", self.groups[:1])
+        with self.assertNumQueries(len(queries)):
+            self.add_prayer_request("prayer request2", self.groups)
+
+    def test_jobs_follow_up_whatever_happened_since(self):
+        deleted = self.add_prayer_request("deleted", self.groups[:2])
+        answered = self.add_prayer_request("answered", self.groups[:2])
+        self.client.post(reverse("app:delete-prayer-request", kwargs={"pk": deleted.id}))
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": answered.id}), {"content": "answered"})
+        self.assertEqual(jobs.run_pending(), 3)
+        self.assertFalse(GroupFeedItem.objects.exists())
+        self.assertEqual(counters.repair(fix=False), [])
+
+    def test_batches(self):
+        handler = Mock()
+        with patch.dict(jobs.HANDLERS, {"test": handler}):
+            for i in range(3):
+                jobs.enqueue("test", {"n": i})
+            self.assertEqual(jobs.run_pending(), 3)
+        handler.assert_called_once_with([{"n": 0}, {"n": 1}, {"n": 2}])
+        with self.assertRaises(ValueError):
+            jobs.enqueue("unknown", {})
+
+    @override_settings(JOB_RETRY_SECONDS=0)
+    def test_retries_then_fails(self):
+        def handler(payloads):
+            if any(payload["fail"] for payload in payloads):
+                raise RuntimeError("failed")
+
+        with patch.dict(jobs.HANDLERS, {"test": handler}), self.assertLogs("app.jobs", "ERROR"):
+            jobs.enqueue("test", {"fail": True})
+            jobs.enqueue("test", {"fail": False})
+            self.assertEqual(jobs.run_pending(), 1)
+        failed = Job.objects.get(payload__fail=True)
+        self.assertEqual((failed.status, failed.attempts), (jobs.FAILED, settings.JOB_MAX_ATTEMPTS))
+        self.assertIn("RuntimeError: failed", failed.error)
+        self.assertEqual(Job.objects.get(payload__fail=False).status, jobs.DONE)
+
+    def test_retry_waits(self):
+        with patch.dict(jobs.HANDLERS, {"test": Mock(side_effect=RuntimeError)}), self.assertLogs("app.jobs", "ERROR"):
+            jobs.enqueue("test", {})
+            self.assertEqual(jobs.run_pending(), 0)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (jobs.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+
+    def test_idempotency_key(self):
+        with patch.dict(jobs.HANDLERS, {"test": Mock()}):
+            jobs.enqueue("test", {}, key="once")
+            jobs.enqueue("test", {}, key="once")
+            jobs.run_pending()
+            jobs.enqueue("test", {}, key="once")
+            self.assertEqual(Job.objects.count(), 1)
+            Job.objects.update(finished_at=timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS + 1))
+            self.assertEqual(jobs.prune(), 1)
+            jobs.enqueue("test", {}, key="once")
+        self.assertEqual(Job.objects.get().status, jobs.PENDING)
+
+    def test_lease(self):
+        with patch.dict(jobs.HANDLERS, {"test": Mock()}):
+            jobs.enqueue("test", {})
+            self.assertEqual(len(jobs.claim(10)), 1)
+            # Claimed by a worker that died.
+            self.assertEqual(jobs.claim(10), [])
+            Job.objects.update(run_at=timezone.now())
+            job, = jobs.claim(10)
+        self.assertEqual(job.attempts, 2)
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries if "django_session" in query["sql"]]
+
+    def test_cached_db_reads_sessions_from_cache(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        self.assertEqual(self.session_queries(reverse("app:personal-prayer")), [])
+        self.assertEqual(self.session_queries(reverse("app:group-detail", kwargs={"pk": self.group.id})), [])
+        # Written through, so losing the cache only costs a query.
+        self.assertTrue(Session.objects.exists())
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.assertEqual(len(self.session_queries(reverse("app:personal-prayer"))), 1)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        self.assertEqual(self.session_queries(reverse("app:personal-prayer")), [])
+        self.assertFalse(Session.objects.exists())
+
+    def test_messages_use_a_cookie(self):
+        self.client.login(username="testuser", password="y0lo5432")
+        response = self.client.post(reverse("app:add-member", kwargs={"group_id": self.group.id}), {"username": "nobody"})
+        self.assertIn("messages", response.cookies)
+        self.assertNotIn("_messages", self.client.session)
+
+    def test_shm_cache_backend(self):
+        config = settings_module.cache_config("shm", "sessions")
+        self.assertEqual(config["BACKEND"], "django.core.cache.backends.filebased.FileBasedCache")
+        self.assertEqual(Path(config["LOCATION"]), settings_module.CACHE_DIRS["shm"] / "sessions")
+        with self.assertRaises(ValueError):
+            settings_module.cache_config("memcached", "sessions")
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def replica_reads(self, url):
+        with patch("app.routers.replica_alias", return_value="default") as replica_alias:
+            self.client.get(url)
+        return replica_alias.called
+
+    def test_test_mirror_reads_from_primary(self):
+        self.assertEqual(routers.replica_alias(), "default")
+
+    def test_reads_default_to_primary(self):
+        router = routers.PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(PrayerRequest), "default")
+        routers.set_replica_reads(True)
+        try:
+            self.assertEqual(router.db_for_read(Session), "default")
+        finally:
+            routers.set_replica_reads(False)
+
+    def test_list_views_read_from_replica(self):
+        self.assertTrue(self.replica_reads(reverse("app:personal-prayer")))
+        self.assertTrue(self.replica_reads(reverse("app:group-prayers")))
+        self.assertFalse(self.replica_reads(reverse("app:create-group")))
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request"})
+        self.assertFalse(self.replica_reads(reverse("app:personal-prayer")))
+        with override_settings(REPLICA_STICKY_SECONDS=-1):
+            self.client.post(reverse("app:prayer-request"), {"content": "prayer request"})
+        self.assertTrue(self.replica_reads(reverse("app:personal-prayer")))
+
+    def test_only_app_writes_stick_to_primary(self):
+        self.client.logout()
+        self.client.post(reverse("login"), {"username": "testuser", "password": "y0lo5432"})
+        self.assertNotIn(middleware.STICKY_SESSION_KEY, self.client.session)
+        self.assertTrue(self.replica_reads(reverse("app:personal-prayer")))
+
+    def test_anonymous_post_creates_no_session(self):
+        self.client.logout()
+        self.client.post(reverse("app:register"), {"username": "newuser"})
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+
+@override_settings(DATABASE_LOCK_RETRIES=2, DATABASE_LOCK_RETRY_DELAY=0)
+class LockRetryTests(TestCase):
+    def execute(self, *errors):
+        execute = Mock(side_effect=[*errors, "result"])
+        context = {"connection": Mock(in_atomic_block=False)}
+        return execute, lambda: routers.retry_when_locked(execute, "SELECT 1", None, False, context)
+
+    def test_retries_locked_statement(self):
+        execute, run = self.execute(OperationalError("database is locked"), OperationalError("database is locked"))
+        self.assertEqual(run(), "result")
+        self.assertEqual(execute.call_count, 3)
+
+    def test_gives_up_after_retries(self):
+        execute, run = self.execute(*[OperationalError("database is locked")] * 3)
+        self.assertRaises(OperationalError, run)
+
+    def test_other_errors_are_not_retried(self):
+        execute, run = self.execute(OperationalError("no such table: app_prayerrequest"))
+        self.assertRaises(OperationalError, run)
+        self.assertEqual(execute.call_count, 1)
+
+    def test_no_retry_inside_transaction(self):
+        execute = Mock(side_effect=OperationalError("database is locked"))
+        context = {"connection": Mock(in_atomic_block=True)}
+        self.assertRaises(OperationalError, routers.retry_when_locked, execute, "SELECT 1", None, False, context)
+        self.assertEqual(execute.call_count, 1)
+
+    def test_installed_on_connection(self):
+        self.assertIn(routers.retry_when_locked, connection.execute_wrappers)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+        self.client.login(username="testuser", password="y0lo5432")
+        self.prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request")
+        feed.share(self.prayer_request, [self.group])
+
+    def etag(self, url):
+        # The first response sets the CSRF cookie, which the ETag covers.
+        self.client.get(url)
+        return self.client.get(url)["ETag"]
+
+    def revalidate(self, url):
+        return self.client.get(url, headers={"if-none-match": self.etag(url)})
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in [
+            reverse("app:personal-prayer"),
+            reverse("app:answered-prayer-list"),
+            reverse("app:group-prayers"),
+            reverse("app:group-detail", kwargs={"pk": self.group.id}),
+        ]:
+            self.assertEqual(self.revalidate(url).status_code, 304, url)
+
+    def test_not_modified_skips_list_query(self):
+        url = reverse("app:personal-prayer")
+        etag = self.etag(url)
+        # user and the version stamp
+        with self.assertNumQueries(2):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_no_last_modified(self):
+        # The newest row's datetime doesn't move when a row goes away.
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertNotIn("Last-Modified", response)
+        self.prayer_request.delete()
+        response = self.client.get(reverse("app:personal-prayer"), headers={"if-modified-since": http_date()})
+        self.assertEqual(response.status_code, 200)
+
+    def test_answering_changes_stamp(self):
+        url = reverse("app:answered-prayer-list")
+        etag = self.etag(url)
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": self.prayer_request.id}), {"content": "answered prayer"})
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertContains(response, "answered prayer")
+
+    def test_deleting_changes_stamp(self):
+        PrayerRequest.objects.create(user=self.user, content="other prayer request")
+        url = reverse("app:personal-prayer")
+        etag = self.etag(url)
+        self.prayer_request.delete()
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+    def test_new_share_changes_group_stamp(self):
+        url = reverse("app:group-detail", kwargs={"pk": self.group.id})
+        etag = self.etag(url)
+        feed.share(PrayerRequest.objects.create(user=self.user, content="new prayer request"), [self.group])
+        self.assertContains(self.client.get(url, headers={"if-none-match": etag}), "new prayer request")
+
+    def test_new_group_changes_group_list_stamp(self):
+        url = reverse("app:group-prayers")
+        etag = self.etag(url)
+        self.user.groups.add(Group.objects.create(name="testgroup2"))
+        self.assertContains(self.client.get(url, headers={"if-none-match": etag}), "testgroup2")
+
+    def test_etag_differs_between_users(self):
+        User.objects.create_user(username="testuser2", password="y0lo4321")
+        url = reverse("app:personal-prayer")
+        etag = self.etag(url)
+        self.client.login(username="testuser2", password="y0lo4321")
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+    def test_responses_must_revalidate(self):
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+
+class SearchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+        self.user2.groups.add(self.group)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def search(self, query, **params):
+        return self.client.get(reverse("app:search"), {"q": query, **params})
+
+    def contents(self, response):
+        return [prayer_request.content for prayer_request in response.context["results"]]
+
+    def test_user_not_logged_in(self):
+        self.client.logout()
+        response = self.search("healing")
+        self.assertRedirects(response, "/login/?next=/search/%3Fq%3Dhealing")
+
+    def test_matches_content_and_answers(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="Pray for my grandmother", answered=True)
+        AnsweredPrayer.objects.create(prayer_request=prayer_request, content="She recovered fully")
+        PrayerRequest.objects.create(user=self.user, content="Pray for rain")
+        self.assertEqual(self.contents(self.search("grandmother")), ["Pray for my grandmother"])
+        self.assertEqual(self.contents(self.search("recovered")), ["Pray for my grandmother"])
+        self.assertEqual(self.contents(self.search("rain")), ["Pray for rain"])
+
+    def test_prefix_and_all_terms(self):
+        PrayerRequest.objects.create(user=self.user, content="Healing for my brother")
+        PrayerRequest.objects.create(user=self.user, content="Healing for my sister")
+        self.assertEqual(len(self.contents(self.search("heal"))), 2)
+        self.assertEqual(self.contents(self.search("heal sister")), ["Healing for my sister"])
+
+    def test_scoped_to_own_and_group_prayers(self):
+        shared = PrayerRequest.objects.create(user=self.user2, content="shared job interview")
+        feed.share(shared, [self.group])
+        PrayerRequest.objects.create(user=self.user2, content="private job interview")
+        answered = PrayerRequest.objects.create(user=self.user2, content="answered job interview", answered=True)
+        feed.share(answered, [self.group])
+        self.assertEqual(self.contents(self.search("interview")), ["shared job interview"])
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.contents(self.search("interview")), [])
+
+    def test_answering_hides_shared_prayer(self):
+        shared = PrayerRequest.objects.create(user=self.user2, content="shared surgery")
+        feed.share(shared, [self.group])
+        self.assertEqual(self.contents(self.search("surgery")), ["shared surgery"])
+        shared.answered = True
+        shared.save()
+        self.assertEqual(self.contents(self.search("surgery")), [])
+
+    def test_highlight_is_escaped(self):
+        PrayerRequest.objects.create(user=self.user, content="<b>bold</b> request for peace")
+        response = self.search("peace")
+        self.assertContains(response, "&lt;b&gt;bold&lt;/b&gt; request for <mark>peace</mark>", html=False)
+
+    def test_query_syntax_is_not_interpreted(self):
+        PrayerRequest.objects.create(user=self.user, content="peace and comfort")
+        self.assertEqual(self.contents(self.search('peace" ( comfort*')), ["peace and comfort"])
+        self.assertEqual(self.search("").context["results"], [])
+
+    def test_ranked_and_paginated(self):
+        for i in range(7):
+            PrayerRequest.objects.create(user=self.user, content=f"hope {i}")
+        PrayerRequest.objects.create(user=self.user, content="hope hope hope hope")
+        response = self.search("hope")
+        self.assertEqual(self.contents(response)[0], "hope hope hope hope")
+        self.assertTrue(response.context["has_next"])
+        response = self.search("hope", page=2)
+        self.assertEqual(len(response.context["results"]), 2)
+        self.assertFalse(response.context["has_next"])
+        self.assertEqual(self.search("hope", page="x").status_code, 404)
+
+    def test_index_follows_edits_and_deletes(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="old words")
+        prayer_request.content = "new words"
+        prayer_request.save()
+        self.assertEqual(self.contents(self.search("old")), [])
+        self.assertEqual(self.contents(self.search("new")), ["new words"])
+        prayer_request.delete()
+        self.assertEqual(self.contents(self.search("new")), [])
+
+    def test_bulk_created_prayers_are_indexed(self):
+        PrayerRequest.objects.bulk_create([PrayerRequest(user=self.user, content="bulk created request")])
+        self.assertEqual(self.contents(self.search("bulk")), ["bulk created request"])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 is SQLite specific")
+    def test_uses_full_text_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search("anything")
+        self.assertTrue([query for query in queries if "app_prayersearch MATCH" in query["sql"]])
+        self.assertFalse([query for query in queries if "LIKE" in query["sql"]])
+
+    def test_match_expression(self):
+        self.assertEqual(search.match_expression('heal "me" -now'), '"heal"* "me"* "now"*')
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.reset()
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.staff = User.objects.create_user(username="staffuser", password="y0lo4321", is_staff=True)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def test_server_timing_header(self):
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertRegex(response["Server-Timing"], r'^sql;dur=[\d.]+;desc="\d+ queries, 0 duplicate", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_profiled(self):
+        response = self.client.get(reverse("app:personal-prayer"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(profiling.snapshot(), {})
+
+    def test_only_app_views_are_recorded(self):
+        self.client.get(reverse("app:personal-prayer"))
+        self.client.get(reverse("app:personal-prayer"))
+        self.client.get("/login/")
+        stats = profiling.snapshot()
+        self.assertEqual(list(stats), ["app:personal-prayer"])
+        self.assertEqual(stats["app:personal-prayer"]["requests"], 2)
+        self.assertGreater(stats["app:personal-prayer"]["response_bytes"]["p50"], 0)
+        self.assertGreater(stats["app:personal-prayer"]["queries"]["p99"], 0)
+
+    def test_duplicate_queries(self):
+        profile = profiling.start()
+        try:
+            User.objects.get(pk=self.user.pk)
+            User.objects.get(pk=self.user.pk)
+            User.objects.get(pk=self.staff.pk)
+        finally:
+            profiling.stop()
+        self.assertEqual(profile.queries, 3)
+        self.assertEqual(sum(profile.duplicates.values()), 1)
+
+    def test_histogram_percentiles(self):
+        histogram = profiling.Histogram(profiling.COUNT_BOUNDS)
+        for value in range(1, 101):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(50), 50)
+        self.assertAlmostEqual(histogram.percentile(99), 100, delta=25)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.get(reverse("app:personal-prayer"))
+        self.assertEqual(self.client.get(reverse("app:profiling-stats")).status_code, 403)
+        self.client.login(username="staffuser", password="y0lo4321")
+        data = self.client.get(reverse("app:profiling-stats")).json()
+        self.assertEqual(data["sample_rate"], 1)
+        self.assertEqual(data["views"]["app:personal-prayer"]["requests"], 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.group = Group.objects.create(name="testgroup")
+        self.user.groups.add(self.group)
+
+    def answered(self, content, days_ago, groups=()):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content=content, answered=True)
+        feed.share(prayer_request, groups)
+        answer = AnsweredPrayer.objects.create(prayer_request=prayer_request, content=f"{content} answered")
+        AnsweredPrayer.objects.filter(pk=answer.pk).update(datetime=timezone.now() - timedelta(days=days_ago))
+        return prayer_request
+
+    def archive(self, days=30, **options):
+        out = StringIO()
+        call_command("archive_prayers", days=days, stdout=out, **options)
+        return out.getvalue()
+
+    def test_archive_moves_old_answered_requests(self):
+        old = self.answered("old prayer request", 60, [self.group])
+        recent = self.answered("recent prayer request", 5)
+        open_request = PrayerRequest.objects.create(user=self.user, content="open prayer request")
+        answer_id = old.answeredprayer.id
+        share_id = GroupPrayerManager.objects.get(prayer_request=old).id
+
+        self.assertIn("Archived 1 prayer requests", self.archive())
+        self.assertFalse(PrayerRequest.objects.filter(pk=old.pk).exists())
+        self.assertFalse(AnsweredPrayer.objects.filter(pk=answer_id).exists())
+        self.assertFalse(GroupPrayerManager.objects.filter(pk=share_id).exists())
+        archived = ArchivedPrayerRequest.objects.get(pk=old.pk)
+        self.assertEqual((archived.content, archived.datetime, archived.user), (old.content, old.datetime, self.user))
+        self.assertEqual(archived.answeredprayer.id, answer_id)
+        self.assertEqual(ArchivedGroupPrayerManager.objects.get(pk=share_id).group, self.group)
+        self.assertQuerySetEqual(PrayerRequest.objects.order_by("pk"), [recent, open_request])
+
+    def test_batches(self):
+        for i in range(5):
+            self.answered(f"prayer request {i}", 60)
+        output = self.archive(batch_size=2)
+        self.assertEqual(output.splitlines()[:3], [f"{n} prayer requests archived" for n in (2, 4, 5)])
+        self.assertEqual(ArchivedPrayerRequest.objects.count(), 5)
+        self.assertFalse(PrayerRequest.objects.exists())
+
+    def test_invalid_options(self):
+        with self.assertRaises(CommandError):
+            self.archive(days=-1)
+        with self.assertRaises(CommandError):
+            self.archive(batch_size=0)
+
+    def test_answered_list_reads_both_tiers(self):
+        # Alternate tiers so every page mixes hot and archived rows.
+        for i in range(8):
+            self.answered(f"prayer request {i}", 100 - i * 10)
+        archive.archive(PrayerRequest.objects.filter(content__in=[f"prayer request {i}" for i in range(0, 8, 2)]))
+        self.assertEqual(ArchivedPrayerRequest.objects.count(), 4)
+        self.client.login(username="testuser", password="y0lo5432")
+
+        response = self.client.get(reverse("app:answered-prayer-list"))
+        first = [answer.content for answer in response.context["object_list"]]
+        self.assertEqual(first, [f"prayer request {i} answered" for i in range(7, 1, -1)])
+        self.assertContains(response, "prayer request 6 answered")
+        response = self.client.get(reverse("app:answered-prayer-list"), {"cursor": response.context["page_obj"].next_cursor})
+        self.assertEqual([answer.content for answer in response.context["object_list"]], ["prayer request 1 answered", "prayer request 0 answered"])
+        response = self.client.get(reverse("app:answered-prayer-list"), {"cursor": response.context["page_obj"].previous_cursor})
+        self.assertEqual([answer.content for answer in response.context["object_list"]], first)
+
+    def test_export_and_search_include_archive(self):
+        self.answered("archived grandmother", 60, [self.group])
+        self.answered("hot grandmother", 5)
+        self.archive()
+        rows = list(export.journal_rows(self.user))
+        self.assertEqual([row["content"] for row in rows], ["archived grandmother", "hot grandmother"])
+        self.assertEqual(rows[0]["groups"], ["testgroup"])
+        self.assertEqual(rows[0]["answer"], "archived grandmother answered")
+        self.assertTrue(rows[0]["answered"])
+        results = search.search(self.user, "grandmother", 10)
+        self.assertEqual(sorted(result.content for result in results), ["archived grandmother", "hot grandmother"])
+        self.assertEqual(len(search.search(User.objects.create_user(username="testuser2"), "grandmother", 10)), 0)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="y0lo5432")
+        self.user2 = User.objects.create_user(username="testuser2", password="y0lo4321")
+        self.group = Group.objects.create(name="testgroup")
+        self.group2 = Group.objects.create(name="testgroup2")
+        self.user.groups.add(self.group, self.group2)
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def assertNoDrift(self):
+        self.assertEqual(counters.repair(fix=False), [])
+
+    def dashboard(self):
+        return self.client.get(reverse("app:index")).context["dashboard"]
+
+    def group_row(self, dashboard, group):
+        return next(row for row in dashboard["groups"] if row["group"] == group)
+
+    def test_views_keep_counters(self):
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request1", "groups": [self.group.id]})
+        self.client.post(reverse("app:prayer-request"), {"content": "prayer request2", "groups": [self.group.id, self.group2.id]})
+        jobs.run_pending()
+        self.assertNoDrift()
+        dashboard = self.dashboard()
+        self.assertEqual((dashboard["open"], dashboard["answered_this_month"]), (2, 0))
+        self.assertEqual((self.group_row(dashboard, self.group)["open"], self.group_row(dashboard, self.group)["members"]), (2, 1))
+
+        prayer_request1 = PrayerRequest.objects.get(content="prayer request1")
+        self.client.post(reverse("app:add-answered-prayer", kwargs={"prayer_request_id": prayer_request1.id}), {"content": "answered"})
+        jobs.run_pending()
+        self.assertNoDrift()
+        dashboard = self.dashboard()
+        self.assertEqual((dashboard["open"], dashboard["answered_this_month"]), (1, 1))
+        self.assertEqual(self.group_row(dashboard, self.group)["open"], 1)
+
+        prayer_request2 = PrayerRequest.objects.get(content="prayer request2")
+        self.client.post(reverse("app:delete-prayer-request", kwargs={"pk": prayer_request2.id}))
+        self.client.post(reverse("app:add-member", kwargs={"group_id": self.group.id}), {"username": "testuser2"})
+        jobs.run_pending()
+        self.assertNoDrift()
+        dashboard = self.dashboard()
+        self.assertEqual(dashboard["open"], 0)
+        self.assertEqual((self.group_row(dashboard, self.group)["open"], self.group_row(dashboard, self.group)["members"]), (0, 2))
+
+        PrayerRequest.objects.get(pk=prayer_request1.pk).delete()
+        self.assertNoDrift()
+        self.assertEqual(self.dashboard()["answered_this_month"], 0)
+
+    def test_bulk_paths_keep_counters(self):
+        self.client.post(
+            reverse("app:bulk-prayer-requests"),
+            json.dumps({"prayer_requests": [{"content": "bulk", "groups": [self.group.id]}] * 3}),
+            content_type="application/json",
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as source:
+            source.write(json.dumps({"user": "testuser2", "content": "imported", "answer": "answered", "groups": ["testgroup"]}))
+        self.addCleanup(os.remove, source.name)
+        call_command("import_prayers", source.name, stdout=StringIO())
+        call_command("generate_data", users=3, groups=2, groups_per_user=1, prayers_per_user=4, stdout=StringIO())
+        jobs.run_pending()
+        self.assertNoDrift()
+        self.assertEqual(self.dashboard()["open"], 3)
+
+    def test_archive_changes_no_counter(self):
+        prayer_request = PrayerRequest.objects.create(user=self.user, content="prayer request", answered=True)
+        AnsweredPrayer.objects.create(prayer_request=prayer_request, content="answered")
+        before = list(Counter.objects.values_list("scope", "name", "value").order_by("scope", "name"))
+        archive.archive([prayer_request.id])
+        self.assertEqual(list(Counter.objects.values_list("scope", "name", "value").order_by("scope", "name")), before)
+        self.assertNoDrift()
+
+    def test_memberships(self):
+        user3 = User.objects.create_user(username="testuser3")
+        self.group.user_set.add(self.user2, user3)
+        self.user2.groups.remove(self.group, self.group2)
+        self.group.user_set.remove(self.user2)
+        self.assertNoDrift()
+        self.group.user_set.clear()
+        self.user2.groups.add(self.group2)
+        self.user2.groups.clear()
+        self.assertNoDrift()
+        self.user.groups.add(self.group)
+        user3.groups.add(self.group)
+        user3.delete()
+        self.group2.delete()
+        self.assertNoDrift()
+        self.assertFalse(Counter.objects.filter(scope__in=[f"user:{user3.pk}", f"group:{self.group2.pk}"]).exists())
+
+    def test_dashboard_query_count_does_not_grow(self):
+        def index_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("app:index"))
+            return len(queries)
+
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        self.client.get(reverse("app:index"))
+        baseline = index_queries()
+        for i in range(20):
+            prayer_request = PrayerRequest.objects.create(user=self.user, content=f"prayer request {i}", answered=i % 2 == 0)
+            feed.share(prayer_request, [self.group, self.group2])
+        self.assertEqual(index_queries(), baseline)
+        self.assertContains(self.client.get(reverse("app:index")), "Answered this month")
+
+    def test_repair_command(self):
+        PrayerRequest.objects.create(user=self.user, content="prayer request")
+        Counter.objects.filter(scope=f"user:{self.user.pk}", name="open").update(value=5)
+        Counter.objects.create(scope="group:999", name="open", value=2)
+        out = StringIO()
+        call_command("repair_counters", dry_run=True, stdout=out)
+        self.assertIn(f"user:{self.user.pk} open: stored 5, expected 1", out.getvalue())
+        self.assertIn("group:999 open: stored 2, expected 0", out.getvalue())
+        self.assertEqual(len(counters.repair(fix=False)), 2)
+        out = StringIO()
+        call_command("repair_counters", stdout=out)
+        self.assertIn("Repaired 2 counters", out.getvalue())
+        self.assertNoDrift()
+        self.assertFalse(Counter.objects.filter(scope="group:999").exists())
+
+
+class AssetBuildTests(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="testuser", password="y0lo5432")
+        self.client.login(username="testuser", password="y0lo5432")
+
+    def test_build_is_up_to_date(self):
+        self.assertEqual(assets.stale(), [], "run python manage.py build_assets")
+
+    def test_minify_css(self):
+        source = "/* note */\na > b:hover ,\n.c {\n    color: red;\n    margin: 0 auto;\n}\n@media (min-width: 876px) {\n  .c { width: calc(100% - 2rem); }\n}\n"
+        self.assertEqual(
+            assets.minify_css(source),
+            "a>b:hover,.c{color:red;margin:0 auto}@media (min-width:876px){.c{width:calc(100% - 2rem)}}\n",
+        )
+
+    def test_rebase_urls(self):
+        self.assertEqual(
+            assets.rebase_urls("a{background:url(images/x.jpg)}b{background:url('data:x')}", "app/base.css"),
+            "a{background:url(../images/x.jpg)}b{background:url('data:x')}",
+        )
+
+    def test_sprite_holds_the_used_icons(self):
+        sprite = (assets.STATIC_DIR / assets.SPRITE).read_text()
+        self.assertEqual(re.findall(r'<symbol id="([\w-]+)"', sprite), assets.used_icons())
+        self.assertIn("trash", assets.used_icons())
+
+    def test_page_loads_one_bundle(self):
+        content = self.client.get(reverse("app:personal-prayer")).content.decode()
+        self.assertNotIn("font-awesome", content)
+        self.assertEqual(re.findall(r'<link rel="stylesheet" href="([^"]+)"', content), ["/static/app/build/personal-prayer.css"])
+        self.assertEqual(re.findall(r'<script src="([^"]+)"', content), ["/static/app/build/personal-prayer.js"])
+        content = self.client.get(reverse("app:index")).content.decode()
+        self.assertEqual(re.findall(r'<script src="([^"]+)"', content), ["/static/app/build/navbar.js"])
+        self.assertIn('<use href="/static/app/build/icons.svg#bars">', content)
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        with tempfile.TemporaryDirectory() as static_root:
+            with override_settings(STATIC_ROOT=static_root, STORAGES=DEPLOYED_STORAGES):
+                call_command("collectstatic", interactive=False, verbosity=0)
+            with open(os.path.join(static_root, "staticfiles.json")) as manifest:
+                paths = json.load(manifest)["paths"]
+            bundle = os.path.join(static_root, paths["app/build/personal-prayer.css"])
+            self.assertRegex(paths["app/build/personal-prayer.css"], r"^app/build/personal-prayer\.[0-9a-f]{12}\.css$")
+            self.assertTrue(os.path.exists(bundle + ".gz"))
+            self.assertTrue(os.path.exists(bundle + ".br"))
@@ -1,18 +1,38 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = "app"
-urlpatterns = [
-    path("", views.IndexView.as_view(), name="index"),
-    path("personal-prayer/", views.PersonalPrayerView.as_view(), name="personal-prayer"),
-    path("delete-prayer-request/<pk>/", views.PrayerRequestDeleteView.as_view(), name="delete-prayer-request"),
-    path("add-answered-prayer/<int:prayer_request_id>/", views.AddAnsweredPrayerView.as_view(), name="add-answered-prayer"),
-    path("answered-prayer-list/", views.AnsweredPrayerListView.as_view(), name="answered-prayer-list"),
-    path("register/", views.RegistrationView.as_view(), name="register"),
-    path("prayer-request/", views.AddPrayerRequestView.as_view(), name="prayer-request"),
-    path("create-group/", views.CreateGroupView.as_view(), name="create-group"),
-    path("group-prayers/", views.GroupListView.as_view(), name="group-prayers"),
-    path("group-prayers/<pk>/", views.GroupDetailView.as_view(), name="group-detail"),
-    path("group-prayers/<int:group_id>/add-member/", views.AddMemberView.as_view(), name="add-member"),
-]
\ No newline at end of file
+
+
+def build_urlpatterns(async_views=False):
+    def list_view(name):
+        # Under ASGI the list pages and the export use their async variants.
+        return getattr(views, f"Async{name}" if async_views else name).as_view()
+
+    return [
+        path("", views.IndexView.as_view(), name="index"),
+        path("personal-prayer/", list_view("PersonalPrayerView"), name="personal-prayer"),
+        path("delete-prayer-request/<pk>/", views.PrayerRequestDeleteView.as_view(), name="delete-prayer-request"),
+        path("add-answered-prayer/<int:prayer_request_id>/", views.AddAnsweredPrayerView.as_view(), name="add-answered-prayer"),
+        path("answered-prayer-list/", list_view("AnsweredPrayerListView"), name="answered-prayer-list"),
+        path("export/", list_view("ExportJournalView"), name="export-journal"),
+        path("search/", views.SearchView.as_view(), name="search"),
+        path("profiling/", views.ProfilingStatsView.as_view(), name="profiling-stats"),
+        path("register/", views.RegistrationView.as_view(), name="register"),
+        path("prayer-request/", views.AddPrayerRequestView.as_view(), name="prayer-request"),
+        path("api/prayer-requests/", views.BulkPrayerRequestView.as_view(), name="bulk-prayer-requests"),
+        path("api/prayer-requests/<int:prayer_request_id>/delete/", views.DeletePrayerRequestApiView.as_view(), name="api-delete-prayer-request"),
+        path("api/prayer-requests/<int:prayer_request_id>/answer/", views.AnswerPrayerRequestApiView.as_view(), name="api-answer-prayer-request"),
+        path("api/sync/", views.SyncView.as_view(), name="sync"),
+        path("create-group/", views.CreateGroupView.as_view(), name="create-group"),
+        path("group-prayers/", list_view("GroupListView"), name="group-prayers"),
+        path("group-prayers/<pk>/", list_view("GroupDetailView"), name="group-detail"),
+        path("group-prayers/<int:group_id>/events/", views.GroupEventsView.as_view(streaming=async_views), name="group-events"),
+        path("group-prayers/<int:group_id>/add-member/", views.AddMemberView.as_view(), name="add-member"),
+        path("group-prayers/<int:group_id>/add-member/usernames/", views.UsernameSuggestionView.as_view(), name="username-suggestions"),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_VIEWS)
@@ -1,4 +1,11 @@
-from django.shortcuts import redirect
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
@@ -7,36 +14,47 @@ from django.contrib.messages.views import SuccessMessageMixin
 from django.urls import reverse_lazy
 from django.views import generic
 from django.views.generic.edit import CreateView, DeleteView
-from operator import attrgetter
 
+from . import archive, caching, changes, counters, events, export, feed, jobs, membership, profiling, search, tasks
 from .forms import AnsweredPrayerForm, RegistrationForm, AddMemberForm, PrayerRequestForm, DeleteForm
-from .models import AnsweredPrayer, PrayerRequest, GroupPrayerManager
+from .models import AnsweredPrayer, PrayerRequest, GroupFeedItem
+from .caching import CachedPageMixin, ConditionalPageMixin
+from .pagination import KeysetPaginationMixin
 
 class NewLoginView(LoginView):
     template_name = "app/login.html"
     next_page = "app:index"
 
 class IndexView(LoginRequiredMixin, generic.TemplateView):
+    read_from_replica = True
     template_name="app/index.html"
     login_url = reverse_lazy("login")
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["dashboard"] = counters.dashboard(self.request.user)
+        return context
+
 
-class PersonalPrayerView(LoginRequiredMixin, generic.ListView):
+class PersonalPrayerView(LoginRequiredMixin, ConditionalPageMixin, CachedPageMixin, KeysetPaginationMixin, generic.ListView):
+    read_from_replica = True
     model = PrayerRequest
     login_url = reverse_lazy("login")
     template_name = "app/personal-prayer.html"
+    context_object_name = "prayer_request_list"
     paginate_by = 6
 
     def get_queryset(self):
-        return PrayerRequest.objects.filter(user=self.request.user, answered=False).order_by("-datetime")
+        return PrayerRequest.objects.filter(user=self.request.user, answered=False)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["prayer_request_list"] = self.get_queryset()
-        return context
+    def get_page_stamp(self):
+        # Answering bumps updated_at and deleting drops the count.
+        stamp = PrayerRequest.objects.filter(user=self.request.user).aggregate(count=Count("id"), updated=Max("updated_at"))
+        return [stamp["count"]], stamp["updated"]
 
 
 class AddPrayerRequestView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
+    writes_app_data = True
     model = PrayerRequest
     form_class = PrayerRequestForm
     template_name = "app/prayer-request.html"
@@ -51,14 +69,80 @@ class AddPrayerRequestView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        self.object = form.save()
-        groups = form.cleaned_data["groups"]
-        if groups:
-            for group in groups:
-                GroupPrayerManager.objects.create(prayer_request=self.object, group=group)
-        return super().form_valid(form)
+        # The feed fan-out and counters are left to the worker (app/tasks.py).
+        with transaction.atomic(), counters.suspended():
+            response = super().form_valid(form)
+            groups = form.cleaned_data["groups"]
+            feed.add_shares([(self.object, groups)])
+            tasks.prayer_request_added(self.object, groups)
+        return response
+
+
+class BulkPrayerRequestView(LoginRequiredMixin, generic.View):
+    """
+    Create several prayer requests, each shared with any of the user's groups,
+    in one all-or-nothing call. Expects a JSON body like
+    {"prayer_requests": [{"content": "...", "groups": [1, 2], "client_id": "..."}]}.
+    """
+    writes_app_data = True
+    raise_exception = True
+    max_prayer_requests = 500
+
+    def post(self, request, *args, **kwargs):
+        try:
+            entries = json.loads(request.body)["prayer_requests"]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"errors": ["Expected a JSON object with a prayer_requests list."]}, status=400)
+        if not isinstance(entries, list) or not entries:
+            return JsonResponse({"errors": ["prayer_requests must be a non-empty list."]}, status=400)
+        if len(entries) > self.max_prayer_requests:
+            return JsonResponse({"errors": [f"At most {self.max_prayer_requests} prayer requests per call."]}, status=400)
+
+        groups = {group.id: group for group in Group.objects.filter(id__in=membership.group_ids(request.user))}
+        errors = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                errors.append(f"prayer_requests[{index}]: expected an object.")
+                continue
+            content = entry.get("content")
+            if not isinstance(content, str) or not content.strip():
+                errors.append(f"prayer_requests[{index}]: content is required.")
+            group_ids = entry.get("groups", [])
+            # Check the type first: a list or object id isn't hashable.
+            if not isinstance(group_ids, list) or not all(
+                type(group_id) is int and group_id in groups for group_id in group_ids
+            ):
+                errors.append(f"prayer_requests[{index}]: groups must be ids of groups you belong to.")
+        if errors:
+            return JsonResponse({"errors": errors}, status=400)
+
+        # Like a single add, the feed fan-out and counters are left to the
+        # worker (app/tasks.py).
+        with transaction.atomic():
+            prayer_requests = PrayerRequest.objects.bulk_create(
+                [PrayerRequest(user=request.user, content=entry["content"]) for entry in entries]
+            )
+            shares = [
+                (prayer_request, [groups[group_id] for group_id in dict.fromkeys(entry.get("groups", []))])
+                for prayer_request, entry in zip(prayer_requests, entries)
+            ]
+            feed.add_shares(shares)
+            changes.prayer_requests_added(prayer_requests)
+            tasks.prayer_requests_added(shares)
+
+        created = [
+            {
+                "id": prayer_request.id,
+                "client_id": entry.get("client_id"),
+                "datetime": prayer_request.datetime,
+                "groups": list(dict.fromkeys(entry.get("groups", []))),
+            }
+            for prayer_request, entry in zip(prayer_requests, entries)
+        ]
+        return JsonResponse({"prayer_requests": created}, status=201)
 
 class PrayerRequestDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+    writes_app_data = True
     model = PrayerRequest
     login_url = reverse_lazy("login")
     template_name = "app/delete-prayer-request.html"
@@ -72,6 +156,7 @@ class PrayerRequestDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteVie
 
 
 class AddAnsweredPrayerView(LoginRequiredMixin, CreateView):
+    writes_app_data = True
     model = AnsweredPrayer
     login_url = reverse_lazy("login")
     form_class = AnsweredPrayerForm
@@ -80,27 +165,149 @@ class AddAnsweredPrayerView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         prayer_request_id = self.kwargs["prayer_request_id"]
-        prayer_request = PrayerRequest.objects.get(id=prayer_request_id)
+        prayer_request = get_object_or_404(PrayerRequest, id=prayer_request_id, user=self.request.user, answered=False)
+        self.object = answer_prayer_request(prayer_request, form)
+        return redirect(self.get_success_url())
+
+
+def answer_prayer_request(prayer_request, form):
+    """Save a valid AnsweredPrayerForm as the answer to ``prayer_request``."""
+    # The feed withdrawal and counters are left to the worker (app/tasks.py).
+    with transaction.atomic(), counters.suspended():
         prayer_request.answered = True
         prayer_request.save()
         form.instance.prayer_request = prayer_request
-        return super().form_valid(form)
+        answer = form.save()
+        tasks.prayer_request_answered(prayer_request, answer)
+        return answer
+
+
+class PrayerRequestApiView(LoginRequiredMixin, generic.View):
+    """Base for the JSON actions the personal prayer page takes on one of the user's open requests."""
+    writes_app_data = True
+    raise_exception = True
+    http_method_names = ["post"]
+
+    def get_prayer_request(self):
+        return get_object_or_404(PrayerRequest, id=self.kwargs["prayer_request_id"], user=self.request.user, answered=False)
 
 
-class AnsweredPrayerListView(LoginRequiredMixin, generic.ListView):
+class DeletePrayerRequestApiView(PrayerRequestApiView):
+    def post(self, request, *args, **kwargs):
+        prayer_request = self.get_prayer_request()
+        prayer_request.delete()
+        return JsonResponse({"id": self.kwargs["prayer_request_id"]})
+
+
+class AnswerPrayerRequestApiView(PrayerRequestApiView):
+    """Answer a request. Expects a JSON body like {"content": "..."}."""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({"errors": ["Expected a JSON object with the answer's content."]}, status=400)
+        prayer_request = self.get_prayer_request()
+        form = AnsweredPrayerForm(data)
+        if not form.is_valid():
+            return JsonResponse({"errors": [error for errors in form.errors.values() for error in errors]}, status=400)
+        answer = answer_prayer_request(prayer_request, form)
+        return JsonResponse({"id": prayer_request.id, "answer": {"id": answer.id, "datetime": answer.datetime}})
+
+
+class SyncView(LoginRequiredMixin, generic.View):
+    """
+    Delta sync for API clients: the requests, shares, answers and memberships
+    that changed after ``?cursor=`` for the user and their groups, see
+    app/changes.py. Start from cursor 0 and pass back the returned cursor
+    until has_more is false. After a membership is added, ``&group=<id>``
+    from cursor 0 fetches what that group saw before.
+    """
+    # A lagging replica only delays changes: the cursor never passes them.
+    read_from_replica = True
+    raise_exception = True
+    http_method_names = ["get"]
+    page_size = 500
+
+    def get(self, request, *args, **kwargs):
+        try:
+            cursor = int(request.GET.get("cursor", 0))
+        except ValueError:
+            cursor = -1
+        if cursor < 0:
+            return JsonResponse({"errors": ["cursor must be a non-negative integer."]}, status=400)
+        group_id = request.GET.get("group")
+        if group_id is not None:
+            if not membership.is_member(request.user, group_id):
+                return JsonResponse({"errors": ["group must be the id of a group you belong to."]}, status=400)
+            group_id = int(group_id)
+        return JsonResponse(changes.since(request.user, cursor, self.page_size, group_id))
+
+
+class AnsweredPrayerListView(LoginRequiredMixin, ConditionalPageMixin, CachedPageMixin, KeysetPaginationMixin, generic.ListView):
+    read_from_replica = True
     model = AnsweredPrayer
     template_name = "app/answered-prayer-list.html"
     login_url = reverse_lazy("login")
     paginate_by = 6
     
     def get_queryset(self):
-        prayer_requests = PrayerRequest.objects.filter(user=self.request.user).order_by("-datetime")
-        queryset = []
-        for prayer_request in prayer_requests:
-            if AnsweredPrayer.objects.filter(prayer_request=prayer_request).exists():
-                queryset.append(AnsweredPrayer.objects.get(prayer_request=prayer_request))
-            sorted_queryset = sorted(queryset, key=attrgetter('datetime'), reverse=True)
-        return sorted_queryset
+        # Hot and archive tiers; KeysetPaginator merges their pages.
+        return archive.answered_prayers(self.request.user)
+
+    def get_page_stamp(self):
+        # Archiving deletes hot rows, which changes the count.
+        stamp = PrayerRequest.objects.filter(user=self.request.user).aggregate(count=Count("id"), updated=Max("updated_at"))
+        return [stamp["count"]], stamp["updated"]
+
+class ExportJournalView(LoginRequiredMixin, generic.View):
+    login_url = reverse_lazy("login")
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in export.FORMATS:
+            raise Http404("Unknown export format")
+        encode, content_type = export.FORMATS[export_format]
+        response = StreamingHttpResponse(self.stream(encode(export.journal_rows(request.user))), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="prayer-journal.{export_format}"'
+        return response
+
+    def stream(self, lines):
+        return lines
+
+class SearchView(LoginRequiredMixin, generic.TemplateView):
+    read_from_replica = True
+    template_name = "app/search.html"
+    login_url = reverse_lazy("login")
+    paginate_by = 6
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "")
+        try:
+            page = int(self.request.GET.get("page", 1))
+        except ValueError:
+            raise Http404("Invalid page")
+        if page < 1:
+            raise Http404("Invalid page")
+        # One extra row tells whether there is a next page without a COUNT.
+        results = search.search(self.request.user, query, self.paginate_by + 1, (page - 1) * self.paginate_by)
+        context["query"] = query
+        context["results"] = results[: self.paginate_by]
+        context["page"] = page
+        context["has_next"] = len(results) > self.paginate_by
+        return context
+
+class ProfilingStatsView(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+    login_url = reverse_lazy("login")
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({"sample_rate": settings.PROFILING_SAMPLE_RATE, "views": profiling.snapshot(), "jobs": jobs.backlog()})
 
 class RegistrationView(SuccessMessageMixin, CreateView):
     template_name= "app/register.html"
@@ -110,6 +317,7 @@ class RegistrationView(SuccessMessageMixin, CreateView):
 
 
 class CreateGroupView(LoginRequiredMixin, CreateView, SuccessMessageMixin):
+    writes_app_data = True
     model = Group
     fields = ["name"]
     login_url = reverse_lazy("login")
@@ -122,66 +330,194 @@ class CreateGroupView(LoginRequiredMixin, CreateView, SuccessMessageMixin):
         return super().form_valid(form)
     
 
-class GroupListView(LoginRequiredMixin, generic.ListView):
+class GroupListView(LoginRequiredMixin, ConditionalPageMixin, KeysetPaginationMixin, generic.ListView):
+    read_from_replica = True
     model = Group
     template_name = "app/group-list.html"
     login_url = reverse_lazy("login")
+    context_object_name = "group_list"
+    keyset_ordering = ("name", "id")
     paginate_by = 6
 
     def get_queryset(self):
-        return self.request.user.groups.all()
+        return Group.objects.filter(id__in=membership.group_ids(self.request.user))
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["group_list"] = self.request.user.groups.all()
-        return context
+    def get_page_stamp(self):
+        return sorted(membership.group_ids(self.request.user)), None
     
-class GroupDetailView(LoginRequiredMixin, UserPassesTestMixin, generic.DetailView):
+class GroupDetailView(LoginRequiredMixin, UserPassesTestMixin, ConditionalPageMixin, CachedPageMixin, KeysetPaginationMixin, generic.DetailView):
+    read_from_replica = True
     model = Group
     login_url = reverse_lazy("login")
     template_name = "app/group-detail.html"
+    paginate_by = 6
 
     def test_func(self):
-        group_id = self.kwargs["pk"]
-        return self.request.user.groups.filter(id=group_id).exists()
+        return membership.is_member(self.request.user, self.kwargs["pk"])
+
+    def get_cache_scopes(self):
+        return [caching.group_scope(self.kwargs["pk"])]
     
+    def get_feed_queryset(self):
+        return GroupFeedItem.objects.filter(group=self.kwargs["pk"])
+
+    def get_page_stamp(self):
+        # Feed ids only grow, so the max id and the count catch shares and withdrawals.
+        stamp = self.get_feed_queryset().aggregate(count=Count("id"), last_id=Max("id"), updated=Max("datetime"))
+        return [stamp["count"], stamp["last_id"]], stamp["updated"]
+
     def get_context_data(self, **kwargs):
-        group_id = self.kwargs["pk"]
         context = super().get_context_data(**kwargs)
-        prayer_keys = GroupPrayerManager.objects.filter(group=group_id)
-        context["prayer_list"] = []
-        for prayer_key in prayer_keys:
-            if not prayer_key.prayer_request.answered:
-              context["prayer_list"].append(prayer_key.prayer_request)
+        _, page = self.paginate_keyset(self.get_feed_queryset(), self.paginate_by)
+        context["page_obj"] = page
+        context["prayer_list"] = page.object_list
         return context
 
+class GroupEventsView(generic.View):
+    """
+    Stream a group's new and answered requests to its page as Server-Sent
+    Events (see app/events.py). Only the ASGI app streams; under WSGI an open
+    stream would hold a worker thread for as long as the page stays open.
+    """
+    streaming = True
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        group_id = self.kwargs["group_id"]
+        if not user.is_authenticated or not await sync_to_async(membership.is_member)(user, group_id):
+            return HttpResponseForbidden()
+        if not self.streaming:
+            # 204 tells EventSource not to reconnect.
+            return HttpResponse(status=204)
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        response = StreamingHttpResponse(events.stream(group_id, last_event_id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx-style proxies from buffering the stream.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class AddMemberView(LoginRequiredMixin, UserPassesTestMixin, generic.FormView):
+    writes_app_data = True
     login_url = reverse_lazy("login")
     template_name = "app/add-member.html"
     form_class = AddMemberForm
 
     def test_func(self):
-        group_id = self.kwargs["group_id"]
-        return self.request.user.groups.filter(id=group_id).exists()
+        return membership.is_member(self.request.user, self.kwargs["group_id"])
 
     def get_success_url(self):
         group_id = self.kwargs["group_id"]
         return reverse_lazy("app:add-member", kwargs={"group_id":group_id})
     
     def form_valid(self, form):
-        group_id = self.kwargs["group_id"]
-        new_member_username = form.cleaned_data["username"]
-        try:
-            new_member = User.objects.get(username=new_member_username)
-        except:
-            messages.add_message(self.request, messages.ERROR, "Username does not exist")
-            return redirect("app:add-member", group_id=group_id)
-        group = Group.objects.get(id=group_id)
-        new_member.groups.add(group)
+        group = get_object_or_404(Group, id=self.kwargs["group_id"])
+        usernames = form.cleaned_data["username"]
+        new_members = list(User.objects.filter(username__in=usernames))
+        if new_members:
+            # One INSERT for all of them; m2m_changed updates the membership
+            # caches and the worker the member count (app/tasks.py).
+            with transaction.atomic(), counters.suspended():
+                group.user_set.add(*new_members)
+                tasks.members_added(group, new_members)
+            messages.add_message(self.request, messages.SUCCESS, f"Added {', '.join(sorted(user.username for user in new_members))} to {group.name}")
+        found = {user.username for user in new_members}
+        unknown = [username for username in usernames if username not in found]
+        if unknown:
+            messages.add_message(self.request, messages.ERROR, f"Username does not exist: {', '.join(unknown)}")
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         group_id = self.kwargs["group_id"]
         context["group_id"] = group_id
-        return context
\ No newline at end of file
+        return context
+
+
+class UsernameSuggestionView(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+    """Usernames starting with ?q=, ignoring case, for the add member form."""
+    raise_exception = True
+    limit = 10
+
+    def test_func(self):
+        return membership.is_member(self.request.user, self.kwargs["group_id"])
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({"usernames": membership.username_suggestions(request.GET.get("q", ""), self.limit)})
+
+class AsyncViewMixin:
+    """
+    Serve one of the views above through the async ORM when running under
+    ASGI (see list/asgi.py). Subclasses put this first in their bases and
+    reuse the sync view's queryset, permission and page cache hooks.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        # LoginRequiredMixin and UserPassesTestMixin check access in dispatch
+        # with the sync ORM, so get() repeats those checks asynchronously.
+        return generic.View.dispatch(self, request, *args, **kwargs)
+
+    async def atest_func(self):
+        if isinstance(self, UserPassesTestMixin):
+            return await sync_to_async(self.test_func)()
+        return True
+
+    async def get(self, request, *args, **kwargs):
+        # Resolve the user now so nothing later evaluates the lazy sync one.
+        request.user = await request.auser()
+        if not request.user.is_authenticated or not await self.atest_func():
+            return self.handle_no_permission()
+        etag = None
+        if isinstance(self, ConditionalPageMixin):
+            etag = await sync_to_async(self.get_validators)()
+            not_modified = self.get_not_modified(etag)
+            if not_modified is not None:
+                return self.add_validators(etag, not_modified)
+        key = response = None
+        if isinstance(self, CachedPageMixin):
+            key, response = await sync_to_async(self.get_cached_page)()
+        if response is None:
+            response = self.render_to_response(await self.aget_context_data())
+            if isinstance(self, CachedPageMixin):
+                response = self.cache_page_on_render(key, response)
+        if etag is not None:
+            response = self.add_validators(etag, response)
+        return response
+
+
+class AsyncListViewMixin(AsyncViewMixin):
+    async def aget_context_data(self):
+        self.object_list = await sync_to_async(self.get_queryset)()
+        await self.apaginate_keyset(self.object_list, self.get_paginate_by(self.object_list))
+        return self.get_context_data()
+
+
+class AsyncPersonalPrayerView(AsyncListViewMixin, PersonalPrayerView):
+    pass
+
+
+class AsyncAnsweredPrayerListView(AsyncListViewMixin, AnsweredPrayerListView):
+    pass
+
+
+class AsyncGroupListView(AsyncListViewMixin, GroupListView):
+    pass
+
+
+class AsyncGroupDetailView(AsyncViewMixin, GroupDetailView):
+    async def aget_context_data(self):
+        self.object = await aget_object_or_404(Group, pk=self.kwargs["pk"])
+        await self.apaginate_keyset(self.get_feed_queryset(), self.paginate_by)
+        return self.get_context_data(object=self.object)
+
+
+class AsyncExportJournalView(AsyncViewMixin, ExportJournalView):
+    async def get(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return ExportJournalView.get(self, request, *args, **kwargs)
+
+    def stream(self, lines):
+        # Streamed as is, the lines would all be read into memory first.
+        return export.aiterate(lines)
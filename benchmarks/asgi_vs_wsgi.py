@@ -0,0 +1,169 @@
+"""
+Compare the WSGI (gunicorn sync workers) and ASGI (gunicorn + uvicorn
+workers) serving paths on the list and group pages.
+
+Both servers run with the same number of workers against a seeded copy of
+the database, and the same threaded load generator drives each one. Requests
+carry no CSRF cookie, so the page cache is bypassed and every request goes
+through the ORM. Results are printed as JSON.
+
+    python benchmarks/asgi_vs_wsgi.py --workers 2 --concurrency 16 --requests 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from importlib import import_module
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SERVERS = {
+    "wsgi": ["list.wsgi:application", "-k", "sync"],
+    "asgi": ["list.asgi:application", "-k", "uvicorn_worker.UvicornWorker"],
+}
+SETTINGS = """\
+from list.settings import *
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1"]
+# No collectstatic run, so no manifest to look fingerprinted names up in.
+STORAGES = {**STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}}
+"""
+
+
+def seed(prayer_requests):
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import Group, User
+    from django.core.management import call_command
+
+    from app import feed
+    from app.models import PrayerRequest
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create_user(username="benchmark")
+    group = Group.objects.create(name="benchmark")
+    user.groups.add(group)
+    created = PrayerRequest.objects.bulk_create(
+        PrayerRequest(user=user, content=f"prayer request {i}") for i in range(prayer_requests)
+    )
+    feed.share_many((prayer_request, [group]) for prayer_request in created)
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session["_auth_user_id"] = str(user.pk)
+    session["_auth_user_backend"] = "django.contrib.auth.backends.ModelBackend"
+    session["_auth_user_hash"] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key, [
+        "/personal-prayer/",
+        "/answered-prayer-list/",
+        "/group-prayers/",
+        f"/group-prayers/{group.pk}/",
+    ]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/login/")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def load(port, paths, cookie, concurrency, total):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    per_thread = total // concurrency
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        mine = []
+        for i in range(per_thread):
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            conn.request("GET", path, headers={"Cookie": cookie})
+            response = conn.getresponse()
+            response.read()
+            mine.append(time.perf_counter() - start)
+            if response.status != 200:
+                with lock:
+                    errors.append((path, response.status))
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--prayer-requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="prayer-bench-"))
+    try:
+        db = tmp / "db.sqlite3"
+        shutil.copy(BASE_DIR / "db.sqlite3", db)
+        (tmp / "bench_settings.py").write_text(SETTINGS)
+        env = dict(
+            os.environ,
+            PRAYER_DATABASE=str(db),
+            PYTHONPATH=os.pathsep.join([str(tmp), str(BASE_DIR)]),
+            DJANGO_SETTINGS_MODULE="bench_settings",
+        )
+        os.environ.update(env)
+        sys.path[:0] = [str(tmp), str(BASE_DIR)]
+        session_key, paths = seed(args.prayer_requests)
+        cookie = f"sessionid={session_key}"
+
+        results = {}
+        for name, server in SERVERS.items():
+            command = [sys.executable, "-m", "gunicorn", *server, "-w", str(args.workers),
+                       "-b", f"127.0.0.1:{args.port}", "--log-level", "warning"]
+            # asgi.py turns the async views on; keep WSGI on the sync ones.
+            server_env = dict(env, PRAYER_ASYNC_VIEWS="1" if name == "asgi" else "0")
+            process = subprocess.Popen(command, cwd=BASE_DIR, env=server_env)
+            try:
+                wait_for(args.port)
+                load(args.port, paths, cookie, args.concurrency, args.concurrency * 5)
+                results[name] = load(args.port, paths, cookie, args.concurrency, args.requests)
+            finally:
+                process.terminate()
+                process.wait()
+        print(json.dumps({"workers": args.workers, "concurrency": args.concurrency, "results": results}, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Drive every URL in app/urls.py through the Django test client at several
+dataset sizes, and record latency and query counts as JSON.
+
+Each size starts from an empty, migrated copy of the database filled by
+``manage.py generate_data``. Caches are cleared before every request, so the
+numbers describe the uncached path. Write views are sent a valid POST, each
+time against a new open request created outside the timing. The script exits
+non-zero if a view answers with an unexpected status, whose timings would
+mean nothing, or runs more queries at a larger size than at the smallest one,
+which is how N+1 loops show up.
+
+    python benchmarks/benchmark_views.py --sizes 5,50,500 --output bench.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Views that do nothing interesting without a query string.
+QUERY_STRINGS = {
+    "search": "q=pray",
+    "export-journal": "format=csv",
+}
+
+
+# Views driven with a POST: a function of the URL kwargs returning the body
+# and its content type (None for a form), and the status that means success.
+POSTS = {
+    "delete-prayer-request": (lambda kwargs: ({}, None), 302),
+    "add-answered-prayer": (lambda kwargs: ({"content": "answered"}, None), 302),
+    "bulk-prayer-requests": (
+        lambda kwargs: (json.dumps({"prayer_requests": [{"content": "prayer request", "groups": [kwargs["group_id"]]}]}), "application/json"),
+        201,
+    ),
+    "api-delete-prayer-request": (lambda kwargs: ("", "application/json"), 200),
+    "api-answer-prayer-request": (lambda kwargs: (json.dumps({"content": "answered"}), "application/json"), 200),
+}
+# ``<pk>`` is a group's, except on these views.
+PRAYER_REQUEST_PK = {"delete-prayer-request"}
+# Success statuses of GET views other than 200.
+GET_STATUSES = {
+    # The WSGI URL conf doesn't stream events; 204 stops the browser's retries.
+    "group-events": 204,
+}
+
+
+def url_kwargs(user, fresh=False):
+    """URL kwargs for ``user``'s first group and open request, or a new request with ``fresh``."""
+    from app.models import PrayerRequest
+
+    group = user.groups.order_by("pk").first()
+    if fresh:
+        prayer_request = PrayerRequest.objects.create(user=user, content="prayer request")
+    else:
+        prayer_request = PrayerRequest.objects.filter(user=user, answered=False).order_by("pk").first()
+    return {
+        "pk": group.pk,
+        "group_id": group.pk,
+        "prayer_request_id": prayer_request.pk,
+    }
+
+
+def app_views():
+    from django.urls import URLPattern
+
+    from app import urls
+
+    for pattern in urls.build_urlpatterns():
+        if isinstance(pattern, URLPattern) and pattern.name is not None:
+            yield pattern.name, pattern
+
+
+def build_request(user, name, pattern):
+    """``(method, url, data, content_type, expected_status)`` for one request to a view."""
+    from django.urls import reverse
+
+    method = "post" if name in POSTS else "get"
+    kwargs = url_kwargs(user, fresh=method == "post")
+    if name in PRAYER_REQUEST_PK:
+        kwargs["pk"] = kwargs["prayer_request_id"]
+    url = reverse(f"app:{name}", kwargs={key: kwargs[key] for key in pattern.pattern.converters})
+    if method == "post":
+        body, expected = POSTS[name]
+        data, content_type = body(kwargs)
+        return method, url, data, content_type, expected
+    if name in QUERY_STRINGS:
+        url += "?" + QUERY_STRINGS[name]
+    return method, url, None, None, GET_STATUSES.get(name, 200)
+
+
+def measure(client, user, name, pattern, repeat):
+    from django.core.cache import caches
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    timings, queries, statuses = [], 0, set()
+    for _ in range(repeat):
+        method, url, data, content_type, expected = build_request(user, name, pattern)
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        extra = {"content_type": content_type} if content_type else {}
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, **extra)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append(time.perf_counter() - start)
+        queries = sum(len(capture) for capture in captured)
+        statuses.add(response.status_code)
+    return {
+        "method": method.upper(),
+        "status": sorted(statuses) if len(statuses) > 1 else statuses.pop(),
+        "expected_status": expected,
+        "queries": queries,
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2),
+    }
+
+
+def run_size(size, args):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+
+    call_command("flush", interactive=False, verbosity=0)
+    call_command(
+        "generate_data",
+        users=args.users,
+        groups=args.groups,
+        groups_per_user=min(2, args.groups),
+        prayers_per_user=size,
+        shares_per_prayer=1,
+        answered_ratio=0.3,
+        stdout=open(os.devnull, "w"),
+    )
+    user = User.objects.get(username="generated-user-0")
+    # Staff, so the staff-only views are driven too.
+    user.is_staff = True
+    user.save()
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    return {name: measure(client, user, name, pattern, args.repeat) for name, pattern in app_views()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="5,50,500", help="Comma separated prayers per user for each run.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--groups", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    tmp = Path(tempfile.mkdtemp(prefix="prayer-bench-"))
+    try:
+        os.environ["PRAYER_DATABASE"] = str(tmp / "db.sqlite3")
+        os.environ["PRAYER_PROFILING_SAMPLE_RATE"] = "0"
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "list.settings")
+        sys.path.insert(0, str(BASE_DIR))
+        import django
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+
+        django.setup()
+        setup_test_environment()
+        call_command("migrate", verbosity=0)
+
+        results = {size: run_size(size, args) for size in sizes}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {"sizes": sizes, "results": {name: {str(size): results[size][name] for size in sizes} for name in results[sizes[0]]}}
+    growing = {
+        name: [runs[str(size)]["queries"] for size in sizes]
+        for name, runs in report["results"].items()
+        if any(runs[str(size)]["queries"] > runs[str(sizes[0])]["queries"] for size in sizes)
+    }
+    report["query_count_grows"] = growing
+    failed = {
+        name: {str(size): runs[str(size)]["status"] for size in sizes}
+        for name, runs in report["results"].items()
+        if any(runs[str(size)]["status"] != runs[str(size)]["expected_status"] for size in sizes)
+    }
+    report["unexpected_status"] = failed
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    if failed:
+        sys.exit(f"Views answered with an unexpected status: {failed}")
+    if growing:
+        sys.exit(f"Query count grows with data size: {growing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Measure the personal prayer page's response size and render time with 6, 50
+and 500 requests on the page, optionally against the page template at
+another git revision.
+
+The page is rendered through the Django test client on an empty, migrated
+copy of the database holding one user's open requests. Caches are cleared
+before every request, so every card is rendered. Results are printed as JSON.
+
+    python benchmarks/personal_prayer_page.py --sizes 6,50,500 --against HEAD~1
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATE = "app/templates/app/personal-prayer.html"
+
+
+def seed(size):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    call_command(
+        "generate_data",
+        users=1,
+        groups=1,
+        groups_per_user=1,
+        prayers_per_user=size,
+        answered_ratio=0,
+        stdout=open(os.devnull, "w"),
+    )
+    return User.objects.get(username="generated-user-0")
+
+
+def measure(client, size, repeat):
+    from django.core.cache import caches
+    from django.urls import reverse
+
+    from app.views import PersonalPrayerView
+
+    PersonalPrayerView.paginate_by = size
+    timings = []
+    for _ in range(repeat):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        start = time.perf_counter()
+        response = client.get(reverse("app:personal-prayer"))
+        timings.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.status_code
+    return {
+        "bytes": len(response.content),
+        "gzip_bytes": len(gzip.compress(response.content)),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def run(client, sizes, repeat, template_dir=None):
+    from django.conf import settings
+    from django.test import override_settings
+
+    templates = settings.TEMPLATES
+    if template_dir:
+        templates = [{**templates[0], "DIRS": [template_dir, *templates[0]["DIRS"]]}]
+    with override_settings(TEMPLATES=templates):
+        return {str(size): measure(client, size, repeat) for size in sizes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="6,50,500", help="Comma separated requests per page.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--against", metavar="REF", help="Also measure the page template at this git revision.")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    tmp = Path(tempfile.mkdtemp(prefix="prayer-bench-"))
+    try:
+        if args.against:
+            old = tmp / "templates" / "app" / "personal-prayer.html"
+            old.parent.mkdir(parents=True)
+            old.write_bytes(subprocess.run(
+                ["git", "show", f"{args.against}:{TEMPLATE}"], cwd=BASE_DIR, check=True, capture_output=True,
+            ).stdout)
+        os.environ["PRAYER_DATABASE"] = str(tmp / "db.sqlite3")
+        os.environ["PRAYER_PROFILING_SAMPLE_RATE"] = "0"
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "list.settings")
+        sys.path.insert(0, str(BASE_DIR))
+        import django
+        from django.core.management import call_command
+        from django.test import Client
+        from django.test.utils import setup_test_environment
+
+        django.setup()
+        setup_test_environment()
+        call_command("migrate", verbosity=0)
+
+        client = Client()
+        client.force_login(seed(max(sizes)))
+        report = {"sizes": sizes, "current": run(client, sizes, args.repeat)}
+        if args.against:
+            report[args.against] = run(client, sizes, args.repeat, tmp / "templates")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Count the queries a logged in request runs on PersonalPrayerView and
+GroupDetailView under each session engine and message storage.
+
+Each configuration logs in once and then requests both pages, clearing the
+page caches (but not the session cache) before every request, on an empty,
+migrated copy of the database filled by ``manage.py generate_data``. Results
+are printed as JSON.
+
+    python benchmarks/session_queries.py --repeat 20
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CONFIGURATIONS = {
+    # Django's defaults, which this project used before.
+    "db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.fallback.FallbackStorage",
+    },
+    "cached_db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.cookie.CookieStorage",
+    },
+    "signed_cookies": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.cookie.CookieStorage",
+    },
+}
+
+
+def measure(client, url, repeat):
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    queries, session_queries = [], []
+    for _ in range(repeat):
+        for alias in settings.CACHES:
+            if alias != settings.SESSION_CACHE_ALIAS:
+                caches[alias].clear()
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        statements = [query["sql"] for capture in captured for query in capture]
+        queries.append(len(statements))
+        session_queries.append(sum("django_session" in sql for sql in statements))
+    return {
+        "queries_per_request": sum(queries) / repeat,
+        "session_queries_per_request": sum(session_queries) / repeat,
+    }
+
+
+def run(user, group, settings_overrides, repeat):
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    with override_settings(**settings_overrides):
+        client = Client()
+        client.force_login(user)
+        return {
+            "personal-prayer": measure(client, reverse("app:personal-prayer"), repeat),
+            "group-detail": measure(client, reverse("app:group-detail", kwargs={"pk": group.pk}), repeat),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="prayer-bench-"))
+    try:
+        os.environ["PRAYER_DATABASE"] = str(tmp / "db.sqlite3")
+        os.environ["PRAYER_PROFILING_SAMPLE_RATE"] = "0"
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "list.settings")
+        sys.path.insert(0, str(BASE_DIR))
+        import django
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+
+        django.setup()
+        from django.contrib.auth.models import User
+
+        setup_test_environment()
+        call_command("migrate", verbosity=0)
+        call_command(
+            "generate_data",
+            users=5,
+            groups=1,
+            groups_per_user=1,
+            prayers_per_user=20,
+            answered_ratio=0.3,
+            stdout=open(os.devnull, "w"),
+        )
+        user = User.objects.get(username="generated-user-0")
+        group = user.groups.get()
+        report = {name: run(user, group, overrides, args.repeat) for name, overrides in CONFIGURATIONS.items()}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,11 +45,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'app.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'app.middleware.ReplicaReadMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -76,13 +79,167 @@ WSGI_APPLICATION = 'list.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# The database runs in WAL mode so readers don't block the writer. The
+# replica alias opens it read-only, or another copy via PRAYER_REPLICA_DATABASE;
+# app.routers.PrimaryReplicaRouter decides which reads go there.
+DATABASE_PATH = Path(os.environ.get("PRAYER_DATABASE", BASE_DIR / 'db.sqlite3'))
+REPLICA_DATABASE_PATH = Path(os.environ.get("PRAYER_REPLICA_DATABASE", DATABASE_PATH))
+# Seconds SQLite waits on a lock before raising "database is locked".
+DATABASE_TIMEOUT = float(os.environ.get("PRAYER_DATABASE_TIMEOUT", 20))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATABASE_PATH,
+        'OPTIONS': {
+            'timeout': DATABASE_TIMEOUT,
+            'init_command': 'PRAGMA journal_mode=WAL',
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'{REPLICA_DATABASE_PATH.resolve().as_uri()}?mode=ro',
+        'OPTIONS': {
+            'timeout': DATABASE_TIMEOUT,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['app.routers.PrimaryReplicaRouter']
+
+# After a write, the session reads from the primary for this many seconds so
+# a lagging replica never hides the user's own change.
+REPLICA_STICKY_SECONDS = float(os.environ.get("PRAYER_REPLICA_STICKY_SECONDS", 5))
+
+# Statements outside a transaction that still hit "database is locked" after
+# the timeout are retried this many times, with exponential backoff.
+DATABASE_LOCK_RETRIES = int(os.environ.get("PRAYER_DATABASE_LOCK_RETRIES", 3))
+DATABASE_LOCK_RETRY_DELAY = 0.05
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+#
+# Rendered list pages and prayer cards live in the "fragments" cache (see
+# app/caching.py), users' group ids in the default cache (see
+# app/membership.py) and cached_db sessions in the "sessions" cache.
+# PRAYER_CACHE_BACKEND picks the backend for all three, none of which needs
+# an external service:
+#
+# - "file": files under PRAYER_CACHE_DIR, shared by every process on the host,
+#   the default;
+# - "shm": the same, under /dev/shm, so reads and writes never touch the disk;
+# - "locmem": per process, for running a single process only. Evictions and
+#   version bumps never reach the other processes, which keep serving what
+#   they cached until it times out.
+#
+# PRAYER_SESSION_CACHE_BACKEND overrides it for sessions alone.
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "shm": "django.core.cache.backends.filebased.FileBasedCache",
+}
+
+CACHE_DIRS = {
+    "file": Path(os.environ.get("PRAYER_CACHE_DIR", BASE_DIR / ".cache")),
+    "shm": Path(os.environ.get("PRAYER_CACHE_DIR", "/dev/shm/prayer-warrior")),
+}
+
+
+def cache_config(backend, name):
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend {backend!r}, expected one of {sorted(CACHE_BACKENDS)}")
+    location = name
+    if backend in CACHE_DIRS:
+        location = CACHE_DIRS[backend] / name
+    return {
+        "BACKEND": CACHE_BACKENDS[backend],
+        "LOCATION": str(location),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
+
+
+CACHE_BACKEND = os.environ.get("PRAYER_CACHE_BACKEND", "file")
+
+CACHES = {
+    "default": cache_config(CACHE_BACKEND, "default"),
+    "fragments": cache_config(CACHE_BACKEND, "fragments"),
+    "sessions": cache_config(os.environ.get("PRAYER_SESSION_CACHE_BACKEND", CACHE_BACKEND), "sessions"),
+}
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Membership entries are dropped when memberships change; the timeout only
+# bounds how long an entry missed by that lives. They aren't cached across
+# requests at all under locmem (see app/membership.py).
+MEMBERSHIP_CACHE_TIMEOUT = 5 * 60
+
+# Username autocomplete results are cached per prefix this long, so a new
+# user shows up in it at most this late.
+USERNAME_SUGGESTION_CACHE_TIMEOUT = 30
+
+# Group pages follow new and answered requests over Server-Sent Events (see
+# app/events.py). Each process keeps this many recent events per group for
+# reconnecting browsers, and sends a heartbeat on idle streams so proxies
+# don't close them.
+EVENT_REPLAY_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_RETRY_MILLISECONDS = 3000
+
+# Feed fan-out and counters after a form post run in the worker process
+# (manage.py run_worker, see app/jobs.py). It polls for due jobs this often,
+# runs up to JOB_BATCH_SIZE per claim, retries a failing job after
+# JOB_RETRY_SECONDS, doubling each time, until it has been tried
+# JOB_MAX_ATTEMPTS times, and keeps finished jobs, and so their idempotency
+# keys, JOB_RETENTION_DAYS.
+JOB_POLL_SECONDS = float(os.environ.get("PRAYER_JOB_POLL_SECONDS", 1))
+JOB_BATCH_SIZE = 100
+JOB_LEASE_SECONDS = 5 * 60
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_SECONDS = 10
+JOB_RETENTION_DAYS = 7
+
+# Fraction of requests ProfilingMiddleware profiles. The aggregates are per
+# process and staff can read them at /profiling/.
+PROFILING_SAMPLE_RATE = float(os.environ.get("PRAYER_PROFILING_SAMPLE_RATE", 0.05))
+
+# manage.py archive_prayers moves requests answered longer ago than this to
+# the archive tables (see app/archive.py).
+ARCHIVE_AFTER_DAYS = int(os.environ.get("PRAYER_ARCHIVE_AFTER_DAYS", 180))
+
+# Serve the list and group pages through their async ORM variants. list/asgi.py
+# turns this on, so only the ASGI entry point pays for the async handlers.
+ASYNC_VIEWS = os.environ.get("PRAYER_ASYNC_VIEWS") == "1"
+
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/
+#
+# Every logged in request loads its session, so keep it off the database:
+# PRAYER_SESSION_ENGINE is "cached_db" (the default: read from the
+# "sessions" cache, written through to the database so a cold or per-process
+# cache only costs a query), "signed_cookies" (no server-side state; the
+# cookie is signed with SECRET_KEY, not encrypted) or "db".
+# Flash messages travel in a cookie, so setting one doesn't write the session.
+
+SESSION_ENGINES = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
 }
 
+SESSION_ENGINE = os.environ.get("PRAYER_SESSION_ENGINE", "cached_db")
+if SESSION_ENGINE not in SESSION_ENGINES:
+    raise ValueError(f"Unknown session engine {SESSION_ENGINE!r}, expected one of {sorted(SESSION_ENGINES)}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_ENGINE]
+SESSION_CACHE_ALIAS = "sessions"
+
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -121,6 +278,19 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic fingerprints every file and writes .gz and (with the Brotli
+# package) .br copies next to it; WhiteNoise serves the fingerprinted names
+# with an immutable, one year Cache-Control. Pages load the bundles built by
+# manage.py build_assets (see app/assets.py).
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -129,5 +299,3 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGOUT_REDIRECT_URL = 'login'
 
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
-
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'